@@ -0,0 +1,30 @@
+"""量測 process_cost_breakdown_tree 在深層巢狀單價分析下的耗時是否隨節點數線性成長"""
+import os
+import sys
+import tempfile
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from benchmarks.synthetic import write_synthetic_xml
+from src.xml_converter.xml_processor import XMLProcessor
+
+
+def main(depths=(100, 500, 1500), fanout=3):
+    with tempfile.TemporaryDirectory() as tmp:
+        for depth in depths:
+            path = write_synthetic_xml(
+                os.path.join(tmp, f"nested_{depth}.xml"),
+                pay_items=1, main_items=1, analyses=1, fanout=fanout, nesting=depth
+            )
+            root = XMLProcessor.parse_xml(path)
+            start = time.perf_counter()
+            XMLProcessor.process_cost_breakdown_root(root)
+            elapsed = time.perf_counter() - start
+            nodes = depth * fanout + 1
+            print(f"nesting {depth:>6}: {nodes:>7} nodes  {elapsed:.3f}s  {elapsed / nodes * 1e6:.1f}us/node")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""比較 pd.ExcelWriter(openpyxl) 與 XlsxWriter constant_memory 多工作表輸出的速度與峰值記憶體（tracemalloc）"""
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from benchmarks.synthetic import write_synthetic_xml
+from src.xml_converter.document import PCCESDocument
+from src.xml_converter.excel_export import document_sheets, write_workbook
+
+
+def measure(func):
+    """返回 (耗時, 峰值記憶體 MB, 輸出大小 MB)
+
+    tracemalloc 會拖慢大量建立物件的 openpyxl，因此耗時與峰值記憶體分開量測。
+    """
+    start = time.perf_counter()
+    output = func()
+    elapsed = time.perf_counter() - start
+    size = len(output.getvalue()) / 1024 / 1024
+    del output
+    tracemalloc.start()
+    output = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024, size
+
+
+def openpyxl_workbook(document):
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        for item_type, name in (("PayItem", "PayItems"), ("WorkItem", "WorkItems")):
+            df = document.to_dataframe(item_type)
+            if df is not None:
+                df.to_excel(writer, sheet_name=name, index=False)
+    return output
+
+
+def xlsxwriter_workbook(document):
+    return write_workbook(io.BytesIO(), document_sheets(document, include_analyses=False))
+
+
+def main(pay_items=20000):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_synthetic_xml(os.path.join(tmp, "synthetic.xml"), pay_items=pay_items, analyses=pay_items // 10)
+        document = PCCESDocument(path)
+        document.to_dataframe("PayItem")
+        document.to_dataframe("WorkItem")
+
+        openpyxl_time, openpyxl_peak, openpyxl_size = measure(lambda: openpyxl_workbook(document))
+        xlsx_time, xlsx_peak, xlsx_size = measure(lambda: xlsxwriter_workbook(document))
+        all_time, all_peak, all_size = measure(lambda: write_workbook(io.BytesIO(), document_sheets(document)))
+
+    print(f"pay items:                {pay_items}  analyses: {pay_items // 10}")
+    print(f"openpyxl ExcelWriter:     {openpyxl_time:.2f}s  peak {openpyxl_peak:.1f} MB  {openpyxl_size:.1f} MB")
+    print(f"xlsxwriter constant_mem:  {xlsx_time:.2f}s  peak {xlsx_peak:.1f} MB  {xlsx_size:.1f} MB")
+    print(f"  + one sheet / analysis: {all_time:.2f}s  peak {all_peak:.1f} MB  {all_size:.1f} MB")
+    print(f"speedup:                  {openpyxl_time / xlsx_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
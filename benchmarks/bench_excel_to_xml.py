@@ -0,0 +1,47 @@
+"""比較 convert_excel_to_xml + save_xml（建立整棵樹）與 write_xml（xmlfile 串流）的速度與輸出"""
+import io
+import os
+import sys
+import time
+
+from lxml import etree
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from benchmarks.synthetic import synthetic_sheet
+from src.xml_converter.excel_to_xml import ExcelToXMLConverter
+
+
+def tree_bytes(df):
+    root, detail_list = ExcelToXMLConverter._create_document()
+    ExcelToXMLConverter._convert_rows(df, detail_list)
+    output = io.BytesIO()
+    etree.ElementTree(root).write(output, encoding="UTF-8", xml_declaration=True, pretty_print=True, standalone="no")
+    return output.getvalue()
+
+
+def stream_bytes(df):
+    output = io.BytesIO()
+    ExcelToXMLConverter.write_xml(df, output)
+    return output.getvalue()
+
+
+def main(rows=100000):
+    df = synthetic_sheet(rows)
+    start = time.perf_counter()
+    expected = tree_bytes(df)
+    tree_time = time.perf_counter() - start
+    start = time.perf_counter()
+    actual = stream_bytes(df)
+    stream_time = time.perf_counter() - start
+
+    print(f"rows:            {rows}")
+    print(f"tree + save_xml: {tree_time:.2f}s")
+    print(f"write_xml:       {stream_time:.2f}s")
+    print(f"speedup:         {tree_time / stream_time:.1f}x")
+    print(f"byte identical:  {expected == actual}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,44 @@
+"""比較字典列表 + pd.DataFrame 與 ItemStore + to_dataframe 的峰值記憶體（tracemalloc）"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from benchmarks.synthetic import write_synthetic_xml
+from src.xml_converter.xml_processor import XMLProcessor
+
+
+def measure(func):
+    """返回 (耗時, 峰值記憶體 MB)；XML 樹在量測前已建立，不計入"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, peak / 1024 / 1024
+
+
+def main(pay_items=200000):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_synthetic_xml(os.path.join(tmp, "synthetic.xml"), pay_items=pay_items, analyses=10)
+        root = XMLProcessor.parse_xml(path)
+
+        dict_time, dict_peak = measure(lambda: pd.DataFrame(XMLProcessor.process_xml_root(root, "PayItem")))
+        store_time, store_peak = measure(lambda: XMLProcessor.process_xml_store(root, "PayItem").to_dataframe())
+
+    print(f"items:             {pay_items}")
+    print(f"list of dicts:     {dict_time:.2f}s  peak {dict_peak:.1f} MB")
+    print(f"ItemStore:         {store_time:.2f}s  peak {store_peak:.1f} MB")
+    print(f"peak reduction:    {dict_peak / store_peak:.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,58 @@
+"""比較 process_xml_node 舊版（每個欄位一次 .// 搜尋並逐層計算深度）與單次走訪的速度"""
+import os
+import sys
+import tempfile
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from benchmarks.synthetic import write_synthetic_xml
+from src.xml_converter.xml_processor import NAMESPACES, XMLProcessor
+
+
+def legacy_process(root):
+    """舊版做法：findall 後每個欄位各做一次 descendant 搜尋"""
+    data = []
+    for node in root.findall(".//ns:PayItem", NAMESPACES):
+        fields = {
+            'description': XMLProcessor.get_text_from_node(node, ".//ns:Description[@language='zh-TW']"),
+            'unit': XMLProcessor.get_text_from_node(node, ".//ns:Unit[@language='zh-TW']"),
+            'quantity': XMLProcessor.get_text_from_node(node, ".//ns:Quantity"),
+            'price': XMLProcessor.get_text_from_node(node, ".//ns:Price"),
+            'amount': XMLProcessor.get_text_from_node(node, ".//ns:Amount"),
+        }
+        row = XMLProcessor.build_row(node.attrib, "PayItem", fields, XMLProcessor.get_element_depth(node))
+        if row:
+            data.append(row)
+    return data
+
+
+def best_of(func, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(pay_items=50000, repeat=3):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_synthetic_xml(os.path.join(tmp, "synthetic.xml"), pay_items=pay_items, analyses=10)
+        root = XMLProcessor.parse_xml(path)
+
+        legacy_time, legacy_rows = best_of(lambda: legacy_process(root), repeat)
+        single_time, single_rows = best_of(lambda: XMLProcessor.process_xml_root(root, "PayItem"), repeat)
+
+    print(f"items:        {len(single_rows)}")
+    print(f"legacy:       {legacy_time:.3f}s")
+    print(f"single pass:  {single_time:.3f}s")
+    print(f"speedup:      {legacy_time / single_time:.1f}x")
+    # 合成資料每個主項目的欄位都在子項目之前，兩者結果應一致
+    print(f"same rows:    {legacy_rows == single_rows}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,242 @@
+"""效能量測套件：產生合成輸入，於獨立子行程量測各階段耗時與峰值 RSS，並與儲存的基準比較
+
+用法：
+    python -m benchmarks.harness --save-baseline        # 建立或更新基準
+    python -m benchmarks.harness                        # 與基準比較，退步或沒有基準時結束碼為 1
+    python -m benchmarks.harness --pay-items 200000 --nesting 3 --cases process_xml_file
+    python -m benchmarks.harness --nesting 3 --shared 20 --cases cost_tree cost_dag
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:
+    # Windows 沒有 resource 模組，峰值 RSS 記為 NaN
+    resource = None
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from benchmarks.synthetic import write_synthetic_excel, write_synthetic_xml
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+# 量測項目：名稱 -> 使用的合成輸入（xml 或 excel）
+CASES = {
+    'process_xml_file': 'xml',
+    'process_cost_breakdown_tree': 'xml',
+    'convert_excel_to_xml': 'excel',
+    'save_xml': 'excel',
+    'write_xml': 'excel',
+    'diff_versions': 'xml',
+    'cost_tree': 'xml',
+    'cost_dag': 'xml',
+}
+
+
+def _prepare(case, input_path, output_path):
+    """於子行程中準備量測函式（不計入耗時，但計入峰值 RSS）"""
+    import pandas as pd
+    from src.xml_converter.excel_to_xml import ExcelToXMLConverter
+    from src.xml_converter.xml_processor import XMLProcessor
+
+    if case == 'process_xml_file':
+        return lambda: XMLProcessor.process_xml_file(input_path, "PayItem")
+    if case == 'process_cost_breakdown_tree':
+        return lambda: XMLProcessor.process_cost_breakdown_tree(input_path)
+    if case in ('cost_tree', 'cost_dag'):
+        from src.xml_converter.cost_tree import CostDag, CostTree
+        root = XMLProcessor.parse_xml(input_path)
+        graph = CostTree if case == 'cost_tree' else CostDag
+        return lambda: graph.from_xml_root(root)
+    if case == 'diff_versions':
+        from src.xml_converter.diff import diff_versions
+        # 固定以兩個工作行程解析，單核心機器上同樣量測行程池
+        return lambda: diff_versions([input_path, input_path], workers=2)
+    if case == 'convert_excel_to_xml':
+        return lambda: ExcelToXMLConverter.convert_excel_to_xml(input_path)
+    if case == 'save_xml':
+        root = ExcelToXMLConverter.convert_excel_to_xml(input_path)
+        return lambda: ExcelToXMLConverter.save_xml(root, output_path)
+    if case == 'write_xml':
+        df = pd.read_excel(input_path)
+        return lambda: ExcelToXMLConverter.write_xml(df, output_path)
+    raise ValueError(f"未知的量測項目：{case}")
+
+
+def _peak_rss_mb(children=False):
+    """目前行程的峰值 RSS（Linux 的 ru_maxrss 單位為 KB，macOS 為位元組），無法取得時為 NaN
+
+    children 為 True 時返回已結束子行程（例如行程池的工作行程）中最大的峰值 RSS。
+    """
+    if resource is None:
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def run_child(case, input_path, output_path, repeat):
+    """子行程進入點：執行 repeat 次並以 JSON 輸出最短耗時與峰值 RSS
+
+    import_rss_mb 為載入模組後的 RSS，峰值扣除此值約為該項目本身的用量；
+    children_peak_rss_mb 為行程池工作行程的峰值 RSS（未使用行程池的項目為 0）。
+    """
+    # 先載入相依套件，量測匯入後的基礎 RSS
+    import pandas
+    import src.xml_converter.excel_to_xml
+    import_rss = _peak_rss_mb()
+    func = _prepare(case, input_path, output_path)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+        del result
+    print(json.dumps({
+        'seconds': min(times),
+        'peak_rss_mb': _peak_rss_mb(),
+        'children_peak_rss_mb': _peak_rss_mb(children=True),
+        'import_rss_mb': import_rss,
+    }))
+
+
+def measure_case(case, input_path, output_path, repeat):
+    """在新的 Python 行程中量測單一項目，避免前一項目的記憶體影響峰值 RSS"""
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.harness", "--child", case,
+         "--input", input_path, "--output", output_path, "--repeat", str(repeat)],
+        cwd=project_root, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"{case} 失敗：\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def case_key(case, params):
+    """基準的鍵：項目名稱加上影響結果的合成參數"""
+    names = ('rows',) if CASES[case] == 'excel' else ('pay_items', 'analyses', 'fanout', 'nesting')
+    # 沒有共用子分析時不加入鍵，既有的基準仍然適用
+    if CASES[case] == 'xml' and params['shared']:
+        names += ('shared',)
+    return case + "[" + ",".join(f"{name}={params[name]}" for name in names) + "]"
+
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(result, baseline, threshold):
+    """返回超過基準 (1 + threshold) 倍的指標名稱列表"""
+    if not baseline:
+        return []
+    return [
+        metric for metric in ('seconds', 'peak_rss_mb', 'children_peak_rss_mb')
+        if metric in baseline and result[metric] > baseline[metric] * (1 + threshold)
+    ]
+
+
+def run_suite(args):
+    params = {
+        'pay_items': args.pay_items,
+        'analyses': args.analyses,
+        'fanout': args.fanout,
+        'nesting': args.nesting,
+        'shared': args.shared,
+        'rows': args.rows,
+    }
+    cases = args.cases or list(CASES)
+    baselines = load_baselines(args.baseline)
+    results = {}
+    regressions = []
+    missing = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        inputs = {}
+        if any(CASES[case] == 'xml' for case in cases):
+            inputs['xml'] = write_synthetic_xml(
+                os.path.join(tmp, "synthetic.xml"), pay_items=args.pay_items,
+                analyses=args.analyses, fanout=args.fanout, nesting=args.nesting, shared=args.shared
+            )
+        if any(CASES[case] == 'excel' for case in cases):
+            inputs['excel'] = write_synthetic_excel(os.path.join(tmp, "synthetic.xlsx"), rows=args.rows)
+        output_path = os.path.join(tmp, "output.xml")
+
+        print(f"{'case':<78} {'seconds':>9} {'peak RSS':>10} {'(imports)':>10} {'(workers)':>10}  baseline")
+        for case in cases:
+            key = case_key(case, params)
+            result = measure_case(case, inputs[CASES[case]], output_path, args.repeat)
+            results[key] = result
+            baseline = baselines.get(key)
+            failed = compare(result, baseline, args.threshold)
+            if failed:
+                regressions.append((key, failed))
+            if baseline:
+                status = "退步：" + "、".join(failed) if failed else (
+                    f"{result['seconds'] / baseline['seconds']:.2f}x 時間  "
+                    f"{result['peak_rss_mb'] / baseline['peak_rss_mb']:.2f}x RSS"
+                )
+            else:
+                missing.append(key)
+                status = "無基準"
+            print(
+                f"{key:<78} {result['seconds']:>8.3f}s {result['peak_rss_mb']:>7.1f} MB "
+                f"{result['import_rss_mb']:>7.1f} MB {result['children_peak_rss_mb']:>7.1f} MB  {status}"
+            )
+
+    if args.save_baseline:
+        baselines.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"已寫入基準：{args.baseline}")
+        return 0
+
+    if missing:
+        # 沒有基準時無法判斷是否退步，不視為通過
+        print(
+            f"{len(missing)} 個項目在 {args.baseline} 中沒有基準，請先以 --save-baseline 建立：{', '.join(missing)}",
+            file=sys.stderr
+        )
+    if regressions:
+        print(f"{len(regressions)} 個項目超過基準 {args.threshold:.0%}", file=sys.stderr)
+    return 1 if missing or regressions else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="PCCES 解析與轉換效能量測")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), help="只量測指定項目（預設全部）")
+    parser.add_argument("--pay-items", type=int, default=50000, help="合成 XML 的 PayItem 數")
+    parser.add_argument("--analyses", type=int, default=5000, help="單價分析筆數")
+    parser.add_argument("--fanout", type=int, default=5, help="每筆分析的細項數")
+    parser.add_argument("--nesting", type=int, default=1, help="分析的巢狀層數")
+    parser.add_argument("--shared", type=int, default=0, help="巢狀分析共用的子分析種類數（0 表示不共用）")
+    parser.add_argument("--rows", type=int, default=20000, help="合成 Excel 的列數")
+    parser.add_argument("--repeat", type=int, default=3, help="每個項目執行次數（取最短耗時）")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基準 JSON 檔案")
+    parser.add_argument("--threshold", type=float, default=0.2, help="超過基準多少比例視為退步")
+    parser.add_argument("--save-baseline", action="store_true", help="以本次結果更新基準")
+    # 子行程內部使用
+    parser.add_argument("--child", choices=sorted(CASES), help=argparse.SUPPRESS)
+    parser.add_argument("--input", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.child:
+        run_child(args.child, args.input, args.output, args.repeat)
+        return 0
+    return run_suite(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
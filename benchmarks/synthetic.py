@@ -0,0 +1,102 @@
+"""產生合成的 PCCES eTender XML，供效能量測使用"""
+import os
+import sys
+
+import pandas as pd
+
+NAMESPACE = "http://pcstd.pcc.gov.tw/2003/eTender"
+CHINESE_NUMERALS = "一二三四五六七八九十"
+
+
+def _fields(description, unit, quantity, price, amount):
+    return (
+        f'<Description language="zh-TW">{description}</Description>'
+        f'<Description language="en"> </Description>'
+        f'<Unit language="zh-TW">{unit}</Unit>'
+        f'<Unit language="en"> </Unit>'
+        f'<Quantity>{quantity}</Quantity>'
+        f'<Price fixed="false">{price}</Price>'
+        f'<Amount fixed="false">{amount}</Amount>'
+        f'<Remark>[發包]</Remark>'
+    )
+
+
+def _write_work_item(out, code, fanout, nesting, shared_code=None, quantity=1):
+    """寫入一筆單價分析，每層最後一個細項為下一層巢狀分析，共 nesting 層
+
+    指定 shared_code 時巢狀分析以其為代碼，不同分析引用定義相同的共用子分析；
+    quantity 為第一層巢狀分析在此處引用的數量（各分析可不同）。
+    """
+    for level in range(nesting + 1):
+        item_code = code if level == 0 else f"{shared_code or code}-S{level}"
+        used = quantity if level == 1 else 1
+        out.write(f'<WorkItem itemCode="{item_code}" itemKind="analysis" analysisOutputQuantity="1">')
+        out.write(_fields(f"分析{item_code}", "M3", used, 100, used * 100))
+        last = fanout - 1 if level < nesting else fanout
+        for i in range(last):
+            out.write(f'<WorkItem itemCode="M{i:04d}" itemKind="general">')
+            out.write(_fields(f"材料{i}", "式", 1, 20, 20))
+            out.write('</WorkItem>')
+    out.write('</WorkItem>' * (nesting + 1))
+
+
+def write_synthetic_xml(path, pay_items=1000, main_items=10, analyses=100, fanout=5, nesting=1, shared=0):
+    """寫入一份合成 XML
+
+    pay_items 為 analysis 工作項目數，平均分配到 main_items 個主項目之下；
+    CostBreakdownList 含 analyses 筆分析，每筆有 fanout 個細項並巢狀 nesting 層。
+    shared 大於 0 時巢狀分析取自 shared 種共用子分析（模擬標準配比被多處引用，
+    每處引用的數量不同）。
+    """
+    per_main = max(1, -(-pay_items // max(1, main_items)))
+    with open(path, "w", encoding="utf-8") as out:
+        out.write('<?xml version="1.0" encoding="UTF-8" standalone="no"?>\n')
+        out.write(f'<ETenderSheet xmlns="{NAMESPACE}"><DetailList>')
+        out.write('<PayItem itemKey="壹" itemNo="壹" refItemCode="" itemKind="mainItem">')
+        out.write(_fields("發包工程費", "式", 1, 0, 0))
+        written = 0
+        for m in range(main_items):
+            if written >= pay_items:
+                break
+            item_no = CHINESE_NUMERALS[m % len(CHINESE_NUMERALS)]
+            out.write(f'<PayItem itemKey="{item_no}" itemNo="{item_no}" refItemCode="" itemKind="mainItem">')
+            out.write(_fields(f"主項目{m}", "式", 1, 0, 0))
+            for i in range(min(per_main, pay_items - written)):
+                code = f"A{(written % max(1, analyses)):06d}"
+                out.write(f'<PayItem itemKey="{i + 1}" itemNo="{i + 1}" refItemCode="{code}" itemKind="analysis">')
+                out.write(_fields(f"工作項目{written}", "M3", 10, 100, 1000))
+                out.write('</PayItem>')
+                written += 1
+            out.write('</PayItem>')
+        out.write('</PayItem></DetailList><CostBreakdownList>')
+        for a in range(analyses):
+            _write_work_item(out, f"A{a:06d}", fanout, nesting, f"S{a % shared:05d}" if shared else None, 1 + a // max(1, shared))
+        out.write('</CostBreakdownList></ETenderSheet>')
+    return path
+
+
+def synthetic_sheet(rows, items_per_main=1000):
+    """Excel 轉換器的合成輸入：壹之下每 items_per_main 列一個中文數字主項目，其餘為分析項目"""
+    return pd.DataFrame({
+        '項次': ['壹' if i == 0 else ('一' if i % items_per_main == 0 else str(10 + i % items_per_main)) for i in range(rows)],
+        '項目代碼': [f"C{i:08d}" for i in range(rows)],
+        '項目種類': ['analysis'] * rows,
+        '說明': [f"工作項目{i}" for i in range(rows)],
+        '單位': ['M3'] * rows,
+        '數量': [float(i % 97) for i in range(rows)],
+        '單價': [i % 1000 for i in range(rows)],
+        '金額': [(i % 97) * (i % 1000) for i in range(rows)],
+    })
+
+
+def write_synthetic_excel(path, rows=1000, items_per_main=1000):
+    """將 synthetic_sheet 寫為 Excel 檔案"""
+    synthetic_sheet(rows, items_per_main).to_excel(path, index=False)
+    return path
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else os.path.join("data", "input", "synthetic.xml")
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    write_synthetic_xml(target, pay_items=count)
+    print(f"Wrote {count} pay items to {target}")
@@ -0,0 +1,11 @@
+import os
+import sys
+
+# 添加項目根目錄到 Python 路徑
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from src.xml_converter.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+import math
 import os
 import sys
 
@@ -7,112 +8,240 @@ import sys
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
-from src.xml_converter.xml_processor import XMLProcessor
+from src.xml_converter.arrow_io import ArrowDocumentCache
+from src.xml_converter.cache import DocumentCache, content_digest
+from src.xml_converter.diff import UNCHANGED, compare_versions, diff_summary, load_versions, version_table
 from src.xml_converter.excel_to_xml import ExcelToXMLConverter
+from src.xml_converter.formatting import format_for_display, format_thousands, to_numeric_columns
+from src.xml_converter.instrumentation import get_profiler, stage
+from src.xml_converter.resources import resource_summary
+from src.xml_converter.search_index import AnalysisSearchIndex
+from src.xml_converter.service import SERVICE_URL_ENV, ServiceClient
+from src.xml_converter.validation import validate_amounts
 
-def flatten_tree_data(tree_data):
-    """將樹狀結構轉換為平面列表"""
+# 單價分析每頁顯示的分析表數量
+ANALYSIS_PAGE_SIZE = 20
+
+# 已解析文件快取的記憶體上限
+DOCUMENT_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# 已轉換文件的 Arrow 磁碟快取目錄（以 XML 內容雜湊分資料夾）
+ARROW_CACHE_DIR = os.path.join(project_root, 'data', 'cache')
+
+# 設定時上傳檔案改由處理服務（python src/pcces_convert.py serve）解析，網頁只輪詢工作狀態
+SERVICE_URL = os.environ.get(SERVICE_URL_ENV)
+
+# 處理服務工作狀態的顯示文字
+SERVICE_STATUS_LABELS = {'queued': '排隊中', 'running': '處理中', 'done': '完成', 'failed': '失敗'}
+
+@st.cache_resource
+def get_document_cache():
+    """所有使用者共用的已解析文件快取"""
+    return DocumentCache(max_bytes=DOCUMENT_CACHE_MAX_BYTES)
+
+def get_upload_digest(xml_file):
+    """取得上傳檔案的 SHA-256，同一份上傳只計算一次"""
+    file_id = getattr(xml_file, 'file_id', None)
+    cached = st.session_state.get('upload_digest')
+    if file_id is not None and cached and cached[0] == file_id:
+        return cached[1]
+    digest = content_digest(xml_file.getbuffer())
+    st.session_state['upload_digest'] = (file_id, digest)
+    return digest
+
+def load_document(xml_file):
+    """依內容雜湊取得已解析的文件
+
+    先查記憶體快取，再查 Arrow 磁碟快取（記憶體映射，不解析 XML），
+    都未命中時才由上傳緩衝區直接解析並寫入磁碟快取；有設定處理服務時改由服務解析。
+    upload 階段記錄上傳的位元組數，取得文件後再記錄項目筆數。
+    """
+    with stage("upload", nbytes=xml_file.size) as record:
+        digest = get_upload_digest(xml_file)
+        if SERVICE_URL:
+            loader = lambda: load_service_documents([xml_file])[0]
+        else:
+            loader = lambda: ArrowDocumentCache(ARROW_CACHE_DIR).get_or_parse(xml_file, digest)
+        document = get_document_cache().get_or_load(digest, loader)
+        record['items'] = document_item_count(document)
+    return document
+
+def document_item_count(document):
+    """文件的 PayItem 與 WorkItem 筆數"""
+    return document.item_count("PayItem") + document.item_count("WorkItem")
+
+def load_service_documents(uploaded_files):
+    """將上傳檔案送交處理服務解析，輪詢工作狀態直到完成後取回 Arrow 資料表"""
+    placeholder = st.empty()
+
+    def show_progress(job):
+        ahead = f"，前面還有 {job['queued_ahead']} 個工作" if job.get('queued_ahead') else ""
+        placeholder.info(f"處理服務工作 {job['id'][:8]}：{SERVICE_STATUS_LABELS[job['status']]}{ahead}")
+
+    with stage("service", nbytes=sum(f.size for f in uploaded_files)) as record:
+        documents = ServiceClient(SERVICE_URL).load_documents(
+            [f.getbuffer() for f in uploaded_files], progress=show_progress
+        )
+        record['items'] = sum(document_item_count(document) for document in documents)
+    placeholder.empty()
+    return documents
+
+def flatten_tree_data(cost_tree):
+    """將樹狀結構轉換為平面列表（前序排列，階層為節點深度）"""
     flattened_data = []
-    
-    def process_node(node, level=0):
-        row = {
-            '項目代碼': node['item_code'],
-            '參考編號': node['ref_item_no'],
-            '項目種類': node['item_kind'],
-            '說明': node['description'],
-            '單位': node['unit'],
-            '數量': node['quantity'],
-            '單價': node['price'],
-            '金額': node['amount'],
-            '分析產出數量': node['output_quantity'],
-            '階層': level
-        }
+    for index in range(len(cost_tree)):
+        row = cost_tree.row(index)
+        row['階層'] = cost_tree.depth[index]
         flattened_data.append(row)
-        
-        for child in node['children']:
-            process_node(child, level + 1)
-    
-    for node in tree_data:
-        process_node(node)
-    
     return flattened_data
 
-def process_analysis_data(tree_data):
-    """處理分析項目數據，將每個分析項目分開"""
-    analysis_tables = {}
-    
-    def process_node(node, parent_analysis=None):
-        if node['item_kind'] == 'analysis':
-            # 創建新的分析項目表格
-            table_key = f"{node['item_code']} - {node['description']}"
-            analysis_tables[table_key] = {
-                '主項': {
-                    '項目代碼': node['item_code'],
-                    '參考編號': node['ref_item_no'],
-                    '項目種類': node['item_kind'],
-                    '說明': node['description'],
-                    '單位': node['unit'],
-                    '數量': node['quantity'],
-                    '單價': node['price'],
-                    '金額': node['amount'],
-                    '分析產出數量': node['output_quantity']
-                },
-                '細項': []
-            }
-            current_analysis = table_key
-        else:
-            # 如果有父分析項目，將此項目加入到對應的細項中
-            if parent_analysis and parent_analysis in analysis_tables:
-                analysis_tables[parent_analysis]['細項'].append({
-                    '項目代碼': node['item_code'],
-                    '參考編號': node['ref_item_no'],
-                    '項目種類': node['item_kind'],
-                    '說明': node['description'],
-                    '單位': node['unit'],
-                    '數量': node['quantity'],
-                    '單價': node['price'],
-                    '金額': node['amount'],
-                    '分析產出數量': node['output_quantity']
-                })
-            current_analysis = parent_analysis
-        
-        # 處理子節點
-        for child in node['children']:
-            process_node(child, current_analysis)
-    
-    # 處理所有頂層節點
-    for node in tree_data:
-        process_node(node)
-    
-    return analysis_tables
+def process_analysis_data(cost_graph):
+    """處理分析項目數據，將每個分析項目分開
 
-def process_main_items(tree_data):
-    """處理總表數據"""
-    main_items = []
-    
-    def process_node(node, step=0):
-        # 檢查是否為主項目（step=0 且 item_kind 不為空）
-        if step == 0 and node['item_kind']:
-            main_items.append({
-                '項目代碼': node['item_code'],
-                '參考編號': node['ref_item_no'],
-                '項目種類': node['item_kind'],
-                '說明': node['description'],
-                '單位': node['unit'],
-                '數量': node['quantity'],
-                '單價': node['price'],
-                '金額': node['amount']
-            })
-        
-        # 處理子節點，step加1
-        for child in node['children']:
-            process_node(child, step + 1)
-    
-    # 處理所有頂層節點
-    for node in tree_data:
-        process_node(node)
-    
-    return main_items
+    cost_graph 可為 CostTree 或 CostDag；同名（代碼 - 說明）的分析表保留第一次出現的順序與最後一次出現的內容。
+    """
+    codes = cost_graph.fields['item_code']
+    descriptions = cost_graph.fields['description']
+    # 分析表名稱 -> (分析節點, 細項節點)
+    latest = {}
+    for index, details in cost_graph.analysis_details():
+        latest[f"{codes[index]} - {descriptions[index]}"] = (index, details)
+    return {
+        table_key: {'主項': cost_graph.row(index), '細項': [cost_graph.row(detail) for detail in details]}
+        for table_key, (index, details) in latest.items()
+    }
+
+# 以下衍生資料以 document.derived 依附於已解析的文件，與文件共用記憶體快取的大小上限與淘汰順序
+
+def build_analysis_index(cost_graph):
+    """建立分析表與搜尋索引"""
+    analysis_tables = process_analysis_data(cost_graph)
+    return analysis_tables, AnalysisSearchIndex.from_tables(analysis_tables)
+
+def get_analysis_index(document):
+    """分析表與搜尋索引（重新執行時不再重建）"""
+    return document.derived('analysis_index', lambda: build_analysis_index(document.cost_graph))
+
+def build_cost_breakdown_parquet(document):
+    """單價分析樹攤平後的 Parquet 內容"""
+    with stage("export") as record:
+        table = document.cost_breakdown_frame()
+        record['items'] = len(table)
+        return table.to_parquet(index=False)
+
+def get_cost_breakdown_parquet(document):
+    """單價分析樹攤平後的 Parquet 內容（依附於文件快取）"""
+    return document.derived('cost_breakdown_parquet', lambda: build_cost_breakdown_parquet(document))
+
+def build_pay_item_breakdowns_parquet(document):
+    """PayItem 併入單價分析細項的 Parquet 內容，沒有對應時返回 None"""
+    table = document.pay_item_breakdowns()
+    if table is None:
+        return None
+    with stage("export", items=len(table)):
+        return table.to_parquet(index=False)
+
+def get_pay_item_breakdowns_parquet(document):
+    """PayItem 併入單價分析細項的 Parquet 內容（依附於文件快取）"""
+    return document.derived('pay_item_breakdowns_parquet', lambda: build_pay_item_breakdowns_parquet(document))
+
+# 詳細價目表顯示的項目種類
+DETAILED_ITEM_KINDS = ['mainItem', 'analysis', 'variablePrice', 'general', 'subtotal', 'formula']
+
+def detailed_price_items(document):
+    """詳細價目表的 PayItem（數值欄位維持 float64）"""
+    pay_items_df = document.to_dataframe("PayItem")
+    return pay_items_df[pay_items_df['項目種類'].isin(DETAILED_ITEM_KINDS)]
+
+def build_detailed_price_display(document):
+    """格式化為千分位的詳細價目表"""
+    table = detailed_price_items(document)
+    with stage("format", items=len(table)):
+        return format_for_display(table)
+
+def get_detailed_price_display(document):
+    """格式化為千分位的詳細價目表（依附於文件快取，重新執行時不再格式化）"""
+    return document.derived('detailed_price_display', lambda: build_detailed_price_display(document))
+
+def build_detailed_price_csv(document):
+    """詳細價目表的 CSV 內容（UTF-8 BOM，在記憶體中產生）"""
+    table = get_detailed_price_display(document)
+    with stage("export", items=len(table)):
+        return table.to_csv(index=False).encode("utf-8-sig")
+
+def get_detailed_price_csv(document):
+    """詳細價目表的 CSV 內容（依附於文件快取）"""
+    return document.derived('detailed_price_csv', lambda: build_detailed_price_csv(document))
+
+def build_detailed_price_parquet(document):
+    """詳細價目表的 Parquet 內容（數值欄位維持 float64）"""
+    table = detailed_price_items(document)
+    with stage("export", items=len(table)):
+        return table.to_parquet(index=False)
+
+def get_detailed_price_parquet(document):
+    """詳細價目表的 Parquet 內容（依附於文件快取）"""
+    return document.derived('detailed_price_parquet', lambda: build_detailed_price_parquet(document))
+
+def build_version_diffs(document, other_files):
+    """目前文件與其他版本依序比較的結果
+
+    目前文件已解析，直接取用；其他版本以行程池平行解析，有設定處理服務時改由服務平行解析。
+    """
+    if SERVICE_URL:
+        others = [version_table(other) for other in load_service_documents(other_files)]
+    else:
+        others = load_versions([f.getvalue() for f in other_files])
+    tables = [version_table(document), *others]
+    return compare_versions(tables)
+
+def get_version_diffs(digests, document, other_files):
+    """版本比較結果（以各版本內容雜湊為鍵，依附於目前文件快取）"""
+    return document.derived(('version_diffs', digests), lambda: build_version_diffs(document, other_files))
+
+def get_file_digest(uploaded_file):
+    """取得任一上傳檔案的 SHA-256（以 file_id 記錄於 session_state，同一份上傳只計算一次）"""
+    digests = st.session_state.setdefault('file_digests', {})
+    file_id = getattr(uploaded_file, 'file_id', None)
+    if file_id is None or file_id not in digests:
+        with stage("upload", nbytes=uploaded_file.size):
+            digest = content_digest(uploaded_file.getbuffer())
+        if file_id is None:
+            return digest
+        digests[file_id] = digest
+    return digests[file_id]
+
+def get_amount_validation(document):
+    """金額檢核結果（依附於文件快取）"""
+    return document.derived('amount_validation', lambda: validate_amounts(document.to_dataframe("PayItem")))
+
+def get_resource_summary(document):
+    """資源用量表（依附於文件快取）"""
+    return document.derived('resource_summary', lambda: resource_summary(document))
+
+def render_analysis_detail(table):
+    """顯示單一分析表的細項資料"""
+    if not table['細項']:
+        st.info("此分析沒有細項資料")
+        return
+    with stage("format", items=len(table['細項'])):
+        detail_df = to_numeric_columns(pd.DataFrame(table['細項']))
+        # 格式化金額和單價
+        detail_df = format_for_display(detail_df)
+    with stage("render", items=len(detail_df)):
+        st.dataframe(
+            detail_df[["項目代碼", "說明", "單位", "數量", "單價", "金額"]],
+            hide_index=True,
+            use_container_width=True
+        )
+
+# 總表欄位（不含分析產出數量）
+MAIN_ITEM_FIELDS = ('item_code', 'ref_item_no', 'item_kind', 'description', 'unit', 'quantity', 'price', 'amount')
+
+def process_main_items(cost_graph):
+    """處理總表數據（頂層且 item_kind 不為空的項目）"""
+    kinds = cost_graph.fields['item_kind']
+    return [cost_graph.row(index, MAIN_ITEM_FIELDS) for index in cost_graph.roots() if kinds[index]]
 
 def read_excel_file(file):
     """讀取各種格式的 Excel 檔案"""
@@ -131,41 +260,48 @@ def read_excel_file(file):
                 st.error(f"無法讀取檔案，請確認檔案格式是否正確。錯誤訊息：{str(e3)}")
                 return None
 
-def get_work_item_details(tree_data, item_code):
-    """獲取工作項目的細項資料"""
-    details = []
-    
-    def find_item(node):
-        if node['item_code'] == item_code:
-            # 處理子項目
-            for child in node['children']:
-                details.append({
-                    '項目代碼': child['item_code'],
-                    '參考編號': child['ref_item_no'],
-                    '項目種類': child['item_kind'],
-                    '說明': child['description'],
-                    '單位': child['unit'],
-                    '數量': child['quantity'],
-                    '單價': child['price'],
-                    '金額': child['amount'],
-                    '分析產出數量': child['output_quantity']
-                })
-            return True
-        
-        # 遞迴搜尋子節點
-        for child in node['children']:
-            if find_item(child):
-                return True
-        return False
-    
-    # 搜尋所有頂層節點
-    for node in tree_data:
-        if find_item(node):
-            break
-    
-    return details
+def get_work_item_details(cost_graph, item_code):
+    """獲取工作項目的細項資料（以項目代碼索引找到第一個相符的節點）"""
+    index = cost_graph.find(item_code)
+    if index is None:
+        return []
+    return [cost_graph.row(child) for child in cost_graph.children(index)]
 
 def main():
+    """執行頁面；啟用量測（PCCES_PROFILE=1）時於側邊欄顯示本次執行的各階段耗時"""
+    profiler = get_profiler()
+    with profiler.collect() as records:
+        render_pages()
+    if profiler.enabled:
+        show_debug_panel(records, profiler)
+
+def show_debug_panel(records, profiler):
+    """側邊欄效能除錯面板"""
+    with st.sidebar.expander("⏱️ 效能除錯", expanded=False):
+        if not records:
+            st.caption("本次執行沒有量測紀錄")
+            return
+        debug_df = pd.DataFrame(records)
+        debug_df['秒'] = debug_df['seconds'].round(4)
+        debug_df['記憶體變化 MB'] = (debug_df['rss_delta_bytes'] / 1024 / 1024).round(1)
+        st.dataframe(
+            debug_df[['stage', 'items', 'bytes', '秒', '記憶體變化 MB']]
+                .rename(columns={'stage': '階段', 'items': '筆數', 'bytes': '位元組'}),
+            hide_index=True,
+            use_container_width=True
+        )
+        st.caption(
+            f"合計 {debug_df['seconds'].sum():.3f} 秒，"
+            f"目前 RSS {records[-1]['rss_bytes'] / 1024 / 1024:.0f} MB"
+        )
+        st.download_button(
+            label="下載 Prometheus 指標",
+            data=profiler.metrics_text(),
+            file_name="pcces_metrics.prom",
+            mime="text/plain"
+        )
+
+def render_pages():
     # st.title("XML 處理工具")
     
     # 創建兩個分頁
@@ -176,44 +312,40 @@ def main():
         xml_file = st.sidebar.file_uploader("選擇 XML 檔案", type=['xml'], key="xml_uploader")
 
         if xml_file is not None:
-            # 保存上傳的文件
-            input_path = os.path.join('data', 'input', 'uploaded.xml')
-            with open(input_path, 'wb') as f:
-                f.write(xml_file.getvalue())
-
             # 創建三個子分頁
-            subtab1, subtab2, subtab3 = st.tabs(["總表", "詳細價目表", "單價分析"])
+            subtab1, subtab2, subtab3, subtab4, subtab5 = st.tabs(["總表", "詳細價目表", "單價分析", "版本比較", "資源統計"])
             
-            # 讀取 XML 樹狀結構（只讀取一次）
-            tree_data = XMLProcessor.process_cost_breakdown_tree(input_path)
+            # 取得已解析的 XML（依內容雜湊快取，重新執行時不再解析）
+            document = load_document(xml_file)
+            cost_graph = document.cost_graph
             
-            pay_items_data = XMLProcessor.process_xml_file(input_path, "PayItem")
+            pay_items_count = document.item_count("PayItem")
 
             with subtab1:
                 st.header("總表")
-                # if tree_data:
-                    # main_items = process_main_items(tree_data)
-                if pay_items_data:
+                # if len(cost_graph):
+                    # main_items = process_main_items(cost_graph)
+                if pay_items_count:
 
-                    pay_items_df=pd.DataFrame(pay_items_data)
+                    pay_items_df = document.to_dataframe("PayItem")
 
                     # 先篩選出項目種類不為空白的項目
                     pay_items_df = pay_items_df.dropna(subset=['項目種類'])
 
                     main_items_df = pay_items_df[(pay_items_df['階層'] <= 1) & (pay_items_df['項目種類'].isin(['mainItem','subtotal', 'formula']))]
 
-                    # 先將字串轉換為數值，再進行千分位格式化
-                    main_items_df["金額"] = pd.to_numeric(main_items_df["金額"], errors='coerce')
-                    main_items_df["單價"] = pd.to_numeric(main_items_df["單價"], errors='coerce')
-                    
-                    main_items_df["金額"] = main_items_df["金額"].apply(lambda x: '{:,.0f}'.format(x) if pd.notnull(x) else '')
-                    main_items_df["單價"] = main_items_df["單價"].apply(lambda x: '{:,.0f}'.format(x) if pd.notnull(x) else '')
+                    # 數值欄位已於解析時轉為 float64，這裡只做千分位顯示格式化
+                    with stage("format", items=len(main_items_df)):
+                        main_items_df = format_for_display(main_items_df)
 
-                    st.dataframe(
-                        main_items_df[["項次","說明", "單位", "數量", "單價", "金額"]],  # 只顯示這幾個欄位,
-                        hide_index=True,  # 隱藏索引
-                        use_container_width=True  # 使用容器寬度
-                    )
+                    with stage("render", items=len(main_items_df)):
+                        st.dataframe(
+                            main_items_df[["項次","說明", "單位", "數量", "單價", "金額"]],  # 只顯示這幾個欄位,
+                            hide_index=True,  # 隱藏索引
+                            use_container_width=True  # 使用容器寬度
+                        )
+
+                    render_amount_validation(get_amount_validation(document))
                     # # 準備 CSV 下載
                     # csv_path = os.path.join('data', 'output', 'MainItemSheet.csv')
                     # main_items_df.to_csv(csv_path, index=False, encoding='utf-8-sig')
@@ -233,91 +365,76 @@ def main():
             with subtab2:
                 st.header("詳細價目表")
                 # pay_items_data = XMLProcessor.process_xml_file(input_path, "PayItem")
-                if pay_items_data:
-                    pay_items_df = pd.DataFrame(pay_items_data)
-                    pay_items_df = pay_items_df[pay_items_df['項目種類'].isin(['mainItem','analysis', 'variablePrice', 'general','subtotal', 'formula'])]
-
+                if pay_items_count:
                     # pay_items_df=pay_items_df[pay_items_df['項目種類'].isin(['mainItem','subtotal', 'formula'])]
-                    # 格式化金額欄位為千分位
-                    pay_items_df['金額'] = pay_items_df['金額'].apply(lambda x: '{:,.0f}'.format(float(x)) if pd.notnull(x) else x)
-                    pay_items_df['單價'] = pay_items_df['單價'].apply(lambda x: '{:,.0f}'.format(float(x)) if pd.notnull(x) else x)
+                    # 格式化金額欄位為千分位（依附於文件快取，重新執行時不再格式化）
+                    pay_items_df = get_detailed_price_display(document)
                     
-                    st.dataframe(
-                        pay_items_df[["項次","說明", "單位", "數量", "單價", "金額","項目代碼"]],  # 只顯示這幾個欄位
-                        hide_index=True,  # 隱藏索引
-                        use_container_width=True  # 使用容器寬度
-                    )
+                    with stage("render", items=len(pay_items_df)):
+                        st.dataframe(
+                            pay_items_df[["項次","說明", "單位", "數量", "單價", "金額","項目代碼"]],  # 只顯示這幾個欄位
+                            hide_index=True,  # 隱藏索引
+                            use_container_width=True  # 使用容器寬度
+                        )
                     
-                    import io
-
-                    # 確保 data/output 目錄存在
-                    output_dir = os.path.join("data", "output")
-                    os.makedirs(output_dir, exist_ok=True)  # 自動建立資料夾
-
-                    # 設定 CSV 檔案路徑
-                    csv_path = os.path.join(output_dir, "DetailedPriceSheet.csv")
-
-                    # 儲存 CSV 檔案
-                    pay_items_df.to_csv(csv_path, index=False, encoding="utf-8-sig")
-
-                    # 用 BytesIO 避免文件佔用問題
-                    with open(csv_path, "rb") as f:
-                        csv_bytes = io.BytesIO(f.read())
-
-                    # 下載按鈕
+                    # 下載按鈕：按下時才轉換，結果依附於文件快取
                     st.download_button(
                         label="下載 CSV",
-                        data=csv_bytes,
+                        data=lambda: get_detailed_price_csv(document),
                         file_name="DetailedPriceSheet.csv",
                         mime="text/csv",
                         type="primary"
                     )
+                    st.download_button(
+                        label="下載 Parquet",
+                        data=lambda: get_detailed_price_parquet(document),
+                        file_name="DetailedPriceSheet.parquet",
+                        mime="application/vnd.apache.parquet"
+                    )
+                    breakdowns_parquet = get_pay_item_breakdowns_parquet(document)
+                    if breakdowns_parquet is not None:
+                        st.download_button(
+                            label="下載含單價分析細項 Parquet",
+                            data=breakdowns_parquet,
+                            file_name="DetailedPriceSheetBreakdown.parquet",
+                            mime="application/vnd.apache.parquet"
+                        )
             
             with subtab3:
                 st.header("單價分析")
-                work_items_data = XMLProcessor.process_xml_file(input_path, "WorkItem")
-                if work_items_data:
-                    analysis_tables = process_analysis_data(tree_data)
-                    # 簡化為只有說明文字搜尋，並添加placeholder提示
-                    search_desc = st.text_input("搜尋說明文字(查看全部請輸入空格)", placeholder="輸入要搜尋的說明文字...")
+                if document.item_count("WorkItem"):
+                    analysis_tables, search_index = get_analysis_index(document)
+                    # 以項目代碼或說明文字搜尋，並添加placeholder提示
+                    search_desc = st.text_input("搜尋項目代碼或說明文字(查看全部請留空)", placeholder="輸入要搜尋的項目代碼或說明文字...")
                     
-                    # 根據說明文字篩選分析表
-                    filtered_tables = {}
-                    for key, table in analysis_tables.items():
-                        if search_desc.lower() in table['主項']['說明'].lower():
-                            filtered_tables[key] = table
+                    # 由預先建立的索引篩選分析表
+                    matched_keys = search_index.search(search_desc)
                     
-                    if filtered_tables:
-                        for key, table in filtered_tables.items():
-                            # with st.container(border=True):
-                                # st.markdwon("🔹 "+ key)
-                            with st.expander("🔵 " +key, expanded=True):
-                                # 主項資料
-                                # st.markdown("### 主項")
-                                # main_df = pd.DataFrame([table['主項']])
-                                # 格式化金額和單價
-                                # main_df['金額'] = main_df['金額'].apply(lambda x: '{:,.0f}'.format(float(x)) if pd.notnull(x) else x)
-                                # main_df['單價'] = main_df['單價'].apply(lambda x: '{:,.0f}'.format(float(x)) if pd.notnull(x) else x)
-                                # st.dataframe(
-                                #     main_df[["項目代碼", "說明", "單位", "數量", "單價", "金額"]],
-                                #     hide_index=True,
-                                #     use_container_width=True
-                                # )
-
-                                # 細項資料
-                                if table['細項']:
-                                    # st.markdown("### 細項")
-                                    detail_df = pd.DataFrame(table['細項'])
-                                    # 格式化金額和單價
-                                    detail_df['金額'] = detail_df['金額'].apply(lambda x: '{:,.0f}'.format(float(x)) if pd.notnull(x) else x)
-                                    detail_df['單價'] = detail_df['單價'].apply(lambda x: '{:,.0f}'.format(float(x)) if pd.notnull(x) else x)
-                                    st.dataframe(
-                                        detail_df[["項目代碼", "說明", "單位", "數量", "單價", "金額"]],
-                                        hide_index=True,
-                                        use_container_width=True
-                                    )
+                    if matched_keys:
+                        # 分頁顯示，每頁只列出標題，展開時才建立細項表格
+                        page_count = math.ceil(len(matched_keys) / ANALYSIS_PAGE_SIZE)
+                        if st.session_state.get('analysis_query') != search_desc or st.session_state.get('analysis_page', 1) > page_count:
+                            st.session_state['analysis_page'] = 1
+                        st.session_state['analysis_query'] = search_desc
+                        page = st.number_input(
+                            f"頁數（共 {page_count} 頁，{len(matched_keys)} 筆分析）",
+                            min_value=1, max_value=page_count, step=1, key="analysis_page"
+                        )
+                        page_start = (page - 1) * ANALYSIS_PAGE_SIZE
+                        for key in matched_keys[page_start:page_start + ANALYSIS_PAGE_SIZE]:
+                            with st.container(border=True):
+                                if st.toggle("🔵 " + key, key=f"analysis_open_{key}"):
+                                    render_analysis_detail(analysis_tables[key])
                     else:
                         st.info("沒有符合搜尋條件的分析表")
+
+                    # 按下時才展開完整的樹並轉換（另一個執行緒中執行，結果依附於文件快取）
+                    st.download_button(
+                        label="下載單價分析 Parquet",
+                        data=lambda: get_cost_breakdown_parquet(document),
+                        file_name="CostBreakdown.parquet",
+                        mime="application/vnd.apache.parquet"
+                    )
                     
                     # # 準備 CSV 下載
                     # csv_path = os.path.join('data', 'output', 'UnitPriceAnalysis.csv')
@@ -330,6 +447,29 @@ def main():
                     #         file_name="UnitPriceAnalysis.csv",
                     #         mime="text/csv"
                     #     )
+
+            with subtab4:
+                st.header("版本比較")
+                other_files = st.file_uploader(
+                    "選擇其他版本 XML（依版本順序，與目前檔案依序比較）",
+                    type=['xml'], accept_multiple_files=True, key="diff_uploader"
+                )
+                if other_files:
+                    digests = (get_upload_digest(xml_file), *(get_file_digest(f) for f in other_files))
+                    names = [xml_file.name, *(f.name for f in other_files)]
+                    show_unchanged = st.checkbox("顯示未變更的項目", value=False)
+                    for old_index, new_index, diff in get_version_diffs(digests, document, other_files):
+                        render_version_diff(names[old_index], names[new_index], diff, show_unchanged)
+                else:
+                    st.info("上傳其他版本（例如契約、變更設計）以比較數量、單價與金額差異")
+
+            with subtab5:
+                st.header("資源統計")
+                resources_df = get_resource_summary(document)
+                if len(resources_df):
+                    render_resource_summary(resources_df)
+                else:
+                    st.info("沒有可展開的單價分析資料")
         else:
             st.warning("請上傳 XML 檔案", icon="⚠️")
     # with tab2:
@@ -395,6 +535,72 @@ def main():
     #             """)
 
 
+def render_resource_summary(resources_df):
+    """顯示各類別金額合計與資源用量明細"""
+    category_totals = resources_df.groupby('類別', sort=False)['金額'].sum()
+    columns = st.columns(len(category_totals))
+    for column, (category, amount) in zip(columns, category_totals.items()):
+        column.metric(category, f"{amount:,.0f}")
+    categories = st.multiselect("類別", list(category_totals.index), default=list(category_totals.index))
+    filtered_df = resources_df[resources_df['類別'].isin(categories)]
+    with stage("format", items=len(filtered_df)):
+        display_df = format_for_display(filtered_df)
+        display_df = display_df.assign(總數量=format_thousands(filtered_df['總數量'], 2))
+    with stage("render", items=len(display_df)):
+        st.dataframe(display_df, hide_index=True, use_container_width=True)
+    st.download_button(
+        label="下載資源統計 CSV",
+        data=resources_df.to_csv(index=False).encode("utf-8-sig"),
+        file_name="ResourceSummary.csv",
+        mime="text/csv"
+    )
+
+def render_amount_validation(discrepancies):
+    """顯示金額檢核結果（數量×單價、下層合計與小計）"""
+    if not len(discrepancies):
+        st.success("金額檢核：數量×單價、上層與小計金額皆一致")
+        return
+    with st.expander(f"⚠️ 金額檢核：{len(discrepancies)} 筆金額不一致", expanded=False):
+        with stage("format", items=len(discrepancies)):
+            display_df = format_for_display(discrepancies, columns=['單價', '金額', '計算金額', '差額', '重算金額'])
+        with stage("render", items=len(display_df)):
+            st.dataframe(display_df, hide_index=True, use_container_width=True)
+        st.download_button(
+            label="下載檢核結果 CSV",
+            data=discrepancies.to_csv(index=False).encode("utf-8-sig"),
+            file_name="AmountValidation.csv",
+            mime="text/csv"
+        )
+
+def render_version_diff(old_name, new_name, diff, show_unchanged=False):
+    """顯示兩個版本的差異摘要與明細"""
+    st.subheader(f"{old_name} → {new_name}")
+    summary = diff_summary(diff)
+    columns = st.columns(4)
+    columns[0].metric("新增", summary['新增'])
+    columns[1].metric("刪除", summary['刪除'])
+    columns[2].metric("變更", summary['變更'])
+    columns[3].metric("金額差", f"{summary['金額差合計']:,.0f}")
+    if not show_unchanged:
+        diff = diff[diff['狀態'] != UNCHANGED]
+    if not len(diff):
+        st.info("兩個版本的項目沒有差異")
+        return
+    with stage("format", items=len(diff)):
+        display_df = format_for_display(diff, columns=['單價_舊', '單價_新', '單價差', '金額_舊', '金額_新', '金額差'])
+    with stage("render", items=len(display_df)):
+        st.dataframe(display_df, hide_index=True, use_container_width=True)
+    with stage("export", items=len(diff)):
+        csv_bytes = diff.to_csv(index=False).encode("utf-8-sig")
+    st.download_button(
+        label="下載差異 CSV",
+        data=csv_bytes,
+        file_name=f"Diff_{os.path.splitext(old_name)[0]}_{os.path.splitext(new_name)[0]}.csv",
+        mime="text/csv",
+        key=f"diff_csv_{old_name}_{new_name}"
+    )
+
+
 def show_info():
     with st.sidebar:
         SYSTEM_VERSION="V1.0"
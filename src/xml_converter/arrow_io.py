@@ -0,0 +1,150 @@
+import json
+import logging
+import os
+import shutil
+import uuid
+
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from .cache import content_digest
+from .cost_tree import CostTree
+from .document import PCCESDocument
+from .instrumentation import stage
+
+# 已解析文件的資料表名稱
+DOCUMENT_TABLES = ('pay_items', 'work_items', 'cost_breakdown')
+
+# 快取格式版本，欄位變更時遞增使舊快取失效
+CACHE_FORMAT_VERSION = 1
+
+logger = logging.getLogger("pcces.cache")
+
+
+def document_tables(document):
+    """返回文件的 PayItem、WorkItem 與單價分析資料表"""
+    return {
+        'pay_items': document.pay_items.to_dataframe(),
+        'work_items': document.work_items.to_dataframe(),
+        'cost_breakdown': document.cost_breakdown_frame(),
+    }
+
+
+def tables_document(tables):
+    """由 document_tables 格式的資料表建立文件（單價分析樹由攤平的資料表重建）"""
+    return PCCESDocument.from_tables(
+        tables['pay_items'],
+        tables['work_items'],
+        CostTree.from_frame(tables['cost_breakdown'])
+    )
+
+
+class ArrowDocumentCache:
+    """以 XML 內容 SHA-256 為鍵的磁碟快取
+
+    每份文件存為 <cache_dir>/<digest>/ 下未壓縮的 Arrow IPC 檔案，
+    重新開啟時以記憶體映射讀取，不再解析 XML。
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def path(self, digest):
+        return os.path.join(self.cache_dir, digest)
+
+    def __contains__(self, digest):
+        """快取是否存在且為目前的格式版本（舊版本的快取視為不存在，store 會覆寫）"""
+        return self._version(digest) == CACHE_FORMAT_VERSION
+
+    def _version(self, digest):
+        """快取的格式版本，不存在或無法讀取時返回 None"""
+        try:
+            with open(os.path.join(self.path(digest), 'meta.json'), encoding='utf-8') as f:
+                return json.load(f).get('version')
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    def load(self, digest):
+        """以記憶體映射讀取快取的文件，不存在或版本不符時返回 None"""
+        directory = self.path(digest)
+        with stage("cache_load") as record:
+            if digest not in self:
+                return None
+            try:
+                tables = {
+                    name: feather.read_table(os.path.join(directory, name + '.arrow'), memory_map=True)
+                        .to_pandas(split_blocks=True)
+                    for name in DOCUMENT_TABLES
+                }
+            except (OSError, ValueError, pa.ArrowException):
+                return None
+            record['items'] = len(tables['pay_items']) + len(tables['work_items'])
+            return tables_document(tables)
+
+    def store(self, digest, document):
+        """寫入文件的資料表；先寫入暫存目錄再改名，其他行程不會讀到寫到一半的快取
+
+        無法寫入（例如目錄唯讀或磁碟已滿）時拋出 OSError。
+        """
+        directory = self.path(digest)
+        if digest in self:
+            return directory
+        staging = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            staging = os.path.join(self.cache_dir, f".{digest}.{uuid.uuid4().hex}")
+            os.makedirs(staging)
+            with stage("cache_store"):
+                tables = document_tables(document)
+                for name, df in tables.items():
+                    # 不壓縮才能以記憶體映射直接引用
+                    feather.write_feather(df, os.path.join(staging, name + '.arrow'), compression='uncompressed')
+            with open(os.path.join(staging, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump({'version': CACHE_FORMAT_VERSION}, f)
+            shutil.rmtree(directory, ignore_errors=True)
+            os.replace(staging, directory)
+        except OSError:
+            # 其他行程已寫入相同的快取
+            if digest not in self:
+                raise
+        finally:
+            if staging is not None:
+                shutil.rmtree(staging, ignore_errors=True)
+        return directory
+
+    def get_or_parse(self, source, digest=None):
+        """快取命中時以記憶體映射開啟，否則解析 XML 並寫入快取
+
+        source 可為檔案路徑、bytes 或 BytesIO（例如 Streamlit 上傳檔案）。
+        快取只用於加速，無法寫入時記錄警告並返回未快取的文件。
+        """
+        if digest is None:
+            data = self._read_bytes(source)
+            digest = content_digest(data)
+            if not hasattr(source, 'getbuffer'):
+                # 路徑或一般檔案物件已讀入記憶體，直接由 bytes 解析
+                source = data
+        document = self.load(digest)
+        if document is None:
+            document = PCCESDocument(source)
+            try:
+                self.store(digest, document)
+            except OSError as e:
+                logger.warning("無法寫入 Arrow 快取 %s：%s", self.cache_dir, e)
+            # 寫入快取時已建立所有檢視，不再需要 XML 樹
+            document.release_xml()
+        return document
+
+    @staticmethod
+    def _read_bytes(source):
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return source
+        if hasattr(source, 'getbuffer'):
+            return source.getbuffer()
+        if hasattr(source, 'read'):
+            source.seek(0)
+            data = source.read()
+            source.seek(0)
+            return data
+        with open(source, 'rb') as f:
+            return f.read()
@@ -0,0 +1,141 @@
+import glob
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from .arrow_io import ArrowDocumentCache
+from .document import PCCESDocument
+from .excel_export import analysis_sheets, write_workbook
+from .instrumentation import stage
+
+# 支援的輸出格式與副檔名
+OUTPUT_FORMATS = {
+    'csv': '.csv',
+    'excel': '.xlsx',
+    'parquet': '.parquet',
+    'feather': '.feather',
+}
+
+# 輸出的項目種類與工作表名稱
+ITEM_SHEETS = (('PayItem', 'PayItems'), ('WorkItem', 'WorkItems'))
+
+# 單價分析樹攤平後的工作表名稱
+COST_BREAKDOWN_SHEET = 'CostBreakdown'
+
+
+def collect_inputs(patterns):
+    """將目錄或 glob 樣式展開為排序後的 XML 檔案清單（目錄會遞迴搜尋 *.xml）"""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, '**', '*.xml'), recursive=True)
+        else:
+            matches = glob.glob(pattern, recursive=True)
+        files.extend(path for path in matches if os.path.isfile(path))
+    return sorted(set(files))
+
+
+def output_names(input_files):
+    """以檔名（不含副檔名）作為輸出名稱，重複時加上序號"""
+    names = []
+    seen = {}
+    for path in input_files:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        count = seen.get(stem, 0) + 1
+        seen[stem] = count
+        names.append(stem if count == 1 else f"{stem}_{count}")
+    return names
+
+
+def write_tables(tables, output_dir, name, output_format, extra_sheets=()):
+    """寫出各工作表，返回輸出檔案路徑清單
+
+    Excel 格式寫為單一活頁簿，extra_sheets（例如每個分析表一張）接在 tables 之後。
+    """
+    extension = OUTPUT_FORMATS[output_format]
+    if output_format == 'excel':
+        path = os.path.join(output_dir, name + extension)
+        write_workbook(path, itertools.chain(tables.items(), extra_sheets))
+        return [path]
+
+    paths = []
+    for sheet_name, df in tables.items():
+        path = os.path.join(output_dir, f"{name}_{sheet_name}{extension}")
+        if output_format == 'csv':
+            df.to_csv(path, index=False, encoding='utf-8-sig')
+        elif output_format == 'feather':
+            df.to_feather(path, compression='zstd')
+        else:
+            df.to_parquet(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def open_document(input_path, cache_dir=None):
+    """開啟 XML 文件，指定 cache_dir 時先查詢 Arrow 磁碟快取"""
+    if cache_dir is None:
+        return PCCESDocument(input_path)
+    return ArrowDocumentCache(cache_dir).get_or_parse(input_path)
+
+
+def convert_file(input_path, output_dir, name, output_format='csv', cache_dir=None):
+    """轉換單一 XML 檔案（於工作行程中執行），返回摘要資料"""
+    start = time.perf_counter()
+    summary = {
+        'file': input_path,
+        'status': 'ok',
+        'pay_items': 0,
+        'work_items': 0,
+        'seconds': 0.0,
+        'outputs': '',
+        'error': '',
+    }
+    try:
+        document = open_document(input_path, cache_dir)
+        tables = {}
+        for item_type, sheet_name in ITEM_SHEETS:
+            df = document.to_dataframe(item_type)
+            if df is not None:
+                tables[sheet_name] = df
+        if len(document.cost_graph):
+            tables[COST_BREAKDOWN_SHEET] = document.cost_breakdown_frame()
+        summary['pay_items'] = document.item_count("PayItem")
+        summary['work_items'] = document.item_count("WorkItem")
+        extra_sheets = analysis_sheets(document.cost_graph) if output_format == 'excel' else ()
+        with stage("export", items=summary['pay_items'] + summary['work_items']):
+            outputs = write_tables(tables, output_dir, name, output_format, extra_sheets)
+        summary['outputs'] = ';'.join(outputs)
+    except Exception as e:
+        summary['status'] = 'error'
+        summary['error'] = f"{type(e).__name__}: {e}"
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+
+def run_batch(input_files, output_dir, output_format='csv', workers=None, progress=None, cache_dir=None):
+    """以行程池平行轉換多個 XML 檔案，返回依輸入順序排列的摘要 DataFrame
+
+    progress(完成數, 總數, 摘要) 會在每個檔案完成時呼叫；
+    指定 cache_dir 時已轉換過的 XML 直接由 Arrow 磁碟快取讀取。
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"不支援的輸出格式：{output_format}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    names = output_names(input_files)
+    summaries = [None] * len(input_files)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(convert_file, path, output_dir, name, output_format, cache_dir): index
+            for index, (path, name) in enumerate(zip(input_files, names))
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            summary = future.result()
+            summaries[futures[future]] = summary
+            if progress is not None:
+                progress(done, len(input_files), summary)
+
+    return pd.DataFrame(summaries, columns=['file', 'status', 'pay_items', 'work_items', 'seconds', 'outputs', 'error'])
@@ -0,0 +1,74 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def content_digest(data):
+    """計算上傳內容的 SHA-256"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class DocumentCache:
+    """以內容 SHA-256 為鍵的已解析文件快取，總記憶體超過上限時淘汰最久未使用的項目"""
+
+    def __init__(self, max_bytes=1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, digest):
+        return digest in self._entries
+
+    def get(self, digest):
+        """取得快取的文件並標記為最近使用，不存在時返回 None"""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            self._entries.move_to_end(digest)
+            return entry[0]
+
+    def put(self, digest, document, size):
+        """加入文件，size 為估計的記憶體用量（位元組）"""
+        with self._lock:
+            old = self._entries.pop(digest, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            self._entries[digest] = (document, size)
+            self.total_bytes += size
+            self._evict()
+
+    def resize(self, digest, size):
+        """更新既有文件的記憶體用量並標記為最近使用（文件建立新的檢視後呼叫），不存在時忽略"""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return
+            self.total_bytes += size - entry[1]
+            self._entries[digest] = (entry[0], size)
+            self._entries.move_to_end(digest)
+            self._evict()
+
+    def _evict(self):
+        """淘汰最久未使用的文件直到總量不超過上限，至少保留最近使用的文件（呼叫端持有鎖）"""
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+
+    def get_or_load(self, digest, loader):
+        """快取命中時直接返回，否則呼叫 loader() 解析並加入快取
+
+        文件大小以 document.nbytes（實際建立的檢視、衍生資料與仍保留的 XML 樹）計算；
+        文件在上次使用後才建立的檢視，於每次命中時重新計入。
+        """
+        document = self.get(digest)
+        if document is None:
+            document = loader()
+            self.put(digest, document, document.nbytes)
+        else:
+            self.resize(digest, document.nbytes)
+        return document
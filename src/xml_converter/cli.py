@@ -0,0 +1,173 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+import pandas as pd
+
+from .batch import OUTPUT_FORMATS, collect_inputs, open_document, output_names, run_batch, write_tables
+from .diff import UNCHANGED, diff_summary, diff_versions
+from .instrumentation import PROFILE_ENV
+from .service import JobService
+from .validation import DEFAULT_TOLERANCE, validate_amounts
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="pcces-convert",
+        description="批次轉換 PCCES eTender XML 檔案"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert = subparsers.add_parser("convert", help="將 XML 轉換為 CSV、Excel、Parquet 或 Feather")
+    convert.add_argument("inputs", nargs="+", help="XML 檔案、目錄或 glob 樣式（例如 'archive/**/*.xml'）")
+    convert.add_argument("-o", "--output-dir", default=os.path.join("data", "output"), help="輸出目錄")
+    convert.add_argument("-f", "--format", choices=sorted(OUTPUT_FORMATS), default="csv", help="輸出格式")
+    convert.add_argument("-j", "--workers", type=int, default=os.cpu_count(), help="工作行程數（預設為 CPU 核心數）")
+    convert.add_argument("--summary", default="summary.csv", help="摘要報告檔名（寫在輸出目錄）")
+    convert.add_argument("--cache-dir", default=None, help="Arrow 磁碟快取目錄，已轉換過的 XML 不再解析")
+    convert.add_argument("--profile", action="store_true", help="以 JSON 將各階段耗時與記憶體變化輸出到 stderr")
+    convert.set_defaults(handler=run_convert)
+
+    diff = subparsers.add_parser("diff", help="比較同一標案的多個預算版本（依序比較相鄰版本）")
+    diff.add_argument("inputs", nargs="+", help="依版本順序排列的 XML 檔案（例如 設計 契約 變更設計）")
+    diff.add_argument("-o", "--output-dir", default=os.path.join("data", "output"), help="輸出目錄")
+    diff.add_argument("-f", "--format", choices=sorted(OUTPUT_FORMATS), default="csv", help="輸出格式")
+    diff.add_argument("-j", "--workers", type=int, default=os.cpu_count(), help="平行解析的行程數（預設為 CPU 核心數）")
+    diff.add_argument("--all", action="store_true", help="輸出包含未變更的項目")
+    diff.add_argument("--cache-dir", default=None, help="Arrow 磁碟快取目錄，已轉換過的 XML 不再解析")
+    diff.add_argument("--profile", action="store_true", help="以 JSON 將各階段耗時與記憶體變化輸出到 stderr")
+    diff.set_defaults(handler=run_diff)
+
+    validate = subparsers.add_parser("validate", help="檢核 PayItem 金額：數量×單價、上層與下層合計、小計")
+    validate.add_argument("inputs", nargs="+", help="XML 檔案、目錄或 glob 樣式")
+    validate.add_argument("-o", "--output", default=None, help="將差異列表寫入 CSV（多個檔案時加上 檔案 欄位）")
+    validate.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="容許誤差（元）")
+    validate.add_argument("--cache-dir", default=None, help="Arrow 磁碟快取目錄，已轉換過的 XML 不再解析")
+    validate.set_defaults(handler=run_validate)
+
+    serve = subparsers.add_parser("serve", help="啟動上傳處理服務：以 HTTP 接收 XML，解析與匯出工作由行程池執行")
+    serve.add_argument("--host", default="127.0.0.1", help="監聽位址")
+    serve.add_argument("--port", type=int, default=8765, help="監聽埠號")
+    serve.add_argument("-j", "--workers", type=int, default=os.cpu_count(), help="工作行程數，即同時執行的工作數（預設為 CPU 核心數）")
+    serve.add_argument("--data-dir", default=os.path.join("data", "service"), help="上傳暫存與匯出結果目錄")
+    serve.add_argument("--cache-dir", default=os.path.join("data", "cache"), help="Arrow 磁碟快取目錄（與網頁介面共用）")
+    serve.add_argument("--max-queue", type=int, default=64, help="佇列中最多等待的工作數，超過時回應 503")
+    serve.set_defaults(handler=run_serve)
+
+    return parser
+
+
+def print_progress(done, total, summary):
+    status = "ok" if summary['status'] == 'ok' else f"錯誤 {summary['error']}"
+    print(
+        f"[{done:>{len(str(total))}}/{total}] {summary['file']}  "
+        f"{summary['pay_items'] + summary['work_items']} 筆  {summary['seconds']:.2f}s  {status}",
+        file=sys.stderr
+    )
+
+
+def run_convert(args):
+    input_files = collect_inputs(args.inputs)
+    if not input_files:
+        print("找不到符合的 XML 檔案", file=sys.stderr)
+        return 1
+
+    if args.profile:
+        # 工作行程由環境變數啟用量測
+        os.environ[PROFILE_ENV] = "1"
+
+    start = time.perf_counter()
+    summary = run_batch(
+        input_files, args.output_dir, args.format, args.workers,
+        progress=print_progress, cache_dir=args.cache_dir
+    )
+    elapsed = time.perf_counter() - start
+
+    summary_path = os.path.join(args.output_dir, args.summary)
+    summary.to_csv(summary_path, index=False, encoding='utf-8-sig')
+
+    failed = int((summary['status'] != 'ok').sum())
+    print(
+        f"完成 {len(summary) - failed}/{len(summary)} 個檔案，失敗 {failed} 個，"
+        f"耗時 {elapsed:.1f}s（{len(summary) / elapsed:.1f} 檔/秒），摘要：{summary_path}",
+        file=sys.stderr
+    )
+    return 1 if failed else 0
+
+
+def run_diff(args):
+    if len(args.inputs) < 2:
+        print("至少需要兩個版本才能比較", file=sys.stderr)
+        return 1
+    missing = [path for path in args.inputs if not os.path.isfile(path)]
+    if missing:
+        print(f"找不到檔案：{', '.join(missing)}", file=sys.stderr)
+        return 1
+
+    if args.profile:
+        os.environ[PROFILE_ENV] = "1"
+
+    start = time.perf_counter()
+    results = diff_versions(args.inputs, args.workers, args.cache_dir)
+    os.makedirs(args.output_dir, exist_ok=True)
+    names = output_names(args.inputs)
+    for old_index, new_index, diff in results:
+        summary = diff_summary(diff)
+        if not args.all:
+            diff = diff[diff['狀態'] != UNCHANGED]
+        outputs = write_tables({'Diff': diff}, args.output_dir, f"{names[old_index]}__{names[new_index]}", args.format)
+        print(
+            f"{args.inputs[old_index]} → {args.inputs[new_index]}：新增 {summary['新增']}、刪除 {summary['刪除']}、"
+            f"變更 {summary['變更']}、相同 {summary['相同']}，金額差 {summary['金額差合計']:,.0f}  {';'.join(outputs)}"
+        )
+    print(f"完成 {len(results)} 組比較，耗時 {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 0
+
+
+def run_validate(args):
+    input_files = collect_inputs(args.inputs)
+    if not input_files:
+        print("找不到符合的 XML 檔案", file=sys.stderr)
+        return 1
+
+    reports = []
+    failed = []
+    for path in input_files:
+        # 單一檔案無法解析時記錄錯誤並繼續檢核其他檔案（與批次轉換相同）
+        try:
+            document = open_document(path, args.cache_dir)
+            discrepancies = validate_amounts(document.to_dataframe("PayItem"), args.tolerance)
+        except Exception as e:
+            print(f"{path}：{type(e).__name__}: {e}", file=sys.stderr)
+            failed.append(path)
+            continue
+        print(f"{path}：{document.item_count('PayItem')} 筆，{len(discrepancies)} 筆金額不一致")
+        for row in discrepancies.head(20).itertuples(index=False):
+            print(f"  [{row.檢核}] {row.項次路徑} {row.說明}：金額 {row.金額:,.2f}，計算 {row.計算金額:,.2f}，差額 {row.差額:,.2f}")
+        if len(discrepancies) > 20:
+            print(f"  ……另有 {len(discrepancies) - 20} 筆")
+        reports.append(discrepancies.assign(檔案=path))
+
+    if args.output and reports:
+        pd.concat(reports, ignore_index=True).to_csv(args.output, index=False, encoding='utf-8-sig')
+    if failed:
+        print(f"完成 {len(input_files) - len(failed)}/{len(input_files)} 個檔案，無法讀取 {len(failed)} 個", file=sys.stderr)
+    return 1 if failed or any(len(report) for report in reports) else 0
+
+
+def run_serve(args):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    service = JobService(args.data_dir, args.cache_dir, args.workers, args.max_queue)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
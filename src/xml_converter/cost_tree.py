@@ -0,0 +1,508 @@
+import hashlib
+import sys
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from lxml import etree as ET
+
+from .item_store import strings_nbytes
+from .xml_processor import NAMESPACES, _NS, XMLProcessor
+
+# 節點欄位（與 process_cost_breakdown_root 的字典鍵相同）
+NODE_FIELDS = (
+    'item_code', 'ref_item_no', 'item_kind', 'description', 'unit',
+    'quantity', 'price', 'amount', 'output_quantity'
+)
+
+# 攤平後資料表的欄位（前序排列，以 depth 還原上下層關係）
+COST_BREAKDOWN_COLUMNS = ['id', 'parent', *NODE_FIELDS, 'depth']
+
+# 單價分析表格使用的中文欄位
+DETAIL_COLUMNS = {
+    'item_code': '項目代碼',
+    'ref_item_no': '參考編號',
+    'item_kind': '項目種類',
+    'description': '說明',
+    'unit': '單位',
+    'quantity': '數量',
+    'price': '單價',
+    'amount': '金額',
+    'output_quantity': '分析產出數量',
+}
+
+_WORK_ITEM_TAG = _NS + "WorkItem"
+# 每次引用分析時各自不同的欄位（不屬於分析定義）
+_OCCURRENCE_TAGS = (_NS + "Quantity", _NS + "Amount")
+
+
+def _read_work_item(node):
+    """讀取 WorkItem 的節點欄位值（NODE_FIELDS 順序）與直接子節點"""
+    attrib = node.attrib
+    fields, subnodes = XMLProcessor.read_children(node)
+    values = (
+        sys.intern(attrib.get("itemCode", "")),
+        attrib.get("refItemNo", ""),
+        sys.intern(attrib.get("itemKind", "")),
+        fields.get('description', ""),
+        sys.intern(fields.get('unit', "")),
+        fields.get('quantity', ""),
+        fields.get('price', ""),
+        fields.get('amount', ""),
+        attrib.get("analysisOutputQuantity", ""),
+    )
+    return values, subnodes
+
+
+class _CostGraph:
+    """CostTree 與 CostDag 共用的查詢方法
+
+    子類別提供 fields、code_index、children()、has_children()、definition_of()、
+    child_offsets() 與 analysis_occurrences()。
+    """
+
+    @property
+    def nbytes(self):
+        """節點欄位字串、索引陣列與代碼索引佔用的估計位元組數"""
+        total = sum(map(strings_nbytes, self.fields.values())) + sys.getsizeof(self.code_index)
+        for value in vars(self).values():
+            if isinstance(value, (array, bytearray)):
+                total += len(value) * (value.itemsize if isinstance(value, array) else 1)
+            elif isinstance(value, np.ndarray):
+                total += value.nbytes
+        return total
+
+    def find(self, item_code):
+        """項目代碼對應的第一個節點索引，不存在時返回 None"""
+        return self.code_index.get(item_code.strip())
+
+    def lookup(self, item_codes):
+        """批次查詢項目代碼（例如 PayItem 的 refItemCode），返回節點索引陣列，找不到為 -1"""
+        get = self.code_index.get
+        return np.fromiter((get(code.strip() or None, -1) for code in item_codes), dtype=np.int32, count=len(item_codes))
+
+    def node(self, index):
+        """節點欄位字典（不含子節點）"""
+        return {field: values[index] for field, values in self.fields.items()}
+
+    def row(self, index, fields=NODE_FIELDS):
+        """以中文欄名返回節點資料"""
+        return {DETAIL_COLUMNS[field]: self.fields[field][index] for field in fields}
+
+    def expand_children(self, nodes):
+        """批次展開節點的直接子節點，返回 (positions, children)
+
+        nodes 為 lookup 的結果（-1 表示沒有對應），每個子節點對應一筆輸出，
+        positions 為其在 nodes 中的位置；全部以陣列運算完成，耗時與輸出筆數成正比。
+        """
+        offsets, children = self.child_offsets()
+        nodes = np.asarray(nodes, dtype=np.int64)
+        matched = nodes >= 0
+        safe = np.where(matched, nodes, 0)
+        starts = offsets[safe]
+        counts = np.where(matched, offsets[safe + 1] - starts, 0)
+        positions = np.repeat(np.arange(len(nodes)), counts)
+        # 每筆輸出在所屬節點子節點中的序號
+        within = np.arange(len(positions)) - np.repeat(np.cumsum(counts) - counts, counts)
+        return positions, children[np.repeat(starts, counts) + within]
+
+    def analysis_details(self):
+        """依前序返回每個分析項目出現處的 (節點索引, 細項索引列表)
+
+        細項為以該分析為最近分析祖先的非分析節點；共用同一定義的分析只展開一次。
+        """
+        memo = {}
+        details = []
+        for index in self.analysis_occurrences():
+            definition = self.definition_of(index)
+            if definition not in memo:
+                memo[definition] = self._analysis_detail_ids(index)
+            details.append((index, memo[definition]))
+        return details
+
+    def _analysis_detail_ids(self, index):
+        """前序走訪分析節點的下層，不進入巢狀分析"""
+        kinds = self.fields['item_kind']
+        details = []
+        stack = list(self.children(index))[::-1]
+        while stack:
+            node = stack.pop()
+            if kinds[node] == 'analysis':
+                continue
+            details.append(node)
+            stack.extend(list(self.children(node))[::-1])
+        return details
+
+
+class CostTree(_CostGraph):
+    """以前序排列的平面陣列表示單價分析樹
+
+    parent、first_child、next_sibling 為節點索引（-1 表示沒有），
+    subtree_size 讓子樹成為連續區間 [i, i + subtree_size[i])，
+    code_index 對應去除前後空白的項目代碼到第一個出現的節點（與遞迴搜尋的結果相同），
+    PayItem 的 refItemCode 常以空白補齊長度，查詢時同樣去除空白。
+    """
+
+    def __init__(self):
+        self.parent = array('i')
+        self.first_child = array('i')
+        self.next_sibling = array('i')
+        self.depth = array('i')
+        self.subtree_size = array('i')
+        self.fields = {field: [] for field in NODE_FIELDS}
+        self.code_index = {}
+        self._last_child = []
+        self._last_root = -1
+
+    def __len__(self):
+        return len(self.parent)
+
+    def _append(self, parent, values):
+        """依前序加入節點並返回其索引"""
+        index = len(self.parent)
+        self.parent.append(parent)
+        self.first_child.append(-1)
+        self.next_sibling.append(-1)
+        self.depth.append(self.depth[parent] + 1 if parent >= 0 else 0)
+        self.subtree_size.append(1)
+        self._last_child.append(-1)
+        for field, value in zip(NODE_FIELDS, values):
+            self.fields[field].append(value)
+        self.code_index.setdefault(values[0].strip(), index)
+
+        previous = self._last_child[parent] if parent >= 0 else self._last_root
+        if previous >= 0:
+            self.next_sibling[previous] = index
+        elif parent >= 0:
+            self.first_child[parent] = index
+        if parent >= 0:
+            self._last_child[parent] = index
+        else:
+            self._last_root = index
+        return index
+
+    def _finish(self):
+        """由後往前累加子樹大小，並釋放建立時的暫存資料"""
+        size = self.subtree_size
+        parent = self.parent
+        for index in range(len(parent) - 1, 0, -1):
+            if parent[index] >= 0:
+                size[parent[index]] += size[index]
+        self._last_child = []
+        return self
+
+    @classmethod
+    def from_xml_root(cls, root):
+        """由已解析的 XML 根節點建立，每個節點只讀取一次直接子節點"""
+        tree = cls()
+        cost_breakdown = root.find(".//ns:CostBreakdownList", NAMESPACES)
+        if cost_breakdown is None:
+            return tree._finish()
+        # 堆疊元素：(節點, 上層索引)，反向推入以維持文件順序
+        stack = [(node, -1) for node in reversed(cost_breakdown.findall("./ns:WorkItem", NAMESPACES))]
+        while stack:
+            node, parent = stack.pop()
+            values, subnodes = _read_work_item(node)
+            index = tree._append(parent, values)
+            stack.extend((child, index) for child in reversed(subnodes) if child.tag == _WORK_ITEM_TAG)
+        return tree._finish()
+
+    @classmethod
+    def from_frame(cls, frame):
+        """由 to_dataframe 的結果（前序排列並含 depth 欄位）建立"""
+        tree = cls()
+        values = [frame[field].tolist() for field in NODE_FIELDS]
+        # 各層目前的節點索引
+        path = []
+        for i, depth in enumerate(frame['depth'].tolist()):
+            del path[depth:]
+            path.append(tree._append(path[-1] if path else -1, [column[i] for column in values]))
+        return tree._finish()
+
+    @classmethod
+    def from_nested(cls, tree_data):
+        """由 process_cost_breakdown_root 的巢狀字典建立"""
+        tree = cls()
+        stack = [(node, -1) for node in reversed(tree_data)]
+        while stack:
+            node, parent = stack.pop()
+            index = tree._append(parent, [node[field] for field in NODE_FIELDS])
+            stack.extend((child, index) for child in reversed(node['children']))
+        return tree._finish()
+
+    def roots(self):
+        """頂層節點索引"""
+        index = 0 if len(self) else -1
+        while index >= 0:
+            yield index
+            index = self.next_sibling[index]
+
+    def children(self, index):
+        """直接子節點索引"""
+        child = self.first_child[index]
+        while child >= 0:
+            yield child
+            child = self.next_sibling[child]
+
+    def has_children(self, index):
+        """是否有下層節點"""
+        return self.first_child[index] >= 0
+
+    def definition_of(self, index):
+        """節點共用的分析定義節點索引（樹狀結構中每個節點各自獨立）"""
+        return index
+
+    def analysis_occurrences(self):
+        """分析項目節點索引（前序）"""
+        kinds = self.fields['item_kind']
+        return (index for index in range(len(self)) if kinds[index] == 'analysis')
+
+    def subtree(self, index):
+        """子樹（含自身）的節點索引區間"""
+        return range(index, index + self.subtree_size[index])
+
+    def child_offsets(self):
+        """以 CSR 形式返回所有節點的直接子節點 (offsets, children)
+
+        節點 i 的子節點依文件順序為 children[offsets[i]:offsets[i + 1]]。
+        """
+        parent = np.frombuffer(self.parent, dtype=np.int32) if len(self) else np.empty(0, dtype=np.int32)
+        # 穩定排序保留前序（文件）順序；頂層節點 parent 為 -1，排在最前面
+        children = np.argsort(parent, kind='stable').astype(np.int32)
+        counts = np.bincount(parent[parent >= 0], minlength=len(self))
+        offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        offsets += len(self) - counts.sum()
+        return offsets, children
+
+    def path_ids(self):
+        """每個節點以項目代碼串接的路徑 id（例如 A/B/C），與舊版巢狀結構的 id 相同"""
+        codes = self.fields['item_code']
+        ids = []
+        for index, parent in enumerate(self.parent):
+            ids.append(f"{ids[parent]}/{codes[index]}" if parent >= 0 else codes[index])
+        return ids
+
+    def to_dataframe(self):
+        """攤平為前序排列的 DataFrame（欄位文字維持原樣）"""
+        ids = self.path_ids()
+        columns = {
+            'id': ids,
+            'parent': [ids[parent] if parent >= 0 else "" for parent in self.parent],
+            **self.fields,
+            'depth': pd.array(self.depth, dtype='int32'),
+        }
+        return pd.DataFrame(columns, columns=COST_BREAKDOWN_COLUMNS)
+
+    def to_nested(self):
+        """還原為 process_cost_breakdown_root 的巢狀字典結構"""
+        ids = self.path_ids()
+        nodes = []
+        result = []
+        for index, parent in enumerate(self.parent):
+            node = {'id': ids[index], 'parent': ids[parent] if parent >= 0 else ""}
+            node.update(self.node(index))
+            node['children'] = []
+            nodes.append(node)
+            (nodes[parent]['children'] if parent >= 0 else result).append(node)
+        return result
+
+
+def _subtree_key(item_code, node):
+    """共用分析的鍵：項目代碼與分析定義內容的雜湊
+
+    只雜湊分析本身的定義（其他屬性、說明、單價與下層子樹），
+    不含每次引用時不同的 refItemNo 屬性與自身的數量、金額。
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for name, value in node.attrib.items():
+        if name != "refItemNo":
+            digest.update(f"{name}={value}\0".encode())
+    for child in node:
+        if child.tag not in _OCCURRENCE_TAGS:
+            digest.update(ET.tostring(child, with_tail=False))
+    return item_code, digest.digest()
+
+
+class CostDag(_CostGraph):
+    """共用子樹只存一份的單價分析圖（有向無環圖）
+
+    分析項目（analysis）以 (項目代碼, 分析定義內容雜湊) 為鍵，定義相同的分析（例如多處引用的
+    標準混凝土配比分析）下層只讀取並儲存一次。之後每次引用仍各有一個節點，保存該次的
+    參考編號、數量與金額，definition 指向第一次出現的節點並共用其 children。
+    節點索引依出現的前序編號；children 以 CSR 陣列儲存，roots 為頂層節點。
+    需要完整樹狀結構（顯示或匯出）時才以 expand() 展開為 CostTree。
+    """
+
+    def __init__(self):
+        self.fields = {field: [] for field in NODE_FIELDS}
+        self.code_index = {}
+        self.root_nodes = array('i')
+        self.definition = array('i')
+        self.child_start = array('i', [0])
+        self.edges = array('i')
+        self._children = []
+        self._contains_analysis = None
+
+    def __len__(self):
+        return len(self.fields['item_code'])
+
+    def _add(self, values):
+        index = len(self)
+        for field, value in zip(NODE_FIELDS, values):
+            self.fields[field].append(value)
+        self.code_index.setdefault(values[0].strip(), index)
+        self.definition.append(index)
+        self._children.append([])
+        return index
+
+    def _link(self, parent, index):
+        if parent < 0:
+            self.root_nodes.append(index)
+        else:
+            self._children[parent].append(index)
+
+    def _finish(self):
+        """將建立時的子節點列表轉為 CSR 陣列"""
+        for children in self._children:
+            self.edges.extend(children)
+            self.child_start.append(len(self.edges))
+        self._children = []
+        return self
+
+    @classmethod
+    def from_xml_root(cls, root):
+        """由已解析的 XML 根節點建立；重複引用的分析只讀取自身欄位，下層只計算雜湊
+
+        項目代碼第一次出現時不計算雜湊，同一代碼再次出現時才比對兩者的定義雜湊，
+        沒有重複引用的文件只多一次字典查詢。
+        """
+        dag = cls()
+        cost_breakdown = root.find(".//ns:CostBreakdownList", NAMESPACES)
+        if cost_breakdown is None:
+            return dag._finish()
+        # 項目代碼 -> 第一次出現的 (元素, 節點索引)，計算過雜湊後改為 None
+        first_seen = {}
+        # (項目代碼, 定義雜湊) -> 定義節點索引
+        shared = {}
+        stack = [(node, -1) for node in reversed(cost_breakdown.findall("./ns:WorkItem", NAMESPACES))]
+        while stack:
+            node, parent = stack.pop()
+            values, subnodes = _read_work_item(node)
+            index = dag._add(values)
+            dag._link(parent, index)
+            if values[2] == "analysis":
+                code = values[0]
+                if code in first_seen:
+                    first = first_seen[code]
+                    if first is not None:
+                        shared[_subtree_key(code, first[0])] = first[1]
+                        first_seen[code] = None
+                    key = _subtree_key(code, node)
+                    definition = shared.setdefault(key, index)
+                    if definition != index:
+                        # 共用既有定義的下層，不再走訪子節點
+                        dag.definition[index] = definition
+                        continue
+                else:
+                    first_seen[code] = (node, index)
+            stack.extend((child, index) for child in reversed(subnodes) if child.tag == _WORK_ITEM_TAG)
+        return dag._finish()
+
+    def roots(self):
+        """頂層節點索引"""
+        return iter(self.root_nodes)
+
+    def children(self, index):
+        """直接子節點索引（共用定義的節點返回定義節點的子節點）"""
+        definition = self.definition[index]
+        return iter(self.edges[self.child_start[definition]:self.child_start[definition + 1]])
+
+    def has_children(self, index):
+        """是否有下層節點"""
+        definition = self.definition[index]
+        return self.child_start[definition + 1] > self.child_start[definition]
+
+    def definition_of(self, index):
+        """節點共用的分析定義節點索引"""
+        return self.definition[index]
+
+    def child_offsets(self):
+        """CSR 形式的直接子節點 (offsets, children)，與 CostTree.child_offsets 相同格式
+
+        共用定義的節點依 definition 取出定義節點的子節點區段，重新排成每個節點各自的區段。
+        """
+        if not len(self):
+            return np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int32)
+        start = np.frombuffer(self.child_start, dtype=np.int32).astype(np.int64)
+        edges = np.frombuffer(self.edges, dtype=np.int32) if len(self.edges) else np.empty(0, dtype=np.int32)
+        definition = np.frombuffer(self.definition, dtype=np.int32)
+        starts = start[definition]
+        counts = start[definition + 1] - starts
+        offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        within = np.arange(offsets[-1]) - np.repeat(offsets[:-1], counts)
+        return offsets, edges[np.repeat(starts, counts) + within]
+
+    def _postorder(self):
+        """所有節點的後序（子節點一定排在上層之前）"""
+        visited = bytearray(len(self))
+        order = []
+        for start in range(len(self)):
+            if visited[start]:
+                continue
+            visited[start] = 1
+            stack = [(start, self.children(start))]
+            while stack:
+                node, children = stack[-1]
+                for child in children:
+                    if not visited[child]:
+                        visited[child] = 1
+                        stack.append((child, self.children(child)))
+                        break
+                else:
+                    stack.pop()
+                    order.append(node)
+        return order
+
+    def expanded_sizes(self):
+        """每個節點展開後的子樹節點數（含自身）"""
+        sizes = array('q', [1]) * len(self)
+        for node in self._postorder():
+            sizes[node] += sum(sizes[child] for child in self.children(node))
+        return sizes
+
+    def expanded_len(self):
+        """展開為 CostTree 後的節點總數"""
+        sizes = self.expanded_sizes()
+        return sum(sizes[index] for index in self.root_nodes)
+
+    def analysis_occurrences(self):
+        """依展開後的前序產生每個分析項目出現處的節點索引，略過不含分析項目的子樹"""
+        kinds = self.fields['item_kind']
+        if self._contains_analysis is None:
+            contains = bytearray(len(self))
+            for node in self._postorder():
+                contains[node] = kinds[node] == 'analysis' or any(contains[child] for child in self.children(node))
+            self._contains_analysis = contains
+        contains = self._contains_analysis
+        stack = list(self.root_nodes)[::-1]
+        while stack:
+            node = stack.pop()
+            if not contains[node]:
+                continue
+            if kinds[node] == 'analysis':
+                yield node
+            stack.extend(list(self.children(node))[::-1])
+
+    def expand(self):
+        """展開為完整的 CostTree（與 CostTree.from_xml_root 的結果相同）"""
+        tree = CostTree()
+        fields = [self.fields[field] for field in NODE_FIELDS]
+        stack = [(node, -1) for node in reversed(self.root_nodes)]
+        while stack:
+            node, parent = stack.pop()
+            index = tree._append(parent, [values[node] for values in fields])
+            stack.extend((child, index) for child in list(self.children(node))[::-1])
+        return tree._finish()
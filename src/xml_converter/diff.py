@@ -0,0 +1,139 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .batch import open_document
+from .instrumentation import stage
+
+# 比對鍵：項次路徑（例如 壹/一/3）、去除空白的項目代碼，以及同鍵重複出現的序號
+KEY_COLUMNS = ['項次路徑', '項目代碼', '序號']
+
+# 比較的數值欄位
+VALUE_COLUMNS = ['數量', '單價', '金額']
+
+# 比對狀態
+ADDED = '新增'
+REMOVED = '刪除'
+CHANGED = '變更'
+UNCHANGED = '相同'
+
+DIFF_COLUMNS = [
+    '狀態', '項次路徑', '項次', '項目代碼', '項目種類', '說明', '單位',
+    '數量_舊', '數量_新', '數量差',
+    '單價_舊', '單價_新', '單價差',
+    '金額_舊', '金額_新', '金額差',
+]
+
+
+def item_paths(item_nos, depths):
+    """以階層堆疊將項次串接為路徑，區分不同章節下相同的項次"""
+    path = []
+    paths = []
+    for item_no, depth in zip(item_nos, depths):
+        del path[depth:]
+        path.append(item_no.strip())
+        paths.append("/".join(path))
+    return paths
+
+
+def version_table(document):
+    """取得文件 PayItem 的比對用資料表（含比對鍵），沒有資料時返回空表"""
+    df = document.to_dataframe("PayItem")
+    if df is None:
+        return pd.DataFrame(columns=[*KEY_COLUMNS, '項次', '項目種類', '說明', '單位', *VALUE_COLUMNS])
+    table = pd.DataFrame({
+        '項次路徑': item_paths(df['項次'].tolist(), df['階層'].tolist()),
+        '項目代碼': df['項目代碼'].str.strip(),
+        '項次': df['項次'],
+        '項目種類': df['項目種類'].astype(str),
+        '說明': df['說明'],
+        '單位': df['單位'].astype(str),
+        **{column: df[column] for column in VALUE_COLUMNS},
+    })
+    table['序號'] = table.groupby(['項次路徑', '項目代碼'], sort=False).cumcount()
+    return table
+
+
+def load_version(source, cache_dir=None):
+    """解析一個版本並返回比對用資料表（於工作行程中執行）"""
+    return version_table(open_document(source, cache_dir))
+
+
+def load_versions(sources, workers=None, cache_dir=None):
+    """以行程池平行解析多個版本，依輸入順序返回比對用資料表"""
+    workers = min(workers or os.cpu_count() or 1, len(sources))
+    if workers <= 1:
+        return [load_version(source, cache_dir) for source in sources]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(load_version, sources, [cache_dir] * len(sources)))
+
+
+def compare_tables(old, new):
+    """以比對鍵外部合併兩個版本，向量化計算數量、單價與金額差異
+
+    差異為新版減舊版；新增或刪除的項目缺少的一方以 0 計算，NaN 與 NaN 視為相同。
+    """
+    with stage("diff", items=len(old) + len(new)) as record:
+        merged = pd.merge(
+            old, new, on=KEY_COLUMNS, how='outer', suffixes=('_舊', '_新'), indicator=True, sort=False
+        )
+        indicator = merged['_merge'].to_numpy()
+        only_old = indicator == 'left_only'
+        only_new = indicator == 'right_only'
+
+        columns = {}
+        changed = np.zeros(len(merged), dtype=bool)
+        for column in VALUE_COLUMNS:
+            before = merged[f'{column}_舊'].to_numpy(dtype=np.float64, na_value=np.nan)
+            after = merged[f'{column}_新'].to_numpy(dtype=np.float64, na_value=np.nan)
+            columns[f'{column}_舊'] = before
+            columns[f'{column}_新'] = after
+            columns[f'{column}差'] = np.nan_to_num(after) - np.nan_to_num(before)
+            changed |= ~((before == after) | (np.isnan(before) & np.isnan(after)))
+
+        result = pd.DataFrame({
+            '狀態': np.select([only_old, only_new, changed], [REMOVED, ADDED, CHANGED], UNCHANGED),
+            '項次路徑': merged['項次路徑'],
+            '項次': merged['項次_新'].fillna(merged['項次_舊']),
+            '項目代碼': merged['項目代碼'],
+            '項目種類': merged['項目種類_新'].fillna(merged['項目種類_舊']),
+            '說明': merged['說明_新'].fillna(merged['說明_舊']),
+            '單位': merged['單位_新'].fillna(merged['單位_舊']),
+            **columns,
+        }, columns=DIFF_COLUMNS)
+        record['items'] = len(result)
+    return result
+
+
+def diff_versions(sources, workers=None, cache_dir=None):
+    """平行解析多個版本，依序比較相鄰版本（例如 設計 → 契約 → 變更設計）
+
+    返回 [(舊版索引, 新版索引, 差異資料表), ...]。
+    """
+    return compare_versions(load_versions(sources, workers, cache_dir))
+
+
+def compare_versions(tables):
+    """依序比較相鄰版本的比對用資料表，返回 [(舊版索引, 新版索引, 差異資料表), ...]"""
+    return [(index, index + 1, compare_tables(tables[index], tables[index + 1])) for index in range(len(tables) - 1)]
+
+
+def diff_summary(diff):
+    """差異資料表的摘要：各狀態筆數與末層項目的金額差合計
+
+    上層項目的金額已包含下層，只加總沒有下層項目的路徑以免重複計算；
+    小計（subtotal）項目為同層項目的合計，同樣不加總（與 validation 相同）。
+    """
+    counts = diff['狀態'].value_counts()
+    paths = diff['項次路徑']
+    parents = paths[paths.str.contains("/", regex=False)].str.rsplit("/", n=1).str[0].unique()
+    leaves = ~paths.isin(parents) & (diff['項目種類'] != 'subtotal').to_numpy(bool, na_value=True)
+    return {
+        ADDED: int(counts.get(ADDED, 0)),
+        REMOVED: int(counts.get(REMOVED, 0)),
+        CHANGED: int(counts.get(CHANGED, 0)),
+        UNCHANGED: int(counts.get(UNCHANGED, 0)),
+        '金額差合計': float(diff.loc[leaves, '金額差'].sum()),
+    }
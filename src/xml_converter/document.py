@@ -0,0 +1,241 @@
+import sys
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from .cost_tree import DETAIL_COLUMNS, CostDag
+from .instrumentation import stage
+from .item_store import ItemStore, parse_number
+from .xml_processor import XMLProcessor
+
+# 保留 XML 根節點時，lxml 每個元素約佔用的位元組數（實測約為原始 XML 大小的 12 倍以上）
+_DOM_BYTES_PER_ELEMENT = 500
+
+# 單價分析細項中轉為 float 的欄位
+_NUMERIC_DETAIL_FIELDS = ('quantity', 'price', 'amount', 'output_quantity')
+
+# object_nbytes 逐一計算的容器元素上限，超過時以等距抽樣的元素推估
+_SIZE_SAMPLE_ITEMS = 1024
+
+
+def object_nbytes(value, seen=None):
+    """估計物件（含其引用的容器與字串）佔用的位元組數，供記憶體快取計算衍生資料的大小
+
+    bytes、DataFrame、Series 與具有 nbytes 屬性的物件直接取其大小，容器與一般物件逐層加總，
+    同一物件只計算一次；元素很多的容器只計算抽樣的元素再依比例推估。
+    """
+    getsizeof = sys.getsizeof
+    if seen is None:
+        seen = set()
+    total = 0
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        if value is None or id(value) in seen:
+            continue
+        seen.add(id(value))
+        kind = type(value)
+        if kind is str or kind is int or kind is float or kind is bool:
+            total += getsizeof(value)
+        elif isinstance(value, (bytes, bytearray, memoryview)):
+            total += len(value)
+        elif isinstance(value, (pd.DataFrame, pd.Series)):
+            usage = value.memory_usage(deep=True)
+            total += int(usage.sum() if isinstance(usage, pd.Series) else usage)
+        elif isinstance(getattr(value, 'nbytes', None), int):
+            total += value.nbytes
+        elif isinstance(value, (dict, list, tuple, set, frozenset)):
+            total += getsizeof(value)
+            items = [*value.keys(), *value.values()] if isinstance(value, dict) else list(value)
+            if len(items) > _SIZE_SAMPLE_ITEMS:
+                step = len(items) / _SIZE_SAMPLE_ITEMS
+                sample = [items[int(i * step)] for i in range(_SIZE_SAMPLE_ITEMS)]
+                total += int(step * sum(object_nbytes(item, seen) for item in sample))
+            else:
+                stack.extend(items)
+        else:
+            total += getsizeof(value)
+            if hasattr(value, '__dict__'):
+                stack.append(vars(value))
+    return total
+
+
+class PCCESDocument:
+    """PCCES XML 文件：只解析一次，各種檢視於第一次使用時計算並快取
+
+    source 可為檔案路徑、bytes、memoryview 或檔案物件（例如 Streamlit 上傳檔案）。
+    """
+
+    def __init__(self, source):
+        with stage("parse"):
+            self.root = XMLProcessor.parse_xml(source)
+        self._frames = {}
+        self._derived = {}
+        self._sizes = {}
+
+    @classmethod
+    def from_tables(cls, pay_items, work_items, cost_tree):
+        """由已轉換的資料表建立文件（例如磁碟快取），不需要 XML 根節點"""
+        document = cls.__new__(cls)
+        document.root = None
+        document._frames = {"PayItem": pay_items, "WorkItem": work_items}
+        document._derived = {}
+        document._sizes = {}
+        document.cost_tree = cost_tree
+        return document
+
+    @cached_property
+    def pay_items(self):
+        """PayItem 項目資料（ItemStore）"""
+        return self._item_store("PayItem")
+
+    @cached_property
+    def work_items(self):
+        """CostBreakdownList 頂層 WorkItem 項目資料（ItemStore）"""
+        return self._item_store("WorkItem")
+
+    def _item_store(self, item_type):
+        with stage(f"item_store.{item_type}") as record:
+            if item_type in self._frames:
+                store = ItemStore.from_dataframe(self._frames[item_type])
+            else:
+                store = XMLProcessor.process_xml_store(self.root, item_type)
+            record['items'] = len(store)
+        return store
+
+    @cached_property
+    def cost_dag(self):
+        """單價分析圖（CostDag，共用子樹只存一份）"""
+        with stage("tree_build") as record:
+            dag = CostDag.from_xml_root(self.root)
+            record['items'] = len(dag)
+        return dag
+
+    @property
+    def cost_graph(self):
+        """查詢用的單價分析結構：由 XML 建立時為 CostDag，由資料表建立時為 CostTree"""
+        if self.root is None and 'cost_dag' not in self.__dict__:
+            return self.cost_tree
+        return self.cost_dag
+
+    def release_xml(self):
+        """建立項目資料與單價分析圖後釋放 XML 根節點（lxml 樹遠大於各檢視），之後不再需要原始 XML"""
+        if self.root is not None:
+            for name in ('pay_items', 'work_items', 'cost_dag'):
+                getattr(self, name)
+            self.root = None
+        return self
+
+    def derived(self, key, build):
+        """取得依附於文件的衍生資料（例如顯示用資料表、匯出內容），第一次使用時呼叫 build() 建立
+
+        衍生資料與文件一起計入記憶體快取的大小，並隨文件一起被淘汰。
+        """
+        try:
+            return self._derived[key]
+        except KeyError:
+            value = self._derived[key] = build()
+            return value
+
+    def _measure(self, key, value, measure=object_nbytes):
+        """單一檢視的大小；檢視建立後不再改變，只計算一次"""
+        size = self._sizes.get(key)
+        if size is None:
+            size = self._sizes[key] = measure(value)
+        return size
+
+    @property
+    def nbytes(self):
+        """文件目前佔用的估計位元組數（已建立的檢視與衍生資料，加上仍保留的 XML 樹），供記憶體快取計算上限
+
+        每個檢視只在第一次出現時計算大小，之後重新計算只需加總。
+        """
+        total = sum(self._measure(('frame', name), frame) for name, frame in self._frames.items())
+        for name in ('pay_items', 'work_items', 'cost_dag', 'cost_tree'):
+            view = self.__dict__.get(name)
+            if view is not None:
+                total += self._measure(name, view)
+        for key, value in list(self._derived.items()):
+            total += self._measure(('derived', key), value)
+        if self.root is not None:
+            total += self._measure('root', self.root, lambda root: _DOM_BYTES_PER_ELEMENT * sum(1 for _ in root.iter()))
+        return total
+
+    @cached_property
+    def cost_tree(self):
+        """完整展開的單價分析樹（CostTree 平面陣列），第一次使用時才由 CostDag 展開"""
+        with stage("tree_expand") as record:
+            tree = self.cost_dag.expand()
+            record['items'] = len(tree)
+        return tree
+
+    def cost_breakdown_frame(self):
+        """單價分析樹攤平的資料表；尚未展開時只暫時展開，不保留完整的樹"""
+        tree = self.__dict__.get('cost_tree')
+        if tree is None:
+            with stage("tree_expand") as record:
+                tree = self.cost_dag.expand()
+                record['items'] = len(tree)
+        return tree.to_dataframe()
+
+    @cached_property
+    def cost_breakdown_tree(self):
+        """單價分析樹狀結構資料（巢狀字典，與 process_cost_breakdown_root 相同）"""
+        return self.cost_tree.to_nested()
+
+    @cached_property
+    def pay_item_nodes(self):
+        """每個 PayItem 的 refItemCode（去除空白）對應的單價分析節點索引，沒有對應時為 -1"""
+        frame = self._frames.get("PayItem")
+        codes = frame['項目代碼'].tolist() if frame is not None else self.pay_items.item_codes
+        return self.cost_graph.lookup(codes)
+
+    def pay_item_breakdowns(self):
+        """將單價分析細項併入所有 PayItem 的長格式資料表，沒有任何對應時返回 None
+
+        每個 PayItem 依 refItemCode 找到分析節點，展開其直接子節點（與 get_work_item_details 相同），
+        一次以陣列運算完成，不逐筆搜尋樹狀結構。細項的數值欄位轉為 float。
+        """
+        pay_items = self.to_dataframe("PayItem")
+        if pay_items is None:
+            return None
+        tree = self.cost_graph
+        with stage("join", items=len(pay_items)) as record:
+            positions, details = tree.expand_children(self.pay_item_nodes)
+            record['items'] = len(details)
+            if not len(details):
+                return None
+            columns = {
+                '項次': pay_items['項次'].to_numpy()[positions],
+                '工程項目代碼': pay_items['項目代碼'].to_numpy()[positions],
+                '工程項目說明': pay_items['說明'].to_numpy()[positions],
+                '工程數量': pay_items['數量'].to_numpy()[positions],
+            }
+            # 每個節點的欄位只轉換一次，再以索引陣列取出
+            for field, column in DETAIL_COLUMNS.items():
+                values = tree.fields[field]
+                if field in _NUMERIC_DETAIL_FIELDS:
+                    values = np.fromiter(map(parse_number, values), dtype=np.float64, count=len(values))
+                else:
+                    values = np.array(values, dtype=object)
+                columns[column] = values[details]
+            return pd.DataFrame(columns)
+
+    def item_count(self, item_type="PayItem"):
+        """項目筆數（由資料表建立時不需轉換為 ItemStore）"""
+        frame = self._frames.get(item_type)
+        if frame is not None:
+            return len(frame)
+        return len(self.pay_items if item_type == "PayItem" else self.work_items)
+
+    def to_dataframe(self, item_type="PayItem"):
+        """將項目資料轉換為 DataFrame，沒有資料時返回 None"""
+        frame = self._frames.get(item_type)
+        if frame is None:
+            store = self.pay_items if item_type == "PayItem" else self.work_items
+            if not store:
+                return None
+            with stage(f"dataframe.{item_type}", items=len(store)):
+                frame = store.to_dataframe()
+        return frame if len(frame) else None
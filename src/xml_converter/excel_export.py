@@ -0,0 +1,146 @@
+import re
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+from .item_store import parse_number
+
+# 數值欄位的顯示格式（每欄設定一次，儲存格不另外指定格式）
+COLUMN_FORMATS = {
+    '數量': '#,##0.00',
+    '單價': '#,##0',
+    '金額': '#,##0',
+    '分析產出數量': '#,##0.00',
+    '階層': '0',
+}
+
+# 每次轉換為 Python 物件並寫入的列數
+WRITE_CHUNK_ROWS = 4096
+
+# 分析表工作表的欄位（與單價分析分頁的細項相同）
+ANALYSIS_DETAIL_FIELDS = (
+    ('項目代碼', 'item_code'),
+    ('參考編號', 'ref_item_no'),
+    ('項目種類', 'item_kind'),
+    ('說明', 'description'),
+    ('單位', 'unit'),
+    ('數量', 'quantity'),
+    ('單價', 'price'),
+    ('金額', 'amount'),
+    ('分析產出數量', 'output_quantity'),
+)
+_NUMERIC_DETAIL_FIELDS = ('quantity', 'price', 'amount', 'output_quantity')
+
+# Excel 工作表名稱限制
+MAX_SHEET_NAME_LENGTH = 31
+_INVALID_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+
+
+def sheet_name(name, used):
+    """將名稱轉為合法且不重複的工作表名稱（最多 31 字元，不分大小寫比對），並記錄於 used"""
+    base = _INVALID_SHEET_CHARS.sub("_", str(name)).strip().strip("'") or "Sheet"
+    base = base[:MAX_SHEET_NAME_LENGTH]
+    candidate = base
+    count = 1
+    while candidate.lower() in used:
+        count += 1
+        suffix = f"~{count}"
+        candidate = base[:MAX_SHEET_NAME_LENGTH - len(suffix)] + suffix
+    used.add(candidate.lower())
+    return candidate
+
+
+def _detail_columns(tree, indices):
+    """將細項節點轉為欄位值列表，數值欄位轉為 float"""
+    columns = {}
+    for column, field in ANALYSIS_DETAIL_FIELDS:
+        source = tree.fields[field]
+        values = [source[index] for index in indices]
+        if field in _NUMERIC_DETAIL_FIELDS:
+            values = [parse_number(value) for value in values]
+        columns[column] = values
+    return columns
+
+
+def document_sheets(document, include_analyses=True):
+    """產生 (工作表名稱, 欄位資料) 序列：PayItems、WorkItems 與每個分析表各一張
+
+    欄位資料可為 DataFrame 或 {欄名: 值列表}，分析表於寫入時才逐一建立。
+    """
+    for item_type, name in (("PayItem", "PayItems"), ("WorkItem", "WorkItems")):
+        df = document.to_dataframe(item_type)
+        if df is not None:
+            yield name, df
+    if include_analyses:
+        yield from analysis_sheets(document.cost_graph)
+
+
+def analysis_sheets(tree):
+    """每個分析項目產生一張 (工作表名稱, 細項欄位資料)
+
+    細項歸屬於最近的分析項目祖先，與單價分析分頁相同。
+    """
+    codes = tree.fields['item_code']
+    descriptions = tree.fields['description']
+    for index, details in tree.analysis_details():
+        yield f"{codes[index]} {descriptions[index]}", _detail_columns(tree, details)
+
+
+def _column_writer(worksheet, values):
+    """依欄位型別選擇寫入方法，返回 (寫入方法, 欄位 Series, 區段轉換函式)
+
+    欄位只判斷一次型別；區段轉換函式將一段 Series 轉為 Python 物件列表（空值為 None）。
+    """
+    column = values if isinstance(values, pd.Series) else pd.Series(values)
+    if column.dtype.kind in "fiub":
+        def convert(chunk):
+            return [None if value != value else value for value in chunk.to_numpy(np.float64, na_value=np.nan).tolist()]
+        return worksheet.write_number, column, convert
+
+    def convert(chunk):
+        return [None if value is None or value != value else str(value) for value in chunk.tolist()]
+    return worksheet.write_string, column, convert
+
+
+def write_sheet(worksheet, columns, header_format, number_formats):
+    """寫入單一工作表；constant_memory 模式必須逐列依序寫入
+
+    每次只將 WRITE_CHUNK_ROWS 列轉為 Python 物件，額外記憶體與總列數無關。
+    """
+    names = list(columns.keys())
+    for index, name in enumerate(names):
+        fmt = number_formats.get(name)
+        worksheet.set_column(index, index, max(10, len(name) * 2 + 2), fmt)
+    worksheet.write_row(0, 0, names, header_format)
+
+    cells = [(col, *_column_writer(worksheet, columns[name])) for col, name in enumerate(names)]
+    count = len(cells[0][2]) if cells else 0
+    for start in range(0, count, WRITE_CHUNK_ROWS):
+        chunk = [convert(column.iloc[start:start + WRITE_CHUNK_ROWS]) for _, _, column, convert in cells]
+        for row, row_values in enumerate(zip(*chunk), start=start + 1):
+            for (col, writer, _, _), value in zip(cells, row_values):
+                if value is not None:
+                    writer(row, col, value)
+
+
+def write_workbook(output, sheets):
+    """以 XlsxWriter constant_memory 模式寫出多工作表活頁簿
+
+    每列寫完即寫入暫存檔，每次只轉換固定列數，記憶體用量與總列數無關；
+    output 可為檔案路徑或 BytesIO，sheets 為 (名稱, DataFrame 或欄位字典) 序列。
+    """
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    header_format = workbook.add_format({'bold': True})
+    number_formats = {
+        name: workbook.add_format({'num_format': num_format})
+        for name, num_format in COLUMN_FORMATS.items()
+    }
+    used = set()
+    try:
+        for name, columns in sheets:
+            worksheet = workbook.add_worksheet(sheet_name(name, used))
+            write_sheet(worksheet, columns, header_format, number_formats)
+    finally:
+        workbook.close()
+    return output
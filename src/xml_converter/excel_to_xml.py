@@ -1,73 +1,138 @@
+import gzip
 from lxml import etree
 import pandas as pd
 from datetime import datetime
 
+from .hierarchy import infer_item_kind, infer_levels, iter_parent_counts
+
+# 定義命名空間
+NSMAP = {
+    None: "http://pcstd.pcc.gov.tw/2003/eTender",
+    "xsi": "http://www.w3.org/2001/XMLSchema-instance",
+    "mml": "http://www.w3.org/1998/Math/MathML"
+}
+
+# TenderInformation 基本資訊：(標籤, 語言, 文字)
+TENDER_INFORMATION = (
+    ("ProcuringEntity", "zh-TW", "工程主辦機關"),
+    ("ProcuringEntity", "en", " " * 60),
+    ("ContractTitle", "zh-TW", "工程名稱"),
+    ("ContractTitle", "en", " " * 60),
+)
+
+DETAIL_LIST_ATTRIBUTES = {
+    "canAddItem": "false",
+    "quantityDisplayDecimal": "1",
+    "unitPriceDisplayDecimal": "0",
+    "itemAmountDisplayDecimal": "0",
+}
+
+# libxml2 pretty_print 的縮排上限（60 個空白，即 30 層）
+MAX_INDENT_LEVEL = 30
+
+ANALYSIS_RATIO_TAGS = ("LabourRatio", "EquipmentRatio", "MaterialRatio", "MiscellaneaRatio")
+
+# 串流寫出時讀取的欄位與預設值（與 _create_pay_item 的 row.get 相同）
+PAY_ITEM_COLUMNS = (
+    ('項次', ''),
+    ('項目代碼', ''),
+    ('項目種類', ''),
+    ('說明', ''),
+    ('單位', ''),
+    ('數量', 0),
+    ('單價', 0),
+    ('金額', 0),
+)
+
+class _ChunkBuffer:
+    """收集寫入的位元組，供產生器分段取出"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
 class ExcelToXMLConverter:
+    @staticmethod
+    def _root_attributes():
+        """根元素屬性（依序）"""
+        return {
+            "{http://www.w3.org/2001/XMLSchema-instance}schemaLocation":
+                "http://pcstd.pcc.gov.tw/2003/eTender eTender.1.J.2004.D.xsd",
+            "createdDate": datetime.now().strftime("%Y-%m-%d"),
+            "applicationName": "Pcces",
+            "applicationVersion": "4.3.1000.220",
+            "procurementType": "constructionWork",
+            "documentType": "contract",
+        }
+
     @staticmethod
     def convert_excel_to_xml(excel_file):
         # 讀取 Excel 檔案
         df = pd.read_excel(excel_file)
         
-        # 定義命名空間
-        nsmap = {
-            None: "http://pcstd.pcc.gov.tw/2003/eTender",
-            "xsi": "http://www.w3.org/2001/XMLSchema-instance",
-            "mml": "http://www.w3.org/1998/Math/MathML"
-        }
-        
+        root, detail_list = ExcelToXMLConverter._create_document()
+        ExcelToXMLConverter._convert_rows(df, detail_list)
+        return root
+
+    @staticmethod
+    def _create_document():
+        """創建根元素、TenderInformation 與空的 DetailList"""
         # 創建 XML 根元素
-        root = etree.Element("ETenderSheet", nsmap=nsmap)
-        root.set("{http://www.w3.org/2001/XMLSchema-instance}schemaLocation",
-                 "http://pcstd.pcc.gov.tw/2003/eTender eTender.1.J.2004.D.xsd")
-        root.set("createdDate", datetime.now().strftime("%Y-%m-%d"))
-        root.set("applicationName", "Pcces")
-        root.set("applicationVersion", "4.3.1000.220")
-        root.set("procurementType", "constructionWork")
-        root.set("documentType", "contract")
-        
-        # 添加 TenderInformation
-        tender_info = etree.SubElement(root, "TenderInformation")
-        
-        # 添加基本資訊
-        procuring_entity_zh = etree.SubElement(tender_info, "ProcuringEntity")
-        procuring_entity_zh.set("language", "zh-TW")
-        procuring_entity_zh.text = "工程主辦機關"
-        
-        procuring_entity_en = etree.SubElement(tender_info, "ProcuringEntity")
-        procuring_entity_en.set("language", "en")
-        procuring_entity_en.text = " " * 60
-        
-        contract_title_zh = etree.SubElement(tender_info, "ContractTitle")
-        contract_title_zh.set("language", "zh-TW")
-        contract_title_zh.text = "工程名稱"
+        root = etree.Element("ETenderSheet", nsmap=NSMAP)
+        for name, value in ExcelToXMLConverter._root_attributes().items():
+            root.set(name, value)
         
-        contract_title_en = etree.SubElement(tender_info, "ContractTitle")
-        contract_title_en.set("language", "en")
-        contract_title_en.text = " " * 60
+        # 添加 TenderInformation 基本資訊
+        tender_info = etree.SubElement(root, "TenderInformation")
+        for tag, language, text in TENDER_INFORMATION:
+            element = etree.SubElement(tender_info, tag)
+            element.set("language", language)
+            element.text = text
         
         # 添加 DetailList
         detail_list = etree.SubElement(root, "DetailList")
-        detail_list.set("canAddItem", "false")
-        detail_list.set("quantityDisplayDecimal", "1")
-        detail_list.set("unitPriceDisplayDecimal", "0")
-        detail_list.set("itemAmountDisplayDecimal", "0")
-        
-        # 處理每一行資料
-        current_main_item = None
-        for _, row in df.iterrows():
-            item_no = str(row['項次'])
-            
-            # 判斷是否為主項目
-            if len(item_no) == 1 or item_no.isalpha():  # 如果項次為單一數字或字母
-                current_main_item = ExcelToXMLConverter._create_pay_item(
-                    detail_list if current_main_item is None else current_main_item,
-                    row, "mainItem"
-                )
-            else:
-                # 一般項目
-                ExcelToXMLConverter._create_pay_item(current_main_item, row, row['項目種類'])
+        for name, value in DETAIL_LIST_ATTRIBUTES.items():
+            detail_list.set(name, value)
         
-        return root
+        return root, detail_list
+
+    @staticmethod
+    def _convert_rows(df, detail_list):
+        """將每一列轉為 PayItem，依項次階層加入 DetailList 或上層項目"""
+        hierarchy = ExcelToXMLConverter._hierarchy(df)
+        # 開啟中的項目堆疊，堆疊頂端為目前列的上層
+        open_items = []
+        for (_, row), (parent_count, item_kind) in zip(df.iterrows(), hierarchy):
+            del open_items[parent_count:]
+            parent = open_items[-1] if open_items else detail_list
+            open_items.append(ExcelToXMLConverter._create_pay_item(parent, row, item_kind))
+
+    @staticmethod
+    def _hierarchy(df):
+        """返回每列的 (上層開啟項目數, itemKind)
+
+        層級優先取自階層欄位，否則由項次推斷（壹 > 一 > (一) > 1 > (1)），
+        再以堆疊一次走訪決定上層，整體為 O(n)。
+        """
+        item_nos = ExcelToXMLConverter._column_values(df, '項次', '')
+        kinds = ExcelToXMLConverter._column_values(df, '項目種類', '')
+        explicit_levels = df['階層'].tolist() if '階層' in df.columns else None
+        levels = infer_levels(item_nos, explicit_levels)
+        return [
+            (parent_count, infer_item_kind(kind, item_no))
+            for parent_count, kind, item_no in zip(iter_parent_counts(levels), kinds, item_nos)
+        ]
     
     @staticmethod
     def _create_pay_item(parent, row, item_kind):
@@ -119,17 +184,9 @@ class ExcelToXMLConverter:
         
         if item_kind == "analysis":
             # 分析項目特有欄位
-            labour = etree.SubElement(pay_item, "LabourRatio")
-            labour.text = "0"
-            
-            equipment = etree.SubElement(pay_item, "EquipmentRatio")
-            equipment.text = "0"
-            
-            material = etree.SubElement(pay_item, "MaterialRatio")
-            material.text = "0"
-            
-            misc = etree.SubElement(pay_item, "MiscellaneaRatio")
-            misc.text = "0"
+            for tag in ANALYSIS_RATIO_TAGS:
+                ratio = etree.SubElement(pay_item, tag)
+                ratio.text = "0"
         
         return pay_item
     
@@ -147,3 +204,186 @@ class ExcelToXMLConverter:
             pretty_print=True,
             standalone="no"
         )
+
+    @staticmethod
+    def _column_values(df, column, default):
+        """一次取出整欄並轉為字串列表，欄位不存在時以預設值填滿"""
+        if column in df.columns:
+            return [str(value) for value in df[column].tolist()]
+        return [str(default)] * len(df)
+
+    @staticmethod
+    def _indent(depth):
+        """與 pretty_print 相同的換行與縮排"""
+        return "\n" + "  " * min(depth, MAX_INDENT_LEVEL)
+
+    @classmethod
+    def _field_elements(cls, depth, item_kind):
+        """建立可重複使用的 PayItem 欄位元素，順序與 _create_pay_item 相同
+
+        每個元素的 tail 為下一個欄位的縮排，寫出時只需更新各列不同的文字。
+        """
+        fields = [
+            ("Description", {"language": "zh-TW"}, ""),
+            ("Description", {"language": "en"}, " " * 120),
+            ("Unit", {"language": "zh-TW"}, ""),
+            ("Unit", {"language": "en"}, " " * 10),
+            ("Quantity", {}, ""),
+            ("Price", {"fixed": "false"}, ""),
+            ("Amount", {"fixed": "false"}, ""),
+            ("Remark", {}, "[發包]"),
+            ("Percent", {}, "0"),
+        ]
+        if item_kind == "analysis":
+            fields.extend((tag, {}, "0") for tag in ANALYSIS_RATIO_TAGS)
+
+        indent = cls._indent(depth + 1)
+        elements = []
+        for tag, attrib, text in fields:
+            element = etree.Element(tag, attrib)
+            element.text = text
+            element.tail = indent
+            elements.append(element)
+        elements[-1].tail = None
+        return elements
+
+    @classmethod
+    def _document_frame(cls, has_items):
+        """序列化文件外框，返回 DetailList 內容之前與之後的位元組
+
+        外框由 lxml 以 save_xml 相同的參數序列化，確保宣告、命名空間順序與縮排一致。
+        """
+        root, detail_list = cls._create_document()
+        if not has_items:
+            return cls._serialize(root), b""
+        detail_list.append(etree.Comment("PayItems"))
+        prologue, epilogue = cls._serialize(root).split(b"<!--PayItems-->")
+        return prologue, epilogue
+
+    @staticmethod
+    def _serialize(root):
+        return etree.tostring(
+            etree.ElementTree(root),
+            encoding="UTF-8",
+            xml_declaration=True,
+            pretty_print=True,
+            standalone="no"
+        )
+
+    @classmethod
+    def write_xml(cls, df, output_file, compress=False):
+        """以 etree.xmlfile 逐筆串流寫出 XML，不建立整棵樹
+
+        欄位一次轉為字串陣列後以索引讀取，輸出與 convert_excel_to_xml + save_xml 逐位元組相同。
+        output_file 可為檔案路徑或可寫入的二進位檔案物件；compress 為 True 時輸出 gzip。
+        """
+        if isinstance(output_file, (str, bytes)) or hasattr(output_file, "__fspath__"):
+            with open(output_file, "wb") as f:
+                return cls.write_xml(df, f, compress)
+        if compress:
+            with gzip.GzipFile(fileobj=output_file, mode="wb") as gz:
+                return cls.write_xml(df, gz)
+
+        for _ in cls._iter_xml_parts(df, output_file):
+            pass
+
+    @classmethod
+    def iter_xml_chunks(cls, df, compress=False):
+        """逐段產生 XML 位元組（外框與每個 PayItem 各一段），可直接作為下載回應的內容
+
+        記憶體中只保留目前這一段的資料；compress 為 True 時產生 gzip 串流。
+        """
+        buffer = _ChunkBuffer()
+        target = gzip.GzipFile(fileobj=buffer, mode="wb") if compress else buffer
+        try:
+            for _ in cls._iter_xml_parts(df, target, flush=True):
+                chunk = buffer.drain()
+                if chunk:
+                    yield chunk
+        finally:
+            if compress:
+                target.close()
+        chunk = buffer.drain()
+        if chunk:
+            yield chunk
+
+    @classmethod
+    def _iter_xml_parts(cls, df, output_file, flush=False):
+        """寫出整份文件，每寫完外框或一個 PayItem 就 yield 一次"""
+        columns = [cls._column_values(df, column, default) for column, default in PAY_ITEM_COLUMNS]
+        prologue, epilogue = cls._document_frame(len(df) > 0)
+        output_file.write(prologue)
+        yield
+        if len(df):
+            hierarchy = cls._hierarchy(df)
+            yield from cls._write_pay_items(output_file, hierarchy, columns, flush)
+        output_file.write(epilogue)
+        yield
+
+    @classmethod
+    def _write_pay_items(cls, output_file, hierarchy, columns, flush=False):
+        """依階層計畫串流寫出 PayItem，每寫完一個項目 yield 一次
+
+        每個頂層 PayItem 使用一個 etree.xmlfile，開啟中的項目以堆疊保存，
+        關閉時才寫出結束標籤，因此記憶體中不保留已寫出的節點。
+        flush 為 True 時每個項目寫完即送出 xmlfile 的緩衝內容。
+        """
+        item_nos, codes, _, descriptions, units, quantities, prices, amounts = columns
+        # PayItem 位於 ETenderSheet/DetailList 之下，頂層 PayItem 縮排兩層
+        base_depth = 2
+        writer = xf = None
+        open_items = []
+        # 依 (深度, 是否為分析項目) 快取欄位元素
+        templates = {}
+
+        def close_item():
+            xf.write(cls._indent(base_depth + len(open_items) - 1))
+            open_items.pop().__exit__(None, None, None)
+
+        try:
+            for i, (keep, item_kind) in enumerate(hierarchy):
+                while len(open_items) > keep:
+                    close_item()
+                if not open_items:
+                    if writer is not None:
+                        writer.__exit__(None, None, None)
+                        output_file.write(cls._indent(base_depth).encode())
+                    writer = etree.xmlfile(output_file, encoding="UTF-8")
+                    xf = writer.__enter__()
+                else:
+                    xf.write(cls._indent(base_depth + len(open_items)))
+
+                depth = base_depth + len(open_items)
+                element = xf.element("PayItem", {
+                    "itemKey": item_nos[i],
+                    "itemNo": item_nos[i],
+                    "refItemCode": codes[i].ljust(20),
+                    "itemKind": item_kind,
+                })
+                element.__enter__()
+                open_items.append(element)
+
+                key = (min(depth, MAX_INDENT_LEVEL), item_kind == "analysis")
+                fields = templates.get(key)
+                if fields is None:
+                    fields = templates[key] = cls._field_elements(depth, item_kind)
+                fields[0].text = descriptions[i]
+                fields[2].text = units[i].ljust(10)
+                fields[4].text = quantities[i]
+                fields[5].text = prices[i]
+                fields[6].text = amounts[i]
+                xf.write(cls._indent(depth + 1), *fields)
+                if flush:
+                    xf.flush()
+                yield
+            while open_items:
+                close_item()
+        finally:
+            if writer is not None:
+                writer.__exit__(None, None, None)
+
+    @classmethod
+    def convert_excel_to_xml_file(cls, excel_file, output_file, compress=False):
+        """讀取 Excel 並直接串流寫出 XML 檔案"""
+        cls.write_xml(pd.read_excel(excel_file), output_file, compress)
+
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+# 需要轉為數值的欄位
+NUMERIC_COLUMNS = ['數量', '單價', '金額']
+# 顯示時以千分位格式化的欄位
+AMOUNT_COLUMNS = ['單價', '金額']
+
+
+def to_numeric_columns(df, columns=NUMERIC_COLUMNS):
+    """將數值欄位一次轉為 float64，空字串或無法解析的值轉為 NaN（返回新的 DataFrame）"""
+    converted = {
+        column: pd.to_numeric(df[column], errors='coerce').astype('float64')
+        for column in columns
+        if column in df.columns and not pd.api.types.is_float_dtype(df[column])
+    }
+    return df.assign(**converted) if converted else df
+
+
+def format_thousands(values, decimals=0):
+    """千分位格式化，結果與 '{:,.Nf}'.format 相同，NaN 與空字串顯示為空字串
+
+    數值轉換與空值判斷以陣列一次完成，格式化本身仍逐一對每個有效值呼叫 str.format，
+    耗時與筆數成正比；只用於顯示，資料欄位維持 float64。
+    """
+    numbers = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    result = np.full(len(numbers), '', dtype=object)
+    valid = ~np.isnan(numbers)
+    if valid.any():
+        result[valid] = list(map(('{:,.%df}' % decimals).format, numbers[valid].tolist()))
+    if isinstance(values, pd.Series):
+        return pd.Series(result, index=values.index, name=values.name)
+    return result
+
+
+def format_for_display(df, columns=AMOUNT_COLUMNS, decimals=0):
+    """返回供畫面顯示的副本，指定欄位轉為千分位字串，原始數值欄位不變"""
+    formatted = {
+        column: format_thousands(df[column], decimals)
+        for column in columns
+        if column in df.columns
+    }
+    return df.assign(**formatted)
@@ -0,0 +1,112 @@
+import math
+
+# 項次的層級類別：數字越小層級越高
+FORMAL_NUMERAL = 0        # 壹、貳、參
+CHINESE_NUMERAL = 1       # 一、二、三
+PAREN_CHINESE_NUMERAL = 2 # (一)、（二）
+ARABIC_NUMERAL = 3        # 1、2、3
+PAREN_ARABIC_NUMERAL = 4  # (1)、（2）
+LEAF = 5                  # 無法辨識的項次，視為最下層
+
+_FORMAL_DIGITS = frozenset("壹貳參叁肆伍陸柒捌玖拾佰零")
+_CHINESE_DIGITS = frozenset("一二三四五六七八九十百〇零")
+_OPEN_PARENS = "(（"
+_CLOSE_PARENS = ")）"
+_SUFFIXES = "、.．"
+
+# 以中文數字編號的層級視為主項目
+MAIN_ITEM_LEVELS = (FORMAL_NUMERAL, CHINESE_NUMERAL, PAREN_CHINESE_NUMERAL)
+
+
+def _numeral_class(text):
+    """判斷不含括號的編號類別，無法辨識時返回 None"""
+    if not text:
+        return None
+    chars = set(text)
+    if chars <= _FORMAL_DIGITS:
+        return FORMAL_NUMERAL
+    if chars <= _CHINESE_DIGITS:
+        return CHINESE_NUMERAL
+    if text.isdigit():
+        return ARABIC_NUMERAL
+    return None
+
+
+def normalize_item_no(item_no):
+    """項次轉為去除前後空白的文字；數值欄位讀入的整數浮點數（例如 1.0）還原為 1"""
+    text = str(item_no).strip()
+    if text.endswith(".0") and text[:-2].isdigit():
+        return text[:-2]
+    return text
+
+
+def item_level(item_no):
+    """由項次推斷層級類別（壹 > 一 > (一) > 1 > (1)）"""
+    text = normalize_item_no(item_no).rstrip(_SUFFIXES)
+    if len(text) > 2 and text[0] in _OPEN_PARENS and text[-1] in _CLOSE_PARENS:
+        numeral = _numeral_class(text[1:-1].strip())
+        if numeral == CHINESE_NUMERAL:
+            return PAREN_CHINESE_NUMERAL
+        if numeral == ARABIC_NUMERAL:
+            return PAREN_ARABIC_NUMERAL
+        return LEAF
+    numeral = _numeral_class(text)
+    return LEAF if numeral is None else numeral
+
+
+def _explicit_level(value):
+    """讀取階層欄位的值，空白或非數值返回 None"""
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        level = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(level) else level
+
+
+def infer_levels(item_nos, explicit_levels=None):
+    """返回每列的層級
+
+    沒有階層欄位或欄位全為空白時，由項次推斷層級類別；
+    否則只使用階層欄位的數值（不與項次類別混用），空白的列沿用同一項次類別最近一次的層級，
+    該類別尚未出現時視為上一列的下層。
+    """
+    explicit = None if explicit_levels is None else [_explicit_level(value) for value in explicit_levels]
+    if explicit is None or all(level is None for level in explicit):
+        return [item_level(item_no) for item_no in item_nos]
+    levels = []
+    # 項次類別 -> 最近一次出現的層級
+    class_levels = {}
+    previous = None
+    for item_no, level in zip(item_nos, explicit):
+        numeral = item_level(item_no)
+        if level is None:
+            level = class_levels.get(numeral)
+            if level is None:
+                level = 0 if previous is None else previous + 1
+        class_levels[numeral] = level
+        levels.append(level)
+        previous = level
+    return levels
+
+
+def iter_parent_counts(levels):
+    """以堆疊依序決定每列的上層：返回每列之前仍開啟的項目數
+
+    每個項目都推入堆疊，遇到新項目時先彈出層級大於或等於它的項目，
+    堆疊剩下的項目就是它的祖先，整體為 O(n)。
+    """
+    stack = []
+    for level in levels:
+        while stack and stack[-1] >= level:
+            stack.pop()
+        yield len(stack)
+        stack.append(level)
+
+
+def infer_item_kind(item_kind, item_no):
+    """以中文數字編號（壹、一、(一)）的項次一律為 mainItem，其他項目沿用項目種類（空白時為空字串）"""
+    if item_level(item_no) in MAIN_ITEM_LEVELS:
+        return "mainItem"
+    return item_kind if item_kind and item_kind != "nan" else ""
@@ -0,0 +1,177 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Windows 沒有 resource 模組
+    resource = None
+
+# 設定 PCCES_PROFILE=1 啟用量測；PCCES_METRICS_FILE 指定 Prometheus 文字格式輸出檔
+PROFILE_ENV = "PCCES_PROFILE"
+METRICS_FILE_ENV = "PCCES_METRICS_FILE"
+
+logger = logging.getLogger("pcces.profile")
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+def current_rss_bytes():
+    """目前行程的常駐記憶體；沒有 /proc 時以峰值 RSS 代替，兩者都無法取得時返回 0"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        if resource is None:
+            return 0
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Profiler:
+    """各處理階段的耗時、筆數與記憶體變化
+
+    每個階段結束時以 JSON 寫入 pcces.profile logger，並累計到 Prometheus 指標；
+    未啟用時 stage() 只返回空的紀錄，幾乎沒有額外成本。
+    指定 metrics_file 時每個行程寫入自己的檔案（檔名加上 PID），行程池中的工作行程不會互相覆寫。
+    """
+
+    def __init__(self, enabled=False, metrics_file=None):
+        self.enabled = enabled
+        self.metrics_file = metrics_file
+        # 階段名稱 -> [次數, 總秒數, 總筆數, 最近一次秒數, 最近一次記憶體變化, 總位元組數]
+        self._totals = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @classmethod
+    def from_env(cls):
+        """依環境變數建立；啟用時若 logger 尚未設定輸出，則將 JSON 紀錄寫到 stderr"""
+        enabled = os.environ.get(PROFILE_ENV, "").lower() in ("1", "true", "yes", "on")
+        if enabled and not logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+        return cls(enabled=enabled, metrics_file=os.environ.get(METRICS_FILE_ENV) or None)
+
+    @contextmanager
+    def stage(self, name, items=None, nbytes=None):
+        """量測一個階段；可在 with 區塊中設定 record['items'] 記錄處理筆數
+
+        nbytes 為處理的位元組數（例如上傳檔案大小），與筆數分開記錄。
+        """
+        record = {'stage': name, 'items': items, 'bytes': nbytes}
+        if not self.enabled:
+            yield record
+            return
+        record['pid'] = os.getpid()
+        rss_before = current_rss_bytes()
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record['error'] = type(e).__name__
+            raise
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            rss_after = current_rss_bytes()
+            record['rss_bytes'] = rss_after
+            record['rss_delta_bytes'] = rss_after - rss_before
+            self._finish(record)
+
+    def _finish(self, record):
+        logger.info(json.dumps(record, ensure_ascii=False))
+        for records in getattr(self._local, "collectors", ()):
+            records.append(record)
+        with self._lock:
+            totals = self._totals.setdefault(record['stage'], [0, 0.0, 0, 0.0, 0, 0])
+            totals[0] += 1
+            totals[1] += record['seconds']
+            totals[2] += record['items'] or 0
+            totals[3] = record['seconds']
+            totals[4] = record['rss_delta_bytes']
+            totals[5] += record['bytes'] or 0
+        if self.metrics_file:
+            self.write_metrics()
+
+    @contextmanager
+    def collect(self):
+        """收集目前執行緒在區塊內完成的階段紀錄（例如 Streamlit 的單次執行）"""
+        records = []
+        collectors = getattr(self._local, "collectors", None)
+        if collectors is None:
+            collectors = self._local.collectors = []
+        collectors.append(records)
+        try:
+            yield records
+        finally:
+            collectors.remove(records)
+
+    def metrics_text(self):
+        """以 Prometheus 文字格式輸出目前行程的累計指標，每個序列都有 pid 標籤"""
+        metrics = (
+            ("pcces_stage_calls_total", "counter", "階段執行次數", 0),
+            ("pcces_stage_seconds_total", "counter", "階段累計耗時（秒）", 1),
+            ("pcces_stage_items_total", "counter", "階段累計處理筆數", 2),
+            ("pcces_stage_bytes_total", "counter", "階段累計處理位元組數", 5),
+            ("pcces_stage_last_seconds", "gauge", "最近一次耗時（秒）", 3),
+            ("pcces_stage_last_rss_delta_bytes", "gauge", "最近一次常駐記憶體變化（位元組）", 4),
+        )
+        with self._lock:
+            totals = sorted(self._totals.items())
+        pid = os.getpid()
+        lines = []
+        for metric, kind, help_text, index in metrics:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for stage, values in totals:
+                lines.append(f'{metric}{{stage="{stage}",pid="{pid}"}} {values[index]}')
+        lines.append("# HELP pcces_process_rss_bytes 目前常駐記憶體（位元組）")
+        lines.append("# TYPE pcces_process_rss_bytes gauge")
+        lines.append(f'pcces_process_rss_bytes{{pid="{pid}"}} {current_rss_bytes()}')
+        return "\n".join(lines) + "\n"
+
+    def metrics_path(self):
+        """目前行程的指標檔案：metrics_file 的檔名加上 PID（pcces.prom -> pcces.1234.prom）"""
+        root, ext = os.path.splitext(self.metrics_file)
+        return f"{root}.{os.getpid()}{ext}"
+
+    def write_metrics(self, path=None):
+        """寫入 Prometheus 文字檔（先寫暫存檔再改名，供 node_exporter textfile collector 讀取）
+
+        未指定 path 時寫入 metrics_path()，各行程的檔案由 collector 一併讀取。
+        """
+        path = path or self.metrics_path()
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(self.metrics_text())
+        os.replace(temp_path, path)
+
+
+_default_profiler = None
+_default_lock = threading.Lock()
+
+
+def get_profiler():
+    """依環境變數建立的共用 Profiler"""
+    global _default_profiler
+    if _default_profiler is None:
+        with _default_lock:
+            if _default_profiler is None:
+                _default_profiler = Profiler.from_env()
+    return _default_profiler
+
+
+def stage(name, items=None, nbytes=None):
+    """以共用 Profiler 量測一個階段"""
+    return get_profiler().stage(name, items, nbytes)
@@ -0,0 +1,146 @@
+import sys
+from array import array
+
+import numpy as np
+import pandas as pd
+
+# 項目資料欄位（與 XMLProcessor.build_row 的鍵值順序相同）
+ITEM_COLUMNS = ['項目代碼', '項目種類', '項次', '說明', '單位', '數量', '單價', '金額', '階層', '分隔符號']
+
+
+def parse_number(text):
+    """將 XML 數值文字轉為 float，空白或無法解析時返回 NaN"""
+    if not text:
+        return float("nan")
+    try:
+        return float(text.replace(",", ""))
+    except ValueError:
+        return float("nan")
+
+
+def strings_nbytes(values):
+    """字串列表佔用的位元組數（列表本身加上每個字串物件，共用的字串重複計算，為保守估計）"""
+    return sys.getsizeof(values) + sum(map(sys.getsizeof, values))
+
+
+class _Categories:
+    """類別欄位：字串對應到整數代碼"""
+
+    def __init__(self):
+        self.codes = array('i')
+        self.lookup = {}
+
+    def append(self, value):
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.lookup)
+        self.codes.append(code)
+
+    def categories(self):
+        return list(self.lookup)
+
+    def to_categorical(self):
+        codes = np.frombuffer(self.codes, dtype=np.int32) if len(self.codes) else np.empty(0, dtype=np.int32)
+        return pd.Categorical.from_codes(codes, categories=self.categories())
+
+
+class ItemStore:
+    """以欄位方式儲存 PayItem/WorkItem 項目資料
+
+    數量、單價、金額與階層存為型別陣列，項目種類、單位與分隔符號存為類別代碼，
+    項目代碼與項次使用 interned 字串。to_dataframe() 直接引用這些陣列，不另外複製。
+    """
+
+    def __init__(self):
+        self.item_codes = []
+        self.item_nos = []
+        self.descriptions = []
+        self.quantity = array('d')
+        self.price = array('d')
+        self.amount = array('d')
+        self.depth = array('i')
+        self.item_kind = _Categories()
+        self.unit = _Categories()
+        self.separator = _Categories()
+
+    def __len__(self):
+        return len(self.item_nos)
+
+    def __iter__(self):
+        """逐筆產生與 XMLProcessor.build_row 相同格式的字典（數值欄位為 float）"""
+        kinds = self.item_kind.categories()
+        units = self.unit.categories()
+        separators = self.separator.categories()
+        for i in range(len(self)):
+            yield dict(zip(ITEM_COLUMNS, (
+                self.item_codes[i],
+                kinds[self.item_kind.codes[i]],
+                self.item_nos[i],
+                self.descriptions[i],
+                units[self.unit.codes[i]],
+                self.quantity[i],
+                self.price[i],
+                self.amount[i],
+                self.depth[i],
+                separators[self.separator.codes[i]],
+            )))
+
+    def append(self, item_code, item_kind, item_no, description, unit, quantity, price, amount, depth, separator):
+        """新增一筆項目，數值欄位接受 XML 文字"""
+        self.item_codes.append(sys.intern(item_code))
+        self.item_kind.append(item_kind)
+        self.item_nos.append(sys.intern(item_no))
+        self.descriptions.append(description)
+        self.unit.append(unit)
+        self.quantity.append(parse_number(quantity))
+        self.price.append(parse_number(price))
+        self.amount.append(parse_number(amount))
+        self.depth.append(depth)
+        self.separator.append(separator)
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """由 to_dataframe 格式的 DataFrame 建立 ItemStore（例如由磁碟快取讀回）"""
+        store = cls()
+        store.item_codes = [sys.intern(value) for value in df['項目代碼'].tolist()]
+        store.item_nos = [sys.intern(value) for value in df['項次'].tolist()]
+        store.descriptions = df['說明'].tolist()
+        store.quantity = array('d', df['數量'].to_numpy(np.float64).tobytes())
+        store.price = array('d', df['單價'].to_numpy(np.float64).tobytes())
+        store.amount = array('d', df['金額'].to_numpy(np.float64).tobytes())
+        store.depth = array('i', df['階層'].to_numpy(np.int32).tobytes())
+        for column, categories in (('項目種類', store.item_kind), ('單位', store.unit), ('分隔符號', store.separator)):
+            values = pd.Categorical(df[column])
+            categories.lookup = {value: code for code, value in enumerate(values.categories)}
+            categories.codes = array('i', values.codes.astype(np.int32).tobytes())
+        return store
+
+    @staticmethod
+    def _view(values, dtype):
+        return np.frombuffer(values, dtype=dtype) if len(values) else np.empty(0, dtype=dtype)
+
+    @property
+    def nbytes(self):
+        """型別陣列與字串欄位佔用的估計位元組數"""
+        arrays = (self.quantity, self.price, self.amount, self.depth,
+                  self.item_kind.codes, self.unit.codes, self.separator.codes)
+        strings = (self.item_codes, self.item_nos, self.descriptions)
+        return sum(a.itemsize * len(a) for a in arrays) + sum(map(strings_nbytes, strings))
+
+    def to_dataframe(self):
+        """轉換為 DataFrame，數值與類別欄位直接引用儲存陣列
+
+        轉換後陣列被 DataFrame 引用，不可再 append。
+        """
+        return pd.DataFrame({
+            '項目代碼': self.item_codes,
+            '項目種類': self.item_kind.to_categorical(),
+            '項次': self.item_nos,
+            '說明': self.descriptions,
+            '單位': self.unit.to_categorical(),
+            '數量': self._view(self.quantity, np.float64),
+            '單價': self._view(self.price, np.float64),
+            '金額': self._view(self.amount, np.float64),
+            '階層': self._view(self.depth, np.int32),
+            '分隔符號': self.separator.to_categorical(),
+        }, copy=False)
@@ -0,0 +1,167 @@
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from .instrumentation import stage
+from .item_store import parse_number
+
+# 資源類別：依項目代碼第一個字母分類
+RESOURCE_CATEGORIES = {
+    'L': '人工',
+    'E': '機具',
+    'M': '材料',
+    'W': '雜項',
+}
+OTHER_CATEGORY = '其他'
+
+RESOURCE_COLUMNS = ['類別', '項目代碼', '說明', '單位', '總數量', '單價', '金額']
+
+
+def resource_category(item_code):
+    """依項目代碼第一個字母判斷資源類別"""
+    return RESOURCE_CATEGORIES.get(item_code.strip()[:1].upper(), OTHER_CATEGORY)
+
+
+class ResourceAggregator:
+    """將單價分析展開為每單位產出的資源用量，並加總整個工程的資源數量
+
+    每個分析項目的用量為 下層數量 ÷ 分析產出數量，巢狀分析逐層相乘。
+    結果以分析定義節點記憶（CostDag 中共用同一定義的引用處共用結果），同一代碼有不同內容的分析各自展開；
+    只有代碼而沒有下層的分析改用同代碼、有下層的頂層分析（沒有時為樹中第一個有下層的同代碼節點）。
+    cost_graph 可為 CostTree 或 CostDag（共用子分析不需展開）。
+    """
+
+    def __init__(self, cost_graph):
+        self.tree = cost_graph
+        # 分析定義節點索引 -> {資源代碼: 每單位產出的用量}
+        self.memo = {}
+        self._root_definitions = None
+
+    def _lookup_definition(self, code):
+        """只有代碼的分析所引用的定義節點：優先取頂層分析，找不到時返回 None"""
+        tree = self.tree
+        if self._root_definitions is None:
+            codes = tree.fields['item_code']
+            roots = {}
+            for index in tree.roots():
+                if tree.has_children(index):
+                    roots.setdefault(codes[index].strip(), index)
+            self._root_definitions = roots
+        found = self._root_definitions.get(code)
+        if found is None:
+            found = tree.find(code)
+            if found is None or not tree.has_children(found):
+                return None
+        return found
+
+    def _definition(self, index):
+        """節點對應的分析定義（記憶結果的鍵），資源項目返回 None"""
+        tree = self.tree
+        if not tree.has_children(index):
+            if tree.fields['item_kind'][index] != 'analysis':
+                return None
+            index = self._lookup_definition(tree.fields['item_code'][index].strip())
+            if index is None:
+                return None
+        return tree.definition_of(index)
+
+    def _output_quantity(self, index):
+        """分析產出數量，空白或為 0 時視為 1"""
+        value = parse_number(self.tree.fields['output_quantity'][index])
+        return value if value == value and value != 0 else 1.0
+
+    def unit_consumption(self, index):
+        """節點每單位的資源用量 {資源代碼: 數量}；資源項目返回 {自身代碼: 1}
+
+        以堆疊後序展開，巢狀層數不受遞迴深度限制；循環參照的分析視為資源。
+        """
+        tree = self.tree
+        codes = tree.fields['item_code']
+        quantities = tree.fields['quantity']
+        memo = self.memo
+
+        root = self._definition(index)
+        if root is None:
+            return {codes[index].strip(): 1.0}
+
+        in_progress = set()
+        stack = [(root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if node in memo:
+                continue
+            if not expanded:
+                in_progress.add(node)
+                stack.append((node, True))
+                for child in tree.children(node):
+                    definition = self._definition(child)
+                    if definition is not None and definition not in memo and definition not in in_progress:
+                        stack.append((definition, False))
+                continue
+
+            ratios = defaultdict(float)
+            output_quantity = self._output_quantity(node)
+            for child in tree.children(node):
+                quantity = parse_number(quantities[child])
+                if quantity != quantity:
+                    continue
+                ratio = quantity / output_quantity
+                definition = self._definition(child)
+                nested = memo.get(definition) if definition is not None else None
+                if nested is None:
+                    ratios[codes[child].strip()] += ratio
+                else:
+                    for resource, amount in nested.items():
+                        ratios[resource] += ratio * amount
+            memo[node] = dict(ratios)
+            in_progress.discard(node)
+        return memo[root]
+
+    def aggregate(self, nodes, quantities):
+        """依各項目的分析節點與數量加總資源用量，返回 {資源代碼: 總數量}
+
+        nodes 為節點索引（-1 表示沒有對應），同一節點的數量先合併再展開。
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        quantities = np.nan_to_num(np.asarray(quantities, dtype=np.float64))
+        matched = nodes >= 0
+        demand = np.bincount(nodes[matched], weights=quantities[matched], minlength=len(self.tree))
+
+        totals = defaultdict(float)
+        for index in np.flatnonzero(demand).tolist():
+            for resource, ratio in self.unit_consumption(index).items():
+                totals[resource] += demand[index] * ratio
+        return dict(totals)
+
+    def summary(self, totals):
+        """資源總量表：類別、代碼、說明、單位、總數量、單價與金額（單價取第一個相同代碼的節點）"""
+        tree = self.tree
+        rows = []
+        for code, total in totals.items():
+            index = tree.find(code)
+            price = parse_number(tree.fields['price'][index]) if index is not None else float("nan")
+            rows.append((
+                resource_category(code),
+                code,
+                tree.fields['description'][index] if index is not None else "",
+                tree.fields['unit'][index] if index is not None else "",
+                total,
+                price,
+                total * price,
+            ))
+        table = pd.DataFrame(rows, columns=RESOURCE_COLUMNS)
+        return table.sort_values(['類別', '項目代碼'], kind='stable', ignore_index=True)
+
+
+def resource_summary(document):
+    """整個工程的資源用量表：PayItem 數量 × 其單價分析逐層展開的單位用量"""
+    pay_items = document.to_dataframe("PayItem")
+    if pay_items is None or not len(document.cost_graph):
+        return pd.DataFrame(columns=RESOURCE_COLUMNS)
+    with stage("resources", items=len(pay_items)) as record:
+        aggregator = ResourceAggregator(document.cost_graph)
+        totals = aggregator.aggregate(document.pay_item_nodes, pay_items['數量'].to_numpy(np.float64, na_value=np.nan))
+        table = aggregator.summary(totals)
+        record['items'] = len(table)
+    return table
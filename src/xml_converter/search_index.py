@@ -0,0 +1,72 @@
+import heapq
+from collections import defaultdict
+
+
+class AnalysisSearchIndex:
+    """單價分析的 n-gram 搜尋索引，涵蓋項目代碼與說明
+
+    中文說明沒有字詞邊界，因此以單字與雙字 n-gram 建立倒排索引：
+    查詢時取出現次數最少的 n-gram 作為候選，再以子字串比對確認。
+    """
+
+    def __init__(self, keys, codes, descriptions):
+        self.keys = list(keys)
+        self.codes = [code.strip().lower() for code in codes]
+        # 以換行分隔代碼與說明，避免查詢字串跨越兩個欄位
+        self.texts = [f"{code}\n{description.lower()}" for code, description in zip(self.codes, descriptions)]
+        self.postings = defaultdict(list)
+        for doc_id, text in enumerate(self.texts):
+            grams = set(text)
+            grams.update(text[i:i + 2] for i in range(len(text) - 1))
+            grams.discard("\n")
+            for gram in grams:
+                self.postings[gram].append(doc_id)
+
+    @classmethod
+    def from_tables(cls, analysis_tables):
+        """由 process_analysis_data 的結果建立索引"""
+        keys = list(analysis_tables)
+        main_items = [analysis_tables[key]['主項'] for key in keys]
+        return cls(keys, [item['項目代碼'] for item in main_items], [item['說明'] for item in main_items])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _candidates(self, query):
+        """以查詢字串中最少出現的 n-gram 取得候選文件"""
+        if len(query) == 1:
+            return self.postings.get(query, [])
+        best = None
+        for i in range(len(query) - 1):
+            posting = self.postings.get(query[i:i + 2])
+            if posting is None:
+                return []
+            if best is None or len(posting) < len(best):
+                best = posting
+        return best
+
+    def _rank(self, doc_id, query):
+        """排序：代碼完全相符、代碼開頭相符、代碼包含、說明中越前面出現越優先"""
+        code = self.codes[doc_id]
+        if code == query:
+            return (0, 0, doc_id)
+        if code.startswith(query):
+            return (1, 0, doc_id)
+        position = self.texts[doc_id].find(query)
+        if position < len(code):
+            return (2, position, doc_id)
+        return (3, position, doc_id)
+
+    def search(self, query, top_k=None):
+        """返回符合查詢的分析表鍵值，依相關程度排序；空白查詢返回全部"""
+        query = query.strip().lower()
+        if not query:
+            return self.keys if top_k is None else self.keys[:top_k]
+
+        matches = [doc_id for doc_id in self._candidates(query) if query in self.texts[doc_id]]
+        rank = lambda doc_id: self._rank(doc_id, query)
+        if top_k is not None:
+            matches = heapq.nsmallest(top_k, matches, key=rank)
+        else:
+            matches.sort(key=rank)
+        return [self.keys[doc_id] for doc_id in matches]
@@ -0,0 +1,454 @@
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import signal
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from .arrow_io import DOCUMENT_TABLES, ArrowDocumentCache, tables_document
+from .batch import OUTPUT_FORMATS, convert_file
+
+logger = logging.getLogger("pcces.service")
+
+# 設定 PCCES_SERVICE_URL（例如 http://127.0.0.1:8765）時網頁介面改由處理服務解析上傳檔案
+SERVICE_URL_ENV = "PCCES_SERVICE_URL"
+
+# 工作種類：parse 解析並寫入 Arrow 快取，export 轉換為指定的輸出格式
+JOB_KINDS = ('parse', 'export')
+
+# 工作狀態
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# 匯出工作的輸出檔名（每個工作有自己的目錄）
+EXPORT_NAME = 'result'
+
+ARROW_CONTENT_TYPE = 'application/vnd.apache.arrow.file'
+CONTENT_TYPES = {
+    '.arrow': ARROW_CONTENT_TYPE,
+    '.feather': ARROW_CONTENT_TYPE,
+    '.csv': 'text/csv; charset=utf-8',
+    '.parquet': 'application/vnd.apache.parquet',
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# 上傳與下載時每次讀寫的位元組數
+CHUNK_SIZE = 1024 * 1024
+
+
+def parse_job(xml_path, digest, cache_dir):
+    """解析 XML 並寫入 Arrow 磁碟快取（於工作行程中執行），返回狀態、筆數與各資料表的檔案路徑
+
+    相同內容已在快取中時只以記憶體映射讀取，不再解析。
+    錯誤以文字返回（lxml 的例外無法在行程間傳遞）。
+    """
+    cache = ArrowDocumentCache(cache_dir)
+    try:
+        document = cache.get_or_parse(xml_path, digest)
+    except Exception as e:
+        return {'status': FAILED, 'error': f"{type(e).__name__}: {e}"}
+    if digest not in cache:
+        # 結果以快取檔案交給呼叫端，無法寫入快取時視為失敗
+        return {'status': FAILED, 'error': f"無法寫入 Arrow 快取：{cache_dir}"}
+    directory = cache.path(digest)
+    return {
+        'status': DONE,
+        'pay_items': document.item_count("PayItem"),
+        'work_items': document.item_count("WorkItem"),
+        'results': {name: os.path.join(directory, name + '.arrow') for name in DOCUMENT_TABLES},
+    }
+
+
+def export_job(xml_path, output_dir, output_format, cache_dir):
+    """轉換 XML 為指定格式（於工作行程中執行），返回狀態、筆數與各工作表的檔案路徑
+
+    Excel 格式只有一個活頁簿，名稱為 workbook。
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    summary = convert_file(xml_path, output_dir, EXPORT_NAME, output_format, cache_dir)
+    if summary['status'] != 'ok':
+        return {'status': FAILED, 'error': summary['error']}
+    results = {}
+    for path in summary['outputs'].split(';'):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        results[stem[len(EXPORT_NAME) + 1:] or 'workbook'] = path
+    return {'status': DONE, 'pay_items': summary['pay_items'], 'work_items': summary['work_items'], 'results': results}
+
+
+class _RequestError(Exception):
+    """以指定狀態碼回應的請求錯誤"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class JobService:
+    """上傳處理服務：接收 XML 上傳，將解析與匯出工作排入佇列，由行程池執行
+
+    只使用標準函式庫的 asyncio 處理 HTTP，事件迴圈只負責收發資料，
+    解析與轉換都在工作行程中執行；工作行程數即可同時執行的工作數。
+
+    POST /jobs?kind=parse|export&format=csv   請求內容為 XML，返回 202 與工作資料
+    GET  /jobs                                所有工作與佇列長度
+    GET  /jobs/{id}                           工作狀態
+    GET  /jobs/{id}/result/{table}            工作結果（parse 為 Arrow IPC 檔案）
+    """
+
+    def __init__(self, data_dir, cache_dir, workers=None, max_queue=64, max_jobs=1000,
+                 max_upload_bytes=2 * 1024 * 1024 * 1024):
+        self.upload_dir = os.path.join(data_dir, 'uploads')
+        self.output_dir = os.path.join(data_dir, 'output')
+        self.cache_dir = cache_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.max_jobs = max_jobs
+        self.max_upload_bytes = max_upload_bytes
+        # 工作代碼 -> 工作資料，依提交順序排列
+        self.jobs = OrderedDict()
+        self.queue = None
+        self.executor = None
+        self._dispatchers = []
+
+    async def start(self, host='127.0.0.1', port=8765):
+        """建立行程池與分派工作的協程，開始接受連線，返回 asyncio Server"""
+        os.makedirs(self.upload_dir, exist_ok=True)
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.queue = asyncio.Queue(self.max_queue)
+        self.executor = self._new_executor()
+        # 每個工作行程對應一個分派協程，佇列中的工作不會在行程池內堆積
+        self._dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+    async def close(self):
+        """停止分派工作並關閉行程池（等待執行中的工作結束）"""
+        for task in self._dispatchers:
+            task.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        if self.executor is not None:
+            await asyncio.to_thread(self.executor.shutdown)
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        """執行服務直到收到 SIGINT 或 SIGTERM（例如 docker stop），結束前等待執行中的工作"""
+        server = await self.start(host, port)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+            except NotImplementedError:
+                # Windows 的事件迴圈不支援，Ctrl+C 仍會中斷 asyncio.run
+                pass
+        logger.info("PCCES 處理服務：http://%s:%s（%d 個工作行程）", host, port, self.workers)
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            await self.close()
+
+    def _new_executor(self):
+        # 以 spawn 啟動工作行程，不繼承事件迴圈與監聽中的 socket
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    # 工作佇列
+
+    def submit(self, job_id, kind, upload_path, digest, size, output_format=None):
+        """將已接收的上傳檔案排入佇列，返回工作資料"""
+        self._check_capacity()
+        job = {
+            'id': job_id,
+            'kind': kind,
+            'format': output_format,
+            'status': QUEUED,
+            'digest': digest,
+            'size': size,
+            'submitted': time.time(),
+            'started': None,
+            'finished': None,
+            'seconds': None,
+            'pay_items': None,
+            'work_items': None,
+            'results': {},
+            'error': None,
+            '_upload': upload_path,
+        }
+        self.queue.put_nowait(job)
+        self.jobs[job_id] = job
+        self._prune()
+        return job
+
+    def _check_capacity(self):
+        if self.queue.full():
+            raise _RequestError(HTTPStatus.SERVICE_UNAVAILABLE, "工作佇列已滿，請稍後再試")
+
+    def _task(self, job):
+        """工作在行程池中執行的函式與引數"""
+        if job['kind'] == 'parse':
+            return parse_job, job['_upload'], job['digest'], self.cache_dir
+        return export_job, job['_upload'], os.path.join(self.output_dir, job['id']), job['format'], self.cache_dir
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            job['status'] = RUNNING
+            job['started'] = time.time()
+            executor = self.executor
+            try:
+                result = await loop.run_in_executor(executor, *self._task(job))
+            except BrokenProcessPool as e:
+                # 工作行程異常結束（例如記憶體不足被終止），重建行程池使後續工作可以繼續
+                job.update(status=FAILED, error=f"{type(e).__name__}: {e}")
+                self._restart_executor(executor)
+            except Exception as e:
+                job.update(status=FAILED, error=f"{type(e).__name__}: {e}")
+            else:
+                job.update(result)
+            finally:
+                job['finished'] = time.time()
+                job['seconds'] = job['finished'] - job['started']
+                _remove_file(job.pop('_upload'))
+                self.queue.task_done()
+                logger.info("工作 %s %s %s %.2fs", job['id'], job['kind'], job['status'], job['seconds'])
+
+    def _restart_executor(self, broken):
+        # 同一個行程池上的其他工作也會失敗，只重建一次
+        if self.executor is broken:
+            self.executor = self._new_executor()
+            broken.shutdown(wait=False, cancel_futures=True)
+
+    def _prune(self):
+        """工作數超過上限時移除最早完成的工作與其匯出檔案"""
+        finished = [job_id for job_id, job in self.jobs.items() if job['status'] in (DONE, FAILED)]
+        for job_id in finished[:max(0, len(self.jobs) - self.max_jobs)]:
+            self.jobs.pop(job_id)
+            shutil.rmtree(os.path.join(self.output_dir, job_id), ignore_errors=True)
+
+    def job_view(self, job):
+        """對外顯示的工作資料：結果只列出名稱，排隊中的工作加上前面等待的工作數"""
+        view = {key: value for key, value in job.items() if not key.startswith('_')}
+        view['results'] = list(job['results'])
+        if job['status'] == QUEUED:
+            view['queued_ahead'] = sum(
+                1 for other in self.jobs.values()
+                if other['status'] == QUEUED and other['submitted'] < job['submitted']
+            )
+        return view
+
+    # HTTP
+
+    async def _handle_connection(self, reader, writer):
+        """每個連線處理一個請求，回應後關閉連線"""
+        try:
+            try:
+                method, url, headers = await self._read_head(reader)
+                await self._route(method, url, headers, reader, writer)
+            except _RequestError as e:
+                await _send_json(writer, e.status, {'error': str(e)})
+            except Exception as e:
+                logger.exception("處理請求失敗")
+                await _send_json(writer, HTTPStatus.INTERNAL_SERVER_ERROR, {'error': f"{type(e).__name__}: {e}"})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_head(reader):
+        """讀取請求列與標頭，返回 (方法, 解析後的 URL, 小寫標頭名稱字典)"""
+        try:
+            request_line = (await reader.readline()).decode('latin-1')
+            method, target, _ = request_line.split(' ', 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+        except ValueError:
+            # 請求列格式錯誤，或單行超過 StreamReader 的長度上限
+            raise _RequestError(HTTPStatus.BAD_REQUEST, "無效的 HTTP 請求")
+        return method.upper(), urllib.parse.urlsplit(target), headers
+
+    async def _route(self, method, url, headers, reader, writer):
+        parts = [urllib.parse.unquote(part) for part in url.path.strip('/').split('/')]
+        if parts[0] != 'jobs':
+            raise _RequestError(HTTPStatus.NOT_FOUND, f"找不到路徑：{url.path}")
+
+        if len(parts) == 1 and method == 'POST':
+            job = await self._receive_job(url, headers, reader)
+            await _send_json(writer, HTTPStatus.ACCEPTED, self.job_view(job))
+        elif len(parts) == 1 and method == 'GET':
+            await _send_json(writer, HTTPStatus.OK, {
+                'queued': self.queue.qsize(),
+                'workers': self.workers,
+                'jobs': [self.job_view(job) for job in self.jobs.values()],
+            })
+        elif len(parts) == 2 and method == 'GET':
+            await _send_json(writer, HTTPStatus.OK, self.job_view(self._job(parts[1])))
+        elif len(parts) == 4 and parts[2] == 'result' and method == 'GET':
+            await self._send_result(writer, self._job(parts[1]), parts[3])
+        else:
+            raise _RequestError(HTTPStatus.NOT_FOUND, f"找不到路徑：{method} {url.path}")
+
+    def _job(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise _RequestError(HTTPStatus.NOT_FOUND, f"找不到工作：{job_id}")
+        return job
+
+    async def _receive_job(self, url, headers, reader):
+        """檢查參數後將上傳內容串流寫入暫存檔（同時計算 SHA-256），再排入佇列"""
+        params = urllib.parse.parse_qs(url.query)
+        kind = params.get('kind', ['parse'])[0]
+        if kind not in JOB_KINDS:
+            raise _RequestError(HTTPStatus.BAD_REQUEST, f"不支援的工作種類：{kind}")
+        output_format = params.get('format', ['csv'])[0] if kind == 'export' else None
+        if kind == 'export' and output_format not in OUTPUT_FORMATS:
+            raise _RequestError(HTTPStatus.BAD_REQUEST, f"不支援的輸出格式：{output_format}")
+
+        if 'content-length' not in headers:
+            raise _RequestError(HTTPStatus.LENGTH_REQUIRED, "需要 Content-Length")
+        try:
+            size = int(headers['content-length'])
+        except ValueError:
+            raise _RequestError(HTTPStatus.BAD_REQUEST, "Content-Length 格式錯誤")
+        if size > self.max_upload_bytes:
+            raise _RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"上傳檔案超過 {self.max_upload_bytes} 位元組")
+        # 佇列已滿時不接收上傳內容
+        self._check_capacity()
+
+        job_id = uuid.uuid4().hex
+        path = os.path.join(self.upload_dir, job_id + '.xml')
+        digest = hashlib.sha256()
+        try:
+            with open(path, 'wb') as f:
+                remaining = size
+                while remaining:
+                    chunk = await reader.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise _RequestError(HTTPStatus.BAD_REQUEST, "上傳內容不完整")
+                    digest.update(chunk)
+                    f.write(chunk)
+                    remaining -= len(chunk)
+            return self.submit(job_id, kind, path, digest.hexdigest(), size, output_format)
+        except BaseException:
+            _remove_file(path)
+            raise
+
+    async def _send_result(self, writer, job, name):
+        if job['status'] != DONE:
+            raise _RequestError(HTTPStatus.CONFLICT, f"工作尚未完成：{job['status']}")
+        path = job['results'].get(name)
+        if path is None:
+            raise _RequestError(HTTPStatus.NOT_FOUND, f"找不到結果：{name}，可用的結果為 {', '.join(job['results'])}")
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            raise _RequestError(HTTPStatus.GONE, f"結果檔案已移除：{name}")
+        with f:
+            content_type = CONTENT_TYPES.get(os.path.splitext(path)[1], 'application/octet-stream')
+            _write_head(writer, HTTPStatus.OK, content_type, os.fstat(f.fileno()).st_size)
+            while chunk := f.read(CHUNK_SIZE):
+                writer.write(chunk)
+                await writer.drain()
+
+
+def _write_head(writer, status, content_type, length):
+    writer.write(
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {length}\r\n"
+        "Connection: close\r\n\r\n".encode('latin-1')
+    )
+
+
+async def _send_json(writer, status, data):
+    body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+    _write_head(writer, status, 'application/json; charset=utf-8', len(body))
+    writer.write(body)
+    await writer.drain()
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class ServiceClient:
+    """處理服務的 HTTP 用戶端（標準函式庫 urllib），供網頁介面提交工作並輪詢結果"""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def _request(self, path, data=None, timeout=None):
+        request = urllib.request.Request(self.base_url + path, data=data, method='POST' if data is not None else 'GET')
+        if data is not None:
+            request.add_header('Content-Type', 'application/xml')
+        with urllib.request.urlopen(request, timeout=timeout or self.timeout) as response:
+            return response.read()
+
+    def submit(self, data, kind='parse', output_format=None):
+        """上傳 XML（bytes 或 memoryview）並建立工作，返回工作資料"""
+        query = {'kind': kind}
+        if output_format is not None:
+            query['format'] = output_format
+        # 大型檔案的上傳時間不受一般請求逾時限制
+        body = self._request(f"/jobs?{urllib.parse.urlencode(query)}", data, timeout=max(self.timeout, 600))
+        return json.loads(body)
+
+    def status(self, job_id):
+        return json.loads(self._request(f"/jobs/{urllib.parse.quote(job_id)}"))
+
+    def wait(self, job_id, interval=0.5, progress=None):
+        """輪詢工作狀態直到完成，progress(工作資料) 於每次輪詢時呼叫；工作失敗時引發 RuntimeError"""
+        while True:
+            job = self.status(job_id)
+            if progress is not None:
+                progress(job)
+            if job['status'] == DONE:
+                return job
+            if job['status'] == FAILED:
+                raise RuntimeError(f"處理服務工作 {job_id} 失敗：{job['error']}")
+            time.sleep(interval)
+
+    def fetch(self, job_id, name):
+        """下載工作結果的原始位元組"""
+        return self._request(f"/jobs/{urllib.parse.quote(job_id)}/result/{urllib.parse.quote(name)}")
+
+    def fetch_table(self, job_id, table):
+        """下載 parse 工作的 Arrow IPC 資料表並轉換為 DataFrame"""
+        data = self.fetch(job_id, table)
+        return feather.read_table(pa.BufferReader(data)).to_pandas(split_blocks=True)
+
+    def load_documents(self, sources, interval=0.5, progress=None):
+        """先提交所有解析工作（由服務的工作行程平行處理），再依序等待並取回資料表，返回 PCCESDocument 列表"""
+        jobs = [self.submit(data) for data in sources]
+        documents = []
+        for job in jobs:
+            self.wait(job['id'], interval, progress)
+            documents.append(tables_document({table: self.fetch_table(job['id'], table) for table in DOCUMENT_TABLES}))
+        return documents
+
+    def load_document(self, data, interval=0.5, progress=None):
+        """提交解析工作、等待完成後取回資料表，返回 PCCESDocument"""
+        return self.load_documents([data], interval, progress)[0]
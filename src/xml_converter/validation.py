@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+from .instrumentation import stage
+
+# 金額比對容許誤差（元），數量 × 單價 四捨五入到整數元時最多差 0.5
+DEFAULT_TOLERANCE = 1.0
+
+# 檢核類別
+CHECK_LINE = '數量×單價'
+CHECK_CHILDREN = '下層合計'
+CHECK_SUBTOTAL = '小計'
+
+VALIDATION_COLUMNS = [
+    '檢核', '項次路徑', '項次', '項目代碼', '項目種類', '說明',
+    '數量', '單價', '金額', '計算金額', '差額', '重算金額',
+]
+
+
+def parent_indices(depths):
+    """由前序排列的階層深度建立上層項目索引陣列（頂層為 -1）
+
+    上層為之前最近一個深度較淺的項目；每一層以 searchsorted 一次求得，迴圈次數只與最大深度有關。
+    """
+    depths = np.asarray(depths, dtype=np.int64)
+    parents = np.full(len(depths), -1, dtype=np.int64)
+    positions = np.arange(len(depths))
+    for depth in range(1, int(depths.max(initial=0)) + 1):
+        items = positions[depths == depth]
+        candidates = positions[depths < depth]
+        found = np.searchsorted(candidates, items) - 1
+        parents[items] = np.where(found >= 0, candidates[np.maximum(found, 0)], -1)
+    return parents
+
+
+def row_paths(rows, parents, item_nos):
+    """指定項目的項次路徑（例如 壹/一/3），沿上層索引往上串接"""
+    paths = []
+    for row in rows:
+        parts = []
+        while row >= 0:
+            parts.append(item_nos[row].strip())
+            row = parents[row]
+        paths.append("/".join(reversed(parts)))
+    return np.array(paths, dtype=object)
+
+
+def rollup_amounts(parents, depths, amounts, counted):
+    """由下往上逐層重算金額
+
+    沒有下層的項目使用本身金額，上層項目為下層中 counted 項目重算金額的合計；
+    每一層以 bincount 一次加總到上層，迴圈次數只與最大深度有關。
+    返回 (重算金額, 下層申報金額合計, 是否有下層)。
+    """
+    count = len(parents)
+    amounts = np.nan_to_num(amounts)
+    child = (parents >= 0) & counted
+    has_children = np.bincount(parents[parents >= 0], minlength=count) > 0
+    children_sum = np.bincount(parents[child], weights=amounts[child], minlength=count)
+
+    rolled = np.where(has_children, 0.0, amounts)
+    for depth in range(int(depths.max(initial=0)), 0, -1):
+        level = child & (depths == depth)
+        rolled += np.bincount(parents[level], weights=rolled[level], minlength=count)
+    return rolled, children_sum, has_children
+
+
+def preceding_sibling_sums(parents, amounts, counted):
+    """每個項目之前（同一上層、依文件順序）counted 兄弟項目的金額累計（不含自身）"""
+    values = np.where(counted, np.nan_to_num(amounts), 0.0)
+    # 穩定排序使同一上層的兄弟項目相鄰且維持文件順序
+    order = np.argsort(parents, kind='stable')
+    ordered_parents = parents[order]
+    running = np.cumsum(values[order])
+    group_start = np.r_[True, ordered_parents[1:] != ordered_parents[:-1]]
+    # 每組開始前的累計值
+    offset = np.maximum.accumulate(np.where(group_start, np.arange(len(order)), 0))
+    before_group = np.where(offset > 0, running[offset - 1], 0.0)
+    result = np.empty(len(parents), dtype=np.float64)
+    result[order] = running - before_group - values[order]
+    return result
+
+
+def validate_amounts(df, tolerance=DEFAULT_TOLERANCE):
+    """檢核 PayItem 資料表的金額一致性，返回差異列表（沒有差異時為空表）
+
+    - 沒有下層的項目（小計除外）：數量 × 單價 應等於金額
+    - 有下層的項目：金額應等於下層非小計項目金額合計
+    - 沒有下層的小計：金額應等於之前同層非小計項目金額合計
+    重算金額為由最下層逐層加總的結果，可看出差異對上層總額的影響。
+    """
+    if df is None or not len(df):
+        return pd.DataFrame(columns=VALIDATION_COLUMNS)
+
+    with stage("validate", items=len(df)):
+        depths = df['階層'].to_numpy(np.int64)
+        parents = parent_indices(depths)
+        quantity = df['數量'].to_numpy(np.float64, na_value=np.nan)
+        price = df['單價'].to_numpy(np.float64, na_value=np.nan)
+        amount = df['金額'].to_numpy(np.float64, na_value=np.nan)
+        subtotal = (df['項目種類'] == 'subtotal').to_numpy(bool, na_value=False)
+
+        rolled, children_sum, has_children = rollup_amounts(parents, depths, amount, ~subtotal)
+        sibling_sum = preceding_sibling_sums(parents, amount, ~subtotal)
+        has_amount = ~np.isnan(amount)
+
+        line = ~has_children & ~subtotal & has_amount & ~np.isnan(quantity) & ~np.isnan(price)
+        leaf_subtotal = ~has_children & subtotal & has_amount
+        checks = (
+            (CHECK_LINE, line, quantity * price),
+            (CHECK_CHILDREN, has_children & has_amount, children_sum),
+            (CHECK_SUBTOTAL, leaf_subtotal, sibling_sum),
+        )
+
+        item_nos = df['項次'].to_numpy()
+        frames = []
+        for name, applies, expected in checks:
+            mismatch = applies & (np.abs(amount - expected) > tolerance)
+            rows = np.flatnonzero(mismatch)
+            if not len(rows):
+                continue
+            frames.append(pd.DataFrame({
+                '檢核': name,
+                '項次路徑': row_paths(rows.tolist(), parents, item_nos),
+                '項次': item_nos[rows],
+                '項目代碼': df['項目代碼'].to_numpy()[rows],
+                '項目種類': df['項目種類'].to_numpy()[rows],
+                '說明': df['說明'].to_numpy()[rows],
+                '數量': quantity[rows],
+                '單價': price[rows],
+                '金額': amount[rows],
+                '計算金額': expected[rows],
+                '差額': amount[rows] - expected[rows],
+                '重算金額': rolled[rows],
+                '_row': rows,
+            }))
+        if not frames:
+            return pd.DataFrame(columns=VALIDATION_COLUMNS)
+        # 依文件順序排列
+        result = pd.concat(frames, ignore_index=True).sort_values('_row', kind='stable')
+        return result[VALIDATION_COLUMNS].reset_index(drop=True)
@@ -1,10 +1,52 @@
+import io
+import time
+
 from lxml import etree as ET
 
+from .item_store import ITEM_COLUMNS, ItemStore
+
 # XML namespace
 NAMESPACES = {
     'ns': 'http://pcstd.pcc.gov.tw/2003/eTender'
 }
 
+# 帶命名空間的標籤名稱（供 iterparse 與直接子節點比對使用）
+_NS = "{%s}" % NAMESPACES['ns']
+_ITEM_TAGS = (_NS + "PayItem", _NS + "WorkItem")
+_LANGUAGE_FIELDS = {_NS + "Description": "description", _NS + "Unit": "unit"}
+_VALUE_FIELDS = {_NS + "Quantity": "quantity", _NS + "Price": "price", _NS + "Amount": "amount"}
+_FIELD_TAGS = {**_LANGUAGE_FIELDS, **_VALUE_FIELDS}
+_CHILD_TAGS = _ITEM_TAGS + tuple(_FIELD_TAGS)
+_COST_BREAKDOWN_TAG = _NS + "CostBreakdownList"
+
+# iterparse 串流處理時尚未結束的項目位置
+_UNFILLED = object()
+
+
+class _BufferReader:
+    """以唯讀檔案介面包裝記憶體緩衝區，供 iterparse 分段讀取而不複製整份內容"""
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast("B")
+        self._position = 0
+
+    @classmethod
+    def wrap(cls, source):
+        """bytes 類型的來源包裝為可讀取物件，路徑與檔案物件原樣返回"""
+        if isinstance(source, io.BytesIO):
+            source.seek(0)
+            return source
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return cls(source)
+        return source
+
+    def read(self, size=-1):
+        end = len(self._view) if size is None or size < 0 else min(self._position + size, len(self._view))
+        chunk = self._view[self._position:end].tobytes()
+        self._position = end
+        return chunk
+
+
 class XMLProcessor:
     @staticmethod
     def get_text_from_node(node, xpath):
@@ -34,108 +76,218 @@ class XMLProcessor:
             return "%"
         return ""
 
+    @staticmethod
+    def read_children(node):
+        """一次讀取節點的直接子節點，返回欄位文字與需要繼續走訪的子節點
+
+        只看直接子節點，不會讀到巢狀子項目的說明或數量。
+        """
+        fields = {}
+        subnodes = []
+        for child in node:
+            tag = child.tag
+            field = _FIELD_TAGS.get(tag)
+            if field is not None:
+                if field in fields or (tag in _LANGUAGE_FIELDS and child.get("language") != "zh-TW"):
+                    continue
+                text = child.text
+                fields[field] = text.strip() if text else ""
+            elif tag in _ITEM_TAGS or len(child):
+                subnodes.append(child)
+        return fields, subnodes
+
+    @classmethod
+    def process_xml_node(cls, node, node_string, depth=None):
+        """處理 XML 節點（已知深度時由呼叫端傳入，避免逐層往上計算）"""
+        fields, _ = cls.read_children(node)
+        if depth is None:
+            depth = cls.get_element_depth(node)
+        return cls.build_row(node.attrib, node_string, fields, depth)
+
     @classmethod
-    def process_xml_node(cls, node, node_string):
-        """處理 XML 節點"""
+    def build_row(cls, attrib, node_string, fields, depth):
+        """由節點屬性與欄位文字組成一筆項目資料，VAR 項目返回 None"""
+        values = cls.build_values(attrib, node_string, fields, depth)
+        return dict(zip(ITEM_COLUMNS, values)) if values else None
+
+    @classmethod
+    def build_values(cls, attrib, node_string, fields, depth):
+        """依 ITEM_COLUMNS 順序返回項目欄位值，VAR 項目返回 None"""
         if node_string == "WorkItem":
-            item_code = node.attrib.get("itemCode", "")
-            item_no = node.attrib.get("itemNo", "")
+            item_code = attrib.get("itemCode", "")
         else:
-            item_code = node.attrib.get("refItemCode", "")
-            item_no = node.attrib.get("itemNo", "")
-        
-        item_kind = node.attrib.get("itemKind", "")
-        description = cls.get_text_from_node(node, ".//ns:Description[@language='zh-TW']")
-        unit = cls.get_text_from_node(node, ".//ns:Unit[@language='zh-TW']")
-        quantity = cls.get_text_from_node(node, ".//ns:Quantity")
-        price = cls.get_text_from_node(node, ".//ns:Price")
-        amount = cls.get_text_from_node(node, ".//ns:Amount")
-        depth = cls.get_element_depth(node)
-        sep = cls.get_separator(item_kind, description, item_no)
-
-        if not (item_no if 'item_no' in locals() else '').startswith("VAR"):
-            return {
-                '項目代碼': item_code,
-                '項目種類': item_kind,
-                '項次': item_no,
-                '說明': description,
-                '單位': unit,
-                '數量': quantity,
-                '單價': price,
-                '金額': amount,
-                '階層': depth,
-                '分隔符號': sep
-            }
-        return None
+            item_code = attrib.get("refItemCode", "")
+        item_no = attrib.get("itemNo", "")
+        if item_no.startswith("VAR"):
+            return None
+        item_kind = attrib.get("itemKind", "")
+        description = fields.get('description', "")
+        return (
+            item_code,
+            item_kind,
+            item_no,
+            description,
+            fields.get('unit', ""),
+            fields.get('quantity', ""),
+            fields.get('price', ""),
+            fields.get('amount', ""),
+            depth,
+            cls.get_separator(item_kind, description, item_no)
+        )
+
+    @staticmethod
+    def parse_xml(file_path):
+        """解析 XML 並返回根節點
+
+        file_path 可為檔案路徑、bytes/bytearray/memoryview 或檔案物件；
+        BytesIO（例如 Streamlit 的上傳檔案）直接由其內部緩衝區解析，不另外複製。
+        """
+        parser = ET.XMLParser(huge_tree=True)
+        if isinstance(file_path, io.BytesIO):
+            with file_path.getbuffer() as buffer:
+                return ET.fromstring(buffer, parser)
+        if isinstance(file_path, (bytes, bytearray, memoryview)):
+            return ET.fromstring(file_path, parser)
+        return ET.parse(file_path, parser).getroot()
 
     @classmethod
     def process_xml_file(cls, file_path, item_type="PayItem"):
         """處理 XML 檔案並返回所有項目的資料"""
-        tree = ET.parse(file_path)
-        root = tree.getroot()
-        
-        xpath = ".//ns:PayItem" if item_type == "PayItem" else ".//ns:CostBreakdownList/ns:WorkItem"
-        items = root.findall(xpath, NAMESPACES)
-        
+        return cls.process_xml_root(cls.parse_xml(file_path), item_type)
+
+    @classmethod
+    def process_xml_root(cls, root, item_type="PayItem"):
+        """處理已解析的 XML 根節點並返回所有項目的資料"""
         data = []
-        for item in items:
-            item_data = cls.process_xml_node(item, item_type)
+        for node, fields, depth in cls.iter_item_nodes(root, item_type):
+            item_data = cls.build_row(node.attrib, item_type, fields, depth)
             if item_data:
                 data.append(item_data)
         
         return data
 
+    @classmethod
+    def process_xml_store(cls, root, item_type="PayItem"):
+        """處理已解析的 XML 根節點，直接填入欄位式的 ItemStore"""
+        store = ItemStore()
+        for node, fields, depth in cls.iter_item_nodes(root, item_type):
+            values = cls.build_values(node.attrib, item_type, fields, depth)
+            if values:
+                store.append(*values)
+        return store
+
+    @classmethod
+    def iter_item_nodes(cls, root, item_type="PayItem"):
+        """依文件順序產生 (節點, 欄位, 深度)
+
+        PayItem 以前序走訪整棵樹（不進入只含 WorkItem 的 CostBreakdownList），深度隨走訪往下傳遞；
+        WorkItem 只取 CostBreakdownList 的直接子項目。
+        """
+        if item_type != "PayItem":
+            for node in root.iterfind(".//ns:CostBreakdownList/ns:WorkItem", NAMESPACES):
+                fields, _ = cls.read_children(node)
+                yield node, fields, cls.get_element_depth(node)
+            return
+
+        target_tag = _NS + item_type
+        stack = [(root, 0)]
+        while stack:
+            node, depth = stack.pop()
+            if node.tag == _COST_BREAKDOWN_TAG:
+                continue
+            is_item = node.tag in _ITEM_TAGS
+            fields, subnodes = cls.read_children(node)
+            if node.tag == target_tag:
+                yield node, fields, depth
+            child_depth = depth + 1 if is_item else depth
+            stack.extend((child, child_depth) for child in reversed(subnodes))
+
+    @classmethod
+    def iter_xml_file(cls, file_path, item_type="PayItem", stats=None):
+        """以 iterparse 串流處理 XML 檔案，逐筆產生與 process_xml_file 相同的項目資料
+
+        file_path 可為檔案路徑、bytes/memoryview 或檔案物件。
+        處理完的節點會立即清除，XML 樹的記憶體用量不隨檔案大小成長。
+        項目在開始標籤時依前序保留位置，結束標籤時才建立資料（下層項目之後的欄位也會讀取），
+        最前面尚未填入的位置之前的資料隨即輸出，下層項目只暫存到其上層項目結束。
+        若傳入 stats 字典，結束時會寫入 items、seconds 與 items_per_second。
+        """
+        target_tag = _NS + item_type
+        start_time = time.perf_counter()
+        count = 0
+        # 開啟中的 PayItem/WorkItem：[element, 輸出位置（非輸出項目為 None）, 欄位, 深度]
+        open_items = []
+        # 依前序排列的項目資料，尚未結束的項目為 _UNFILLED
+        pending = []
+        # 最前面尚未輸出的位置
+        next_slot = 0
+
+        context = ET.iterparse(
+            _BufferReader.wrap(file_path),
+            events=("start", "end"),
+            tag=_CHILD_TAGS,
+            huge_tree=True
+        )
+        try:
+            for event, elem in context:
+                tag = elem.tag
+                if tag in _ITEM_TAGS:
+                    if event == "start":
+                        is_target = tag == target_tag
+                        if is_target and item_type == "WorkItem":
+                            # 只處理 CostBreakdownList 的直接子項目
+                            parent = elem.getparent()
+                            is_target = parent is not None and parent.tag == _NS + "CostBreakdownList"
+                        slot = None
+                        if is_target:
+                            slot = len(pending)
+                            pending.append(_UNFILLED)
+                        open_items.append([elem, slot, {}, len(open_items)])
+                    else:
+                        _, slot, fields, depth = open_items.pop()
+                        if slot is not None:
+                            pending[slot] = cls.build_row(elem.attrib, item_type, fields, depth)
+                            while next_slot < len(pending) and pending[next_slot] is not _UNFILLED:
+                                row = pending[next_slot]
+                                pending[next_slot] = None
+                                next_slot += 1
+                                if row:
+                                    count += 1
+                                    yield row
+                            if next_slot == len(pending):
+                                # 保留的位置都已輸出
+                                pending = []
+                                next_slot = 0
+                        # 清除已處理的節點與先前的兄弟節點
+                        elem.clear(keep_tail=True)
+                        parent = elem.getparent()
+                        if parent is not None:
+                            while elem.getprevious() is not None:
+                                del parent[0]
+                elif event == "end" and open_items and elem.getparent() is open_items[-1][0]:
+                    if tag in _LANGUAGE_FIELDS:
+                        if elem.get("language") == "zh-TW":
+                            field = _LANGUAGE_FIELDS[tag]
+                        else:
+                            continue
+                    else:
+                        field = _VALUE_FIELDS[tag]
+                    open_items[-1][2].setdefault(field, elem.text.strip() if elem.text else "")
+        finally:
+            del context
+            if stats is not None:
+                seconds = time.perf_counter() - start_time
+                stats['items'] = count
+                stats['seconds'] = seconds
+                stats['items_per_second'] = count / seconds if seconds > 0 else 0.0
+
     @classmethod
     def process_cost_breakdown_tree(cls, file_path):
         """處理 CostBreakdownList 並返回樹狀結構資料"""
-        tree = ET.parse(file_path)
-        root = tree.getroot()
-        
-        cost_breakdown = root.find(".//ns:CostBreakdownList", NAMESPACES)
-        if cost_breakdown is None:
-            return []
-        
-        def process_work_item(node, parent_id=""):
-            item_code = node.attrib.get("itemCode", "")
-            ref_item_no = node.attrib.get("refItemNo", "")
-            item_kind = node.attrib.get("itemKind", "")
-            output_quantity = node.attrib.get("analysisOutputQuantity", "")
-            
-            description = cls.get_text_from_node(node, ".//ns:Description[@language='zh-TW']")
-            unit = cls.get_text_from_node(node, ".//ns:Unit[@language='zh-TW']")
-            quantity = cls.get_text_from_node(node, ".//ns:Quantity")
-            price = cls.get_text_from_node(node, ".//ns:Price")
-            amount = cls.get_text_from_node(node, ".//ns:Amount")
-            
-            current_id = f"{parent_id}/{item_code}" if parent_id else item_code
-            
-            result = {
-                'id': current_id,
-                'parent': parent_id,
-                'item_code': item_code,
-                'ref_item_no': ref_item_no,
-                'item_kind': item_kind,
-                'description': description,
-                'unit': unit,
-                'quantity': quantity,
-                'price': price,
-                'amount': amount,
-                'output_quantity': output_quantity,
-                'children': []
-            }
-            
-            # 處理子項目
-            for child in node.findall(".//ns:WorkItem", NAMESPACES):
-                if child.getparent() == node:  # 只處理直接子項目
-                    child_data = process_work_item(child, current_id)
-                    result['children'].append(child_data)
-            
-            return result
-        
-        # 處理頂層 WorkItem
-        result = []
-        for work_item in cost_breakdown.findall("./ns:WorkItem", NAMESPACES):
-            item_data = process_work_item(work_item)
-            result.append(item_data)
-        
-        return result
+        return cls.process_cost_breakdown_root(cls.parse_xml(file_path))
+
+    @classmethod
+    def process_cost_breakdown_root(cls, root):
+        """處理已解析 XML 根節點中的 CostBreakdownList 並返回樹狀結構資料"""
+        from .cost_tree import CostTree
+        return CostTree.from_xml_root(root).to_nested()
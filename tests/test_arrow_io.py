@@ -0,0 +1,82 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import write_synthetic_xml
+from src.xml_converter import arrow_io
+from src.xml_converter.arrow_io import ArrowDocumentCache, document_tables
+from src.xml_converter.cache import content_digest
+from src.xml_converter.document import PCCESDocument
+
+
+@pytest.fixture(scope="module")
+def xml_bytes(tmp_path_factory):
+    path = tmp_path_factory.mktemp("xml") / "synthetic.xml"
+    write_synthetic_xml(str(path), pay_items=50, main_items=2, analyses=10, fanout=3, nesting=2, shared=3)
+    return path.read_bytes()
+
+
+@pytest.fixture
+def parse_count(monkeypatch):
+    """記錄 get_or_parse 解析 XML 的次數"""
+    calls = []
+
+    class CountingDocument(PCCESDocument):
+        def __init__(self, source):
+            calls.append(source)
+            super().__init__(source)
+
+    monkeypatch.setattr(arrow_io, "PCCESDocument", CountingDocument)
+    return calls
+
+
+def _assert_same_tables(document, expected):
+    for name, frame in document_tables(document).items():
+        pd.testing.assert_frame_equal(frame, expected[name])
+
+
+def test_store_load_round_trip(tmp_path, xml_bytes):
+    cache = ArrowDocumentCache(str(tmp_path))
+    document = PCCESDocument(xml_bytes)
+    expected = document_tables(document)
+    digest = content_digest(xml_bytes)
+
+    cache.store(digest, document)
+    assert digest in cache
+    loaded = cache.load(digest)
+    assert loaded.root is None
+    _assert_same_tables(loaded, expected)
+    pd.testing.assert_frame_equal(loaded.to_dataframe("PayItem"), document.to_dataframe("PayItem"))
+
+
+def test_format_version_mismatch_parses_again(tmp_path, xml_bytes, parse_count):
+    cache = ArrowDocumentCache(str(tmp_path))
+    digest = content_digest(xml_bytes)
+    cache.get_or_parse(xml_bytes)
+    cache.get_or_parse(xml_bytes)
+    assert len(parse_count) == 1
+
+    meta = os.path.join(cache.path(digest), "meta.json")
+    with open(meta, "w", encoding="utf-8") as f:
+        json.dump({"version": arrow_io.CACHE_FORMAT_VERSION - 1}, f)
+    assert digest not in cache
+    assert cache.load(digest) is None
+
+    document = cache.get_or_parse(xml_bytes)
+    assert len(parse_count) == 2
+    assert digest in cache
+    _assert_same_tables(cache.load(digest), document_tables(document))
+
+
+def test_unwritable_cache_returns_uncached_document(tmp_path, xml_bytes):
+    # 快取目錄的位置是一般檔案，無法建立目錄
+    blocked = tmp_path / "cache"
+    blocked.write_text("")
+    cache = ArrowDocumentCache(str(blocked / "arrow"))
+    document = cache.get_or_parse(xml_bytes)
+    assert document.item_count("PayItem") == PCCESDocument(xml_bytes).item_count("PayItem")
+    assert content_digest(xml_bytes) not in cache
+    with pytest.raises(OSError):
+        cache.store(content_digest(xml_bytes), document)
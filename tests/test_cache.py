@@ -0,0 +1,70 @@
+from src.xml_converter.cache import DocumentCache
+from src.xml_converter.document import PCCESDocument, object_nbytes
+
+NAMESPACE = "http://pcstd.pcc.gov.tw/2003/eTender"
+XML = (
+    f'<ETenderSheet xmlns="{NAMESPACE}"><DetailList>'
+    '<PayItem itemKey="1" itemNo="1" refItemCode="A001" itemKind="analysis">'
+    '<Description language="zh-TW">工作項目</Description><Quantity>1</Quantity>'
+    '</PayItem></DetailList></ETenderSheet>'
+).encode("utf-8")
+
+
+class _Document:
+    """只提供 nbytes 的測試文件"""
+
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+
+
+def test_put_evicts_least_recently_used_past_max_bytes():
+    cache = DocumentCache(max_bytes=250)
+    for digest in "abc":
+        cache.put(digest, _Document(100), 100)
+    # 加入 c 時超過上限，淘汰最久未使用的 a
+    assert list(cache._entries) == ["b", "c"]
+    assert cache.total_bytes == 200
+
+    cache.get("b")
+    cache.put("d", _Document(100), 100)
+    assert list(cache._entries) == ["b", "d"]
+
+
+def test_touched_entry_is_measured_again():
+    cache = DocumentCache(max_bytes=250)
+    documents = {digest: _Document(100) for digest in "ab"}
+    for digest, document in documents.items():
+        cache.get_or_load(digest, lambda: document)
+    assert cache.total_bytes == 200
+
+    # b 在使用期間建立了新的檢視，再次取得時重新計算大小並淘汰 a
+    documents["b"].nbytes = 200
+    assert cache.get_or_load("b", lambda: None) is documents["b"]
+    assert list(cache._entries) == ["b"]
+    assert cache.total_bytes == 200
+
+    # 最近使用的文件即使單獨超過上限也保留
+    documents["b"].nbytes = 400
+    cache.get_or_load("b", lambda: None)
+    assert list(cache._entries) == ["b"]
+    assert cache.total_bytes == 400
+
+
+def test_derived_artifacts_count_towards_document_size():
+    document = PCCESDocument(XML).release_xml()
+    before = document.nbytes
+    payload = document.derived("export", lambda: b"x" * 10000)
+    assert document.derived("export", lambda: b"") is payload
+    assert document.nbytes == before + 10000
+
+    cache = DocumentCache(max_bytes=before + 5000)
+    other = PCCESDocument(XML).release_xml()
+    cache.get_or_load("other", lambda: other)
+    cache.get_or_load("document", lambda: document)
+    assert list(cache._entries) == ["document"]
+
+
+def test_object_nbytes_counts_nested_containers():
+    text = "單價分析" * 100
+    assert object_nbytes(b"abc") == 3
+    assert object_nbytes({"key": [text, text]}) > object_nbytes(text)
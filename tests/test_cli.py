@@ -0,0 +1,22 @@
+from src.xml_converter.cli import main
+
+NAMESPACE = "http://pcstd.pcc.gov.tw/2003/eTender"
+VALID_XML = (
+    f'<ETenderSheet xmlns="{NAMESPACE}"><DetailList>'
+    '<PayItem itemKey="1" itemNo="1" refItemCode="A001" itemKind="analysis">'
+    '<Description language="zh-TW">工作項目</Description>'
+    '<Quantity>2</Quantity><Price>3</Price><Amount>6</Amount>'
+    '</PayItem></DetailList></ETenderSheet>'
+)
+
+
+def test_validate_reports_unreadable_files_and_continues(tmp_path, capsys):
+    broken = tmp_path / "a_broken.xml"
+    broken.write_text("<ETenderSheet", encoding="utf-8")
+    valid = tmp_path / "b_valid.xml"
+    valid.write_text(VALID_XML, encoding="utf-8")
+
+    assert main(["validate", str(broken), str(valid)]) == 1
+    captured = capsys.readouterr()
+    assert f"{broken}：XMLSyntaxError" in captured.err
+    assert f"{valid}：1 筆，0 筆金額不一致" in captured.out
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import write_synthetic_xml
+from src.xml_converter.cost_tree import CostDag, CostTree
+from src.xml_converter.resources import ResourceAggregator
+from src.xml_converter.xml_processor import XMLProcessor
+
+NAMESPACE = "http://pcstd.pcc.gov.tw/2003/eTender"
+
+
+def _work_item(code, kind, quantity, body="", ref=""):
+    return (
+        f'<WorkItem itemCode="{code}" itemKind="{kind}" refItemNo="{ref}" analysisOutputQuantity="1">'
+        f'<Description language="zh-TW">{code}</Description><Unit language="zh-TW">式</Unit>'
+        f'<Quantity>{quantity}</Quantity><Price>10</Price><Amount>{quantity * 10}</Amount>'
+        f'{body}</WorkItem>'
+    )
+
+
+# 同一共用分析 S001 被兩個分析以不同的數量、金額與參考編號引用
+SHARED = _work_item("L001", "labor", 2) + _work_item("M001", "material", 3)
+VARIED_USE_XML = (
+    f'<ETenderSheet xmlns="{NAMESPACE}"><CostBreakdownList>'
+    + _work_item("A001", "analysis", 1, _work_item("S001", "analysis", 4, SHARED, ref="1"))
+    + _work_item("A002", "analysis", 1, _work_item("S001", "analysis", 7, SHARED, ref="2"))
+    + '</CostBreakdownList></ETenderSheet>'
+).encode("utf-8")
+
+
+def _graphs(source):
+    root = XMLProcessor.parse_xml(source)
+    return CostTree.from_xml_root(root), CostDag.from_xml_root(root)
+
+
+@pytest.fixture(scope="module")
+def shared_xml(tmp_path_factory):
+    path = tmp_path_factory.mktemp("xml") / "shared.xml"
+    return write_synthetic_xml(str(path), pay_items=100, main_items=2, analyses=100, fanout=4, nesting=2, shared=5)
+
+
+def test_shared_analysis_keeps_per_use_fields():
+    tree, dag = _graphs(VARIED_USE_XML)
+    # 兩處引用共用下層，只各自保存引用處的節點
+    assert len(tree) == 8
+    assert len(dag) == 6
+    assert dag.expand().to_nested() == tree.to_nested()
+    uses = [dag.row(child) for root in dag.roots() for child in dag.children(root)]
+    assert [(row['數量'], row['金額'], row['參考編號']) for row in uses] == [('4', '40', '1'), ('7', '70', '2')]
+
+
+def test_dag_matches_tree_on_shared_xml(shared_xml):
+    tree, dag = _graphs(shared_xml)
+    assert len(dag) < len(tree)
+    assert dag.expanded_len() == len(tree)
+    assert dag.expand().to_nested() == tree.to_nested()
+
+    codes = list(tree.code_index)
+    tree_positions, tree_children = tree.expand_children(tree.lookup(codes))
+    dag_positions, dag_children = dag.expand_children(dag.lookup(codes))
+    assert np.array_equal(tree_positions, dag_positions)
+    assert [tree.row(i) for i in tree_children] == [dag.row(i) for i in dag_children]
+
+    def details(graph):
+        return [(graph.row(i), [graph.row(d) for d in ids]) for i, ids in graph.analysis_details()]
+    assert details(dag) == details(tree)
+
+    quantities = np.arange(1, len(codes) + 1, dtype=np.float64)
+    assert (ResourceAggregator(dag).aggregate(dag.lookup(codes), quantities)
+            == ResourceAggregator(tree).aggregate(tree.lookup(codes), quantities))
@@ -0,0 +1,39 @@
+from src.xml_converter.diff import CHANGED, UNCHANGED, compare_tables, diff_summary, version_table
+from src.xml_converter.document import PCCESDocument
+
+NAMESPACE = "http://pcstd.pcc.gov.tw/2003/eTender"
+
+
+def _pay_item(item_no, kind, amount, body="", code=""):
+    return (
+        f'<PayItem itemKey="{item_no}" itemNo="{item_no}" refItemCode="{code}" itemKind="{kind}">'
+        f'<Description language="zh-TW">{item_no}</Description>'
+        f'<Quantity>1</Quantity><Price>{amount}</Price><Amount>{amount}</Amount>'
+        f'{body}</PayItem>'
+    )
+
+
+def _version(first_amount):
+    # 壹 之下兩個工作項目與其小計，小計金額為兩項的合計
+    items = (
+        _pay_item("1", "analysis", first_amount, code="A001")
+        + _pay_item("2", "analysis", 200, code="A002")
+        + _pay_item("3", "subtotal", first_amount + 200)
+    )
+    xml = (
+        f'<ETenderSheet xmlns="{NAMESPACE}"><DetailList>'
+        + _pay_item("壹", "mainItem", first_amount + 200, items)
+        + '</DetailList></ETenderSheet>'
+    )
+    return version_table(PCCESDocument(xml.encode("utf-8")))
+
+
+def test_subtotal_rows_are_not_summed():
+    diff = compare_tables(_version(100), _version(150))
+    assert diff.set_index('項次路徑')['狀態'].to_dict() == {
+        '壹': CHANGED, '壹/1': CHANGED, '壹/2': UNCHANGED, '壹/3': CHANGED,
+    }
+    assert diff.set_index('項次路徑')['項目種類']['壹/3'] == 'subtotal'
+    summary = diff_summary(diff)
+    assert summary['金額差合計'] == 50
+    assert summary[CHANGED] == 3
@@ -0,0 +1,76 @@
+import gzip
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.xml_converter.excel_to_xml import MAX_INDENT_LEVEL, ExcelToXMLConverter
+
+
+def _tree_bytes(df):
+    """舊版建立整棵樹再以 save_xml 寫出的結果"""
+    root, detail_list = ExcelToXMLConverter._create_document()
+    ExcelToXMLConverter._convert_rows(df, detail_list)
+    output = io.BytesIO()
+    ExcelToXMLConverter.save_xml(root, output)
+    return output.getvalue()
+
+
+def _stream_bytes(df, compress=False):
+    output = io.BytesIO()
+    ExcelToXMLConverter.write_xml(df, output, compress)
+    return output.getvalue()
+
+
+def _deep_sheet():
+    """超過 MAX_INDENT_LEVEL 層的巢狀項目，並含空白儲存格"""
+    depth = MAX_INDENT_LEVEL + 5
+    rows = [
+        {'項次': str(level + 1), '項目代碼': f"C{level:03d}", '項目種類': 'mainItem',
+         '說明': f"第{level}層", '單位': '式', '數量': 1, '單價': 10.5, '金額': 10.5, '階層': level}
+        for level in range(depth)
+    ]
+    rows += [
+        # 由最深層回到較淺的層級
+        {'項次': '1', '項目代碼': 'A001', '項目種類': 'analysis', '說明': '分析項目',
+         '單位': 'M3', '數量': 2.5, '單價': 100, '金額': 250, '階層': 3},
+        {'項次': '2', '項目代碼': np.nan, '項目種類': np.nan, '說明': np.nan,
+         '單位': np.nan, '數量': np.nan, '單價': None, '金額': np.nan, '階層': np.nan},
+        {'項次': '貳', '項目代碼': '', '項目種類': '', '說明': '', '單位': '', '數量': 0, '單價': 0, '金額': 0, '階層': 0},
+    ]
+    return pd.DataFrame(rows)
+
+
+@pytest.mark.parametrize("sheet", [
+    _deep_sheet(),
+    # 沒有階層欄位時由項次推斷層級，缺少的欄位以預設值填入
+    pd.DataFrame({'項次': ['壹', '一', '(一)', '1', '(1)', '2', '二', '貳'],
+                  '說明': ['a', 'b', None, 'd', 'e', np.nan, 'g', 'h']}),
+    pd.DataFrame(columns=['項次', '說明']),
+], ids=["deep", "inferred", "empty"])
+def test_write_xml_matches_tree_output(sheet):
+    expected = _tree_bytes(sheet)
+    assert _stream_bytes(sheet) == expected
+    assert b"".join(ExcelToXMLConverter.iter_xml_chunks(sheet)) == expected
+
+
+def test_deep_sheet_reaches_indent_limit():
+    output = _stream_bytes(_deep_sheet())
+    assert b"\n" + b"  " * MAX_INDENT_LEVEL + b"<PayItem" in output
+    assert b"\n" + b"  " * (MAX_INDENT_LEVEL + 1) not in output
+
+
+@pytest.mark.parametrize("sheet", [_deep_sheet(), pd.DataFrame(columns=['項次'])], ids=["deep", "empty"])
+def test_gzip_output_decompresses_to_plain_output(sheet):
+    plain = _stream_bytes(sheet)
+    assert gzip.decompress(_stream_bytes(sheet, compress=True)) == plain
+    assert gzip.decompress(b"".join(ExcelToXMLConverter.iter_xml_chunks(sheet, compress=True))) == plain
+
+
+def test_gzip_output_to_path(tmp_path):
+    sheet = _deep_sheet()
+    path = tmp_path / "output.xml.gz"
+    ExcelToXMLConverter.write_xml(sheet, str(path), compress=True)
+    with gzip.open(path, "rb") as f:
+        assert f.read() == _stream_bytes(sheet)
@@ -0,0 +1,93 @@
+import math
+
+import pytest
+
+from src.xml_converter.hierarchy import (
+    ARABIC_NUMERAL,
+    CHINESE_NUMERAL,
+    FORMAL_NUMERAL,
+    LEAF,
+    PAREN_ARABIC_NUMERAL,
+    PAREN_CHINESE_NUMERAL,
+    infer_item_kind,
+    infer_levels,
+    item_level,
+    iter_parent_counts,
+)
+
+
+@pytest.mark.parametrize("item_no, expected", [
+    ("壹", FORMAL_NUMERAL),
+    ("貳、", FORMAL_NUMERAL),
+    ("一", CHINESE_NUMERAL),
+    ("十二.", CHINESE_NUMERAL),
+    ("(一)", PAREN_CHINESE_NUMERAL),
+    ("（二）", PAREN_CHINESE_NUMERAL),
+    ("1", ARABIC_NUMERAL),
+    ("3、", ARABIC_NUMERAL),
+    # 數值欄位讀入的項次
+    ("1.0", ARABIC_NUMERAL),
+    (" 2.0 ", ARABIC_NUMERAL),
+    (12.0, ARABIC_NUMERAL),
+    ("(1)", PAREN_ARABIC_NUMERAL),
+    ("（2）", PAREN_ARABIC_NUMERAL),
+    ("1.5", LEAF),
+    ("A-1", LEAF),
+    ("", LEAF),
+])
+def test_item_level(item_no, expected):
+    assert item_level(item_no) == expected
+
+
+def _parents(item_nos, levels):
+    """每列上層項目的項次，頂層為 None"""
+    stack = []
+    parents = []
+    for item_no, count in zip(item_nos, iter_parent_counts(levels)):
+        del stack[count:]
+        parents.append(stack[-1] if stack else None)
+        stack.append(item_no)
+    return parents
+
+
+@pytest.mark.parametrize("item_nos, explicit, expected", [
+    # 沒有階層欄位：由項次推斷
+    (["壹", "一", "1", "(1)", "2", "二"], None,
+     [None, "壹", "一", "1", "一", "壹"]),
+    # 階層欄位全空白：同樣由項次推斷
+    (["壹", "1.0", "2.0"], [None, math.nan, ""],
+     [None, "壹", "壹"]),
+    # 只使用欄位數值，項次 A 由欄位歸入 1 之下
+    (["壹", "1", "A", "2"], [0, 1, 2, 1],
+     [None, "壹", "1", "壹"]),
+    # 空白的列沿用同一項次類別最近一次的層級
+    (["壹", "1", "(1)", "2", "(2)"], [0, 1, 2, None, None],
+     [None, "壹", "1", "壹", "2"]),
+    # 項次類別未出現過時視為上一列的下層
+    (["壹", "1", "A-1", "2"], [0, 1, None, None],
+     [None, "壹", "1", "壹"]),
+    # 第一列空白時為頂層
+    (["X", "1"], [None, 1],
+     [None, "X"]),
+])
+def test_infer_levels_parents(item_nos, explicit, expected):
+    assert _parents(item_nos, infer_levels(item_nos, explicit)) == expected
+
+
+def test_explicit_levels_are_not_mixed_with_numeral_classes():
+    # 欄位使用 0 與 1，沒有欄位值的 (1) 若取類別常數 4 會被誤判為更深的層級
+    levels = infer_levels(["壹", "1", "(1)"], [0, 1, None])
+    assert levels == [0, 1, 2]
+
+
+@pytest.mark.parametrize("item_kind, item_no, expected", [
+    ("", "壹", "mainItem"),
+    ("analysis", "一", "mainItem"),
+    ("nan", "(一)", "mainItem"),
+    ("analysis", "1", "analysis"),
+    ("subtotal", "1.0", "subtotal"),
+    ("", "(1)", ""),
+    ("nan", "A-1", ""),
+])
+def test_infer_item_kind(item_kind, item_no, expected):
+    assert infer_item_kind(item_kind, item_no) == expected
@@ -0,0 +1,26 @@
+import os
+
+from src.xml_converter.instrumentation import Profiler
+
+
+def test_stage_records_bytes_separately_from_items():
+    profiler = Profiler(enabled=True)
+    with profiler.collect() as records:
+        with profiler.stage("upload", nbytes=2048) as record:
+            record['items'] = 3
+    assert records[0]['bytes'] == 2048
+    assert records[0]['items'] == 3
+    text = profiler.metrics_text()
+    assert f'pcces_stage_items_total{{stage="upload",pid="{os.getpid()}"}} 3' in text
+    assert f'pcces_stage_bytes_total{{stage="upload",pid="{os.getpid()}"}} 2048' in text
+
+
+def test_metrics_file_is_written_per_process(tmp_path):
+    metrics_file = tmp_path / "pcces.prom"
+    profiler = Profiler(enabled=True, metrics_file=str(metrics_file))
+    with profiler.stage("parse", items=1):
+        pass
+    path = tmp_path / f"pcces.{os.getpid()}.prom"
+    assert profiler.metrics_path() == str(path)
+    assert not metrics_file.exists()
+    assert f'pid="{os.getpid()}"' in path.read_text(encoding="utf-8")
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.xml_converter.item_store import ITEM_COLUMNS, ItemStore, parse_number
+from src.xml_converter.xml_processor import XMLProcessor
+
+NAMESPACE = "http://pcstd.pcc.gov.tw/2003/eTender"
+
+
+def _pay_item(item_no, kind, code, values, body=""):
+    fields = "".join(f"<{tag}>{text}</{tag}>" for tag, text in values.items() if text is not None)
+    return (
+        f'<PayItem itemKey="{item_no}" itemNo="{item_no}" refItemCode="{code}" itemKind="{kind}">'
+        f'<Description language="zh-TW">項目{item_no}</Description><Unit language="zh-TW">式</Unit>'
+        f'{fields}{body}</PayItem>'
+    )
+
+
+# 數值欄位包含空白、缺少、無法解析與千分位逗號的文字
+ITEMS_XML = (
+    f'<ETenderSheet xmlns="{NAMESPACE}"><DetailList>'
+    + _pay_item("壹", "mainItem", "", {"Quantity": "1", "Price": "", "Amount": "1,234.5"},
+                _pay_item("1", "analysis", "A001", {"Quantity": "2.5", "Price": "abc", "Amount": None})
+                + _pay_item("2", "general", "A002", {"Quantity": "", "Price": "3", "Amount": "-"})
+                + _pay_item("VAR1", "variablePrice", "A003", {"Quantity": "1", "Price": "1", "Amount": "1"})
+                + _pay_item("3", "subtotal", "", {"Quantity": None, "Price": None, "Amount": "7.5"}))
+    + '</DetailList></ETenderSheet>'
+).encode("utf-8")
+
+NUMERIC_COLUMNS = ['數量', '單價', '金額']
+
+
+@pytest.fixture(scope="module")
+def root():
+    return XMLProcessor.parse_xml(ITEMS_XML)
+
+
+def _expected_frame(rows):
+    """舊版列字典的資料，數值欄位以 parse_number 轉換"""
+    expected = pd.DataFrame(rows, columns=ITEM_COLUMNS)
+    for column in NUMERIC_COLUMNS:
+        expected[column] = expected[column].map(parse_number).astype(np.float64)
+    return expected
+
+
+def test_append_matches_process_xml_root_rows(root):
+    rows = XMLProcessor.process_xml_root(root)
+    store = XMLProcessor.process_xml_store(root)
+    assert len(store) == len(rows) == 4
+
+    frame = store.to_dataframe()
+    assert list(frame.columns) == ITEM_COLUMNS
+    expected = _expected_frame(rows)
+    for column in ITEM_COLUMNS:
+        if column in NUMERIC_COLUMNS:
+            np.testing.assert_array_equal(frame[column].to_numpy(), expected[column].to_numpy())
+        else:
+            assert frame[column].astype(object).tolist() == expected[column].tolist()
+    # 空白、缺少與無法解析的數值為 NaN，千分位逗號可解析
+    assert np.isnan(frame['數量'].to_numpy()[[2, 3]]).all()
+    assert np.isnan(frame['單價'].to_numpy()[[0, 1]]).all()
+    assert np.isnan(frame['金額'].to_numpy()[[1, 2]]).all()
+    assert frame['金額'].tolist()[0] == 1234.5
+
+    # 逐筆產生的字典與舊版相同（數值欄位為 float）
+    for item, row in zip(store, rows):
+        for column in ITEM_COLUMNS:
+            if column in NUMERIC_COLUMNS:
+                np.testing.assert_equal(item[column], parse_number(row[column]))
+            else:
+                assert item[column] == row[column]
+
+
+def test_to_dataframe_references_store_arrays(root):
+    store = XMLProcessor.process_xml_store(root)
+    frame = store.to_dataframe()
+    assert isinstance(frame['項目種類'].dtype, pd.CategoricalDtype)
+    assert frame['階層'].dtype == np.int32
+    for column, values in (('數量', store.quantity), ('單價', store.price), ('金額', store.amount), ('階層', store.depth)):
+        assert np.shares_memory(frame[column].to_numpy(), np.frombuffer(values, dtype=frame[column].dtype))
+
+
+def test_empty_store():
+    store = ItemStore()
+    frame = store.to_dataframe()
+    assert len(store) == 0
+    assert list(frame.columns) == ITEM_COLUMNS
+    assert len(frame) == 0
+    pd.testing.assert_frame_equal(ItemStore.from_dataframe(frame).to_dataframe(), frame)
+
+
+def test_from_dataframe_round_trip(root):
+    frame = XMLProcessor.process_xml_store(root).to_dataframe()
+    restored = ItemStore.from_dataframe(frame)
+    pd.testing.assert_frame_equal(restored.to_dataframe(), frame)
+    assert [item['項次'] for item in restored] == ['壹', '1', '2', '3']
+
+
+def test_nbytes_counts_arrays_and_strings():
+    store = ItemStore()
+    empty = store.nbytes
+    for i in range(100):
+        store.append(f"A{i:03d}", "analysis", str(i), "", "式", "1", "2", "2", 1, "")
+    # 每筆 3 個 float64、階層與 3 個類別代碼各一個 int32
+    arrays = 100 * (3 * 8 + 4 * 4)
+    assert store.nbytes >= empty + arrays
+
+    before = store.nbytes
+    store.append("B001", "analysis", "101", "說明" * 1000, "式", "1", "2", "2", 1, "")
+    assert store.nbytes - before >= 2000
@@ -0,0 +1,39 @@
+import pytest
+
+from src.xml_converter.cost_tree import CostDag, CostTree
+from src.xml_converter.resources import ResourceAggregator
+from src.xml_converter.xml_processor import XMLProcessor
+
+NAMESPACE = "http://pcstd.pcc.gov.tw/2003/eTender"
+
+
+def _work_item(code, kind, quantity, body="", output_quantity=1):
+    return (
+        f'<WorkItem itemCode="{code}" itemKind="{kind}" analysisOutputQuantity="{output_quantity}">'
+        f'<Description language="zh-TW">{code}</Description>'
+        f'<Quantity>{quantity}</Quantity><Price>1</Price><Amount>{quantity}</Amount>'
+        f'{body}</WorkItem>'
+    )
+
+
+# 兩個分析各自引用代碼同為 S001、但內容不同的子分析；B003 只引用代碼，沿用頂層的 S001
+SAME_CODE_XML = (
+    f'<ETenderSheet xmlns="{NAMESPACE}"><CostBreakdownList>'
+    + _work_item("B001", "analysis", 1, _work_item("S001", "analysis", 2, _work_item("L001", "labor", 3)))
+    + _work_item("B002", "analysis", 1, _work_item("S001", "analysis", 2, _work_item("M001", "material", 5), output_quantity=2))
+    + _work_item("B003", "analysis", 1, _work_item("S001", "analysis", 4))
+    + _work_item("S001", "analysis", 1, _work_item("E001", "equipment", 7))
+    + '</CostBreakdownList></ETenderSheet>'
+).encode("utf-8")
+
+
+@pytest.mark.parametrize("graph_type", [CostTree, CostDag])
+def test_same_code_analyses_with_different_children(graph_type):
+    graph = graph_type.from_xml_root(XMLProcessor.parse_xml(SAME_CODE_XML))
+    aggregator = ResourceAggregator(graph)
+    assert aggregator.unit_consumption(graph.find("B001")) == {"L001": 6.0}
+    assert aggregator.unit_consumption(graph.find("B002")) == {"M001": 5.0}
+    assert aggregator.unit_consumption(graph.find("B003")) == {"E001": 28.0}
+
+    nodes = graph.lookup(["B001", "B002", "B003"])
+    assert aggregator.aggregate(nodes, [1, 2, 1]) == {"L001": 6.0, "M001": 10.0, "E001": 28.0}
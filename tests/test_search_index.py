@@ -0,0 +1,73 @@
+import pytest
+
+from src.xml_converter.search_index import AnalysisSearchIndex
+
+# 分析表鍵值 -> (項目代碼, 說明)
+ANALYSES = {
+    "0321010003 - 預拌混凝土 210kgf/cm2": ("0321010003", "預拌混凝土 210kgf/cm2"),
+    "0321010004 - 預拌混凝土 280kgf/cm2": ("0321010004", "預拌混凝土 280kgf/cm2"),
+    "0321110001 - 混凝土澆置": ("0321110001", "混凝土澆置"),
+    "0311010002 - 模板，清水模板": ("0311010002", "模板，清水模板"),
+    "0221000001 - 鋼筋，SD280W 加工及組立": ("0221000001", "鋼筋，SD280W 加工及組立"),
+    "M0001 - AC 路面刨除": ("  M0001 ", "AC 路面刨除"),
+    "L0001 - 技術工": ("L0001", "技術工"),
+    "E0001 - 挖土機 0.7m3": ("E0001", "挖土機 0.7m3"),
+}
+
+
+def _tables():
+    return {
+        key: {'主項': {'項目代碼': code, '說明': description}, '細項': []}
+        for key, (code, description) in ANALYSES.items()
+    }
+
+
+def _substring_filter(tables, query):
+    """舊版逐表比對的結果（說明之外也比對項目代碼）"""
+    query = query.strip().lower()
+    return [
+        key for key, table in tables.items()
+        if query in table['主項']['說明'].lower() or query in table['主項']['項目代碼'].strip().lower()
+    ]
+
+
+@pytest.mark.parametrize("query", [
+    # 單字
+    "土", "筋", "0", "m",
+    # 多字
+    "混凝土", "預拌混凝土", "清水模板", "0321", "kgf",
+    # 沒有結果
+    "瀝青", "混凝x", "zzz", "土機混",
+    # 中英混合與大小寫
+    "SD280W 加工", "ac 路面", "0.7M3", "280kgf", "  M0001  ",
+])
+def test_search_matches_substring_filter(query):
+    tables = _tables()
+    index = AnalysisSearchIndex.from_tables(tables)
+    results = index.search(query)
+    assert sorted(results) == sorted(_substring_filter(tables, query))
+    assert len(results) == len(set(results))
+
+
+def test_description_only_queries_match_old_filter():
+    tables = _tables()
+    index = AnalysisSearchIndex.from_tables(tables)
+    for query in ("混凝土", "模板", "工"):
+        old = [key for key, table in tables.items() if query.lower() in table['主項']['說明'].lower()]
+        assert sorted(index.search(query)) == sorted(old)
+
+
+def test_empty_query_returns_all_in_order():
+    tables = _tables()
+    index = AnalysisSearchIndex.from_tables(tables)
+    assert index.search("") == list(tables)
+    assert index.search("   ", top_k=2) == list(tables)[:2]
+
+
+def test_ranking_and_top_k():
+    index = AnalysisSearchIndex.from_tables(_tables())
+    # 代碼完全相符優先，其次為代碼開頭相符
+    assert index.search("0321010004")[0] == "0321010004 - 預拌混凝土 280kgf/cm2"
+    assert index.search("m0001") == ["M0001 - AC 路面刨除"]
+    results = index.search("混凝土")
+    assert index.search("混凝土", top_k=2) == results[:2]
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import urllib.error
+
+import pytest
+
+from benchmarks.synthetic import write_synthetic_xml
+from src.xml_converter.service import DONE, FAILED, QUEUED, JobService, ServiceClient
+
+
+@pytest.fixture(scope="module")
+def xml_bytes(tmp_path_factory):
+    path = tmp_path_factory.mktemp("xml") / "synthetic.xml"
+    write_synthetic_xml(str(path), pay_items=30, main_items=2, analyses=6, fanout=3, nesting=2, shared=2)
+    return path.read_bytes()
+
+
+class _RunningService:
+    """在背景執行緒的事件迴圈中執行 JobService，監聽臨時連接埠"""
+
+    def __init__(self, service):
+        self.service = service
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+        self.server = self.run(service.start(port=0))
+        port = self.server.sockets[0].getsockname()[1]
+        self.client = ServiceClient(f"http://127.0.0.1:{port}")
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout=60)
+
+    def stop_dispatching(self):
+        """停止分派工作，之後提交的工作留在佇列中"""
+        async def cancel():
+            for task in self.service._dispatchers:
+                task.cancel()
+            await asyncio.gather(*self.service._dispatchers, return_exceptions=True)
+        self.run(cancel())
+
+    def close(self):
+        async def shutdown():
+            self.server.close()
+            await self.server.wait_closed()
+            await self.service.close()
+        self.run(shutdown())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+
+@pytest.fixture
+def running(tmp_path):
+    def start(**kwargs):
+        service = JobService(str(tmp_path / "service"), str(tmp_path / "cache"), **kwargs)
+        started.append(_RunningService(service))
+        return started[-1]
+
+    started = []
+    yield start
+    for running_service in started:
+        running_service.close()
+
+
+def test_parse_and_export_jobs(running, xml_bytes):
+    client = running(workers=1).client
+
+    parse = client.submit(xml_bytes)
+    assert parse['kind'] == 'parse'
+    job = client.wait(parse['id'], interval=0.05)
+    assert job['status'] == DONE
+    assert set(job['results']) == {'pay_items', 'work_items', 'cost_breakdown'}
+    pay_items = client.fetch_table(parse['id'], 'pay_items')
+    assert len(pay_items) == job['pay_items'] > 0
+
+    export = client.submit(xml_bytes, kind='export', output_format='csv')
+    job = client.wait(export['id'], interval=0.05)
+    assert job['pay_items'] == len(pay_items)
+    assert job['results']
+    csv = client.fetch(export['id'], job['results'][0])
+    assert csv.strip()
+
+
+def test_malformed_upload_fails(running):
+    client = running(workers=1).client
+    job = client.submit(b"<ETenderSheet><DetailList>")
+    with pytest.raises(RuntimeError):
+        client.wait(job['id'], interval=0.05)
+    job = client.status(job['id'])
+    assert job['status'] == FAILED
+    assert job['error']
+
+
+def test_full_queue_returns_503(running, xml_bytes):
+    service = running(workers=1, max_queue=1)
+    service.stop_dispatching()
+    assert service.client.submit(xml_bytes)['status'] == QUEUED
+    with pytest.raises(urllib.error.HTTPError) as error:
+        service.client.submit(xml_bytes)
+    assert error.value.code == 503
@@ -0,0 +1,127 @@
+import io
+
+import pytest
+
+from benchmarks.synthetic import write_synthetic_xml
+from src.xml_converter.xml_processor import XMLProcessor
+
+NAMESPACE = "http://pcstd.pcc.gov.tw/2003/eTender"
+
+
+def _fields(description, quantity, price, amount):
+    return (
+        f'<Description language="zh-TW">{description}</Description>'
+        f'<Description language="en">ignored</Description>'
+        f'<Unit language="zh-TW">式</Unit>'
+        f'<Quantity>{quantity}</Quantity>'
+        f'<Price>{price}</Price>'
+        f'<Amount>{amount}</Amount>'
+    )
+
+
+# 上層項目的部分欄位出現在下層項目之後，串流解析必須等到上層項目結束才輸出
+TRAILING_FIELDS_XML = (
+    f'<ETenderSheet xmlns="{NAMESPACE}"><DetailList>'
+    '<PayItem itemKey="壹" itemNo="壹" refItemCode="" itemKind="mainItem">'
+    '<Description language="zh-TW">發包工程費</Description>'
+    '<PayItem itemKey="一" itemNo="一" refItemCode="" itemKind="mainItem">'
+    '<Description language="zh-TW">主項目</Description>'
+    '<PayItem itemKey="1" itemNo="1" refItemCode="A001" itemKind="analysis">'
+    + _fields("工作項目", 2, 3, 6) +
+    '</PayItem>'
+    '<Quantity>1</Quantity><Amount>6</Amount>'
+    '</PayItem>'
+    '<PayItem itemKey="二" itemNo="二" refItemCode="" itemKind="subtotal">'
+    + _fields("小計", 1, 0, 6) +
+    '</PayItem>'
+    '<Unit language="zh-TW">式</Unit><Amount>12</Amount>'
+    '</PayItem>'
+    '</DetailList><CostBreakdownList>'
+    '<WorkItem itemCode="A001" itemKind="analysis">'
+    + _fields("分析", 1, 3, 3) +
+    '<WorkItem itemCode="L001" itemKind="labor">' + _fields("技工", 1, 3, 3) + '</WorkItem>'
+    '<Quantity>1</Quantity>'
+    '</WorkItem>'
+    '</CostBreakdownList></ETenderSheet>'
+).encode("utf-8")
+
+
+@pytest.fixture(scope="module")
+def synthetic_xml(tmp_path_factory):
+    path = tmp_path_factory.mktemp("xml") / "synthetic.xml"
+    return write_synthetic_xml(str(path), pay_items=200, main_items=4, analyses=20, fanout=3, nesting=2)
+
+
+@pytest.mark.parametrize("item_type", ["PayItem", "WorkItem"])
+def test_iter_xml_file_matches_process_xml_file_with_trailing_fields(item_type):
+    expected = XMLProcessor.process_xml_file(TRAILING_FIELDS_XML, item_type)
+    assert list(XMLProcessor.iter_xml_file(TRAILING_FIELDS_XML, item_type)) == expected
+
+
+def test_trailing_fields_are_read():
+    rows = list(XMLProcessor.iter_xml_file(TRAILING_FIELDS_XML))
+    assert [row['金額'] for row in rows] == ['12', '6', '6', '6']
+    assert rows[0]['單位'] == '式'
+    assert rows[1]['數量'] == '1'
+
+
+@pytest.mark.parametrize("item_type", ["PayItem", "WorkItem"])
+def test_iter_xml_file_matches_process_xml_file_on_synthetic_xml(synthetic_xml, item_type):
+    expected = XMLProcessor.process_xml_file(synthetic_xml, item_type)
+    assert expected
+    assert list(XMLProcessor.iter_xml_file(synthetic_xml, item_type)) == expected
+
+
+def test_iter_xml_file_accepts_bytes_and_file_objects(synthetic_xml):
+    with open(synthetic_xml, "rb") as f:
+        data = f.read()
+    expected = XMLProcessor.process_xml_file(synthetic_xml)
+    assert list(XMLProcessor.iter_xml_file(data)) == expected
+    assert list(XMLProcessor.iter_xml_file(memoryview(data))) == expected
+    assert list(XMLProcessor.iter_xml_file(io.BytesIO(data))) == expected
+
+
+def test_iter_xml_file_stats(synthetic_xml):
+    stats = {}
+    rows = list(XMLProcessor.iter_xml_file(synthetic_xml, stats=stats))
+    assert stats['items'] == len(rows)
+    assert stats['seconds'] >= 0
+
+
+class _ChunkedReader:
+    """每次最多返回 size 個位元組，記錄已讀取的位置"""
+
+    def __init__(self, data, size=64):
+        self.data = data
+        self.size = size
+        self.position = 0
+
+    def read(self, size=-1):
+        end = min(self.position + self.size, len(self.data))
+        chunk = self.data[self.position:end]
+        self.position = end
+        return chunk
+
+
+def test_iter_xml_file_yields_rows_before_document_ends():
+    first = (
+        '<PayItem itemKey="壹" itemNo="壹" refItemCode="" itemKind="mainItem">'
+        '<PayItem itemKey="1" itemNo="1" refItemCode="A001" itemKind="analysis">'
+        + _fields("工作項目", 2, 3, 6) + '</PayItem>'
+        + _fields("發包工程費", 1, 6, 6) + '</PayItem>'
+    )
+    rest = "".join(
+        f'<PayItem itemKey="{i}" itemNo="{i}" refItemCode="" itemKind="analysis">'
+        + _fields(f"項目{i}", 1, 1, 1) + '</PayItem>'
+        for i in range(2, 200)
+    )
+    data = (
+        f'<ETenderSheet xmlns="{NAMESPACE}"><DetailList>{first}{rest}</DetailList></ETenderSheet>'
+    ).encode("utf-8")
+    reader = _ChunkedReader(data)
+    rows = XMLProcessor.iter_xml_file(reader)
+
+    # 第一個頂層項目結束後即輸出它與下層項目，不等到 DetailList 或根節點結束
+    assert [row['項次'] for row in (next(rows), next(rows))] == ["壹", "1"]
+    assert reader.position < data.index(b"</DetailList>")
+    assert len(list(rows)) == 198